@@ -1,3 +1,4 @@
+import math
 import random
 from typing import List
 
@@ -14,12 +15,15 @@ from apps.authentication.serializers import LoginSerializer, SMSSerializer
 from apps.platform_management.models import Administrator, ClientStudent, Instructor
 from common.utils.auth import SMS_KEY, login
 from common.utils.drf.response import Response
-from common.utils.sms import sms_client
+from common.utils.sms import SMSRateLimiter, sms_client
 
 
 class AuthenticationViewSet(GenericViewSet):
     permission_classes = [AllowAny]
 
+    # 登录验证码短信模板
+    LOGIN_TEMPLATE_ID = "2329148"
+
     @action(methods=["POST"], detail=False, serializer_class=LoginSerializer)
     def login(self, request, *args, **kwargs):
         validated_data = self.validated_data
@@ -52,12 +56,11 @@ class AuthenticationViewSet(GenericViewSet):
         if not user:
             return Response(result=False, err_msg="不存在该手机号的用户")
 
-        lock_id = f"lock:sms:{phone}"
-        lock = cache.add(lock_id, "lock", timeout=60)
-
-        if not lock:
+        # 与通知短信共用发送频率限制
+        retry_after: float = SMSRateLimiter.acquire(phone, self.LOGIN_TEMPLATE_ID)
+        if retry_after:
             return Response(
-                {"result": False, "err_msg": "请等待60秒后再发送验证码"},
+                {"result": False, "err_msg": f"请等待{math.ceil(retry_after)}秒后再发送验证码"},
                 status=status.HTTP_429_TOO_MANY_REQUESTS,
             )
 
@@ -66,8 +69,9 @@ class AuthenticationViewSet(GenericViewSet):
 
             errors: List[str] = sms_client.send_sms(
                 phone_numbers=[phone],
-                template_id="2329148",
+                template_id=self.LOGIN_TEMPLATE_ID,
                 template_params=[sms_code],
+                rate_limited=False,
             )
             if errors:
                 return Response(result=False, err_msg=errors)
@@ -1,11 +1,20 @@
+from typing import Optional
+
 import pytz
 from rest_framework import serializers
 
+from apps.teaching_space.handles.grade_engine import GradeEngine
 from exam_system.models import ExamStudent
 
 
 class HistoricalGradesListSerializer(serializers.ModelSerializer):
     start_time = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", default_timezone=pytz.utc)
+    exam_info = serializers.SerializerMethodField()
+
+    def get_exam_info(self, obj: ExamStudent) -> dict:
+        """由成绩引擎批量计算, 未传入时逐个查询"""
+        grade_engine: Optional[GradeEngine] = self.context.get("grade_engine")
+        return grade_engine.exam_info(obj) if grade_engine else obj.exam_info
 
     class Meta:
         model = ExamStudent
@@ -19,6 +19,9 @@ class HistoricalGradesApiView(ModelViewSet):
     PERMISSION_MAP = {
         "filter_condition": [StudentPermission | SuperAdministratorPermission | ManageCompanyAdministratorPermission],
     }
+    QUERY_BUDGET_MAP = {
+        "list": 9,
+    }
 
     # region 列表
     def list(self, request, *args, **kwargs):
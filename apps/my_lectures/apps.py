@@ -5,3 +5,9 @@ class MyLecturesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.my_lectures"
     verbose_name = "我的讲课"
+
+    def ready(self):
+        from apps.my_lectures import signals  # noqa
+        from common.utils.counter_cache import CounterCache
+
+        CounterCache.connect_signals(self.label)
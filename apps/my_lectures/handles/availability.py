@@ -0,0 +1,161 @@
+import datetime
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from django.db.models import Q, QuerySet
+
+from apps.platform_management.models import Event, InstructorDayStatus
+from common.utils import global_constants
+
+
+class InstructorAvailability:
+    """
+    讲师可用时间引擎
+
+    一次查询加载时间窗口内所有相关日程，将[培训班排课]、[不可用时间规则]、[取消单日不可用时间]
+    编译成 讲师 × 天 的布尔矩阵，之后“某段时间内哪些讲师有空”都在矩阵上向量化计算，不再逐个讲师逐天判断
+    """
+
+    def __init__(
+        self,
+        instructor_ids: Iterable[int],
+        start_date: datetime.date,
+        end_date: datetime.date,
+        without_training_class: bool = False,
+        without_rule: bool = False,
+        without_cancel_event: bool = False,
+    ):
+        self.start_date, self.end_date = start_date, end_date
+        self.instructor_ids: List[int] = list(instructor_ids)
+        self.instructor_id_to_row: Dict[int, int] = {
+            instructor_id: row for row, instructor_id in enumerate(self.instructor_ids)
+        }
+
+        # 窗口内的每一天, 以及对应的星期(1-7)和日期(1-31)
+        self.days: np.ndarray = np.arange(
+            np.datetime64(start_date, "D"), np.datetime64(end_date, "D") + 1, dtype="datetime64[D]"
+        )
+        day_numbers: np.ndarray = self.days.astype(np.int64)
+        self.isoweekdays: np.ndarray = (day_numbers + 3) % 7 + 1
+        self.monthdays: np.ndarray = (self.days - self.days.astype("datetime64[M]")).astype(np.int64) + 1
+
+        shape = (len(self.instructor_ids), len(self.days))
+        self.class_days: np.ndarray = np.zeros(shape, dtype=bool)
+        self.rule_days: np.ndarray = np.zeros(shape, dtype=bool)
+        self.cancel_days: np.ndarray = np.zeros(shape, dtype=bool)
+
+        if self.instructor_ids and len(self.days):
+            from apps.my_lectures.handles.day_status import DayStatusHandler
+
+            # 窗口已物化时直接读取讲师每日状态, 否则按日程展开
+            if DayStatusHandler.is_materialized(start_date, end_date):
+                self._compile_day_statuses(
+                    DayStatusHandler.load_day_statuses(self.instructor_ids, start_date, end_date)
+                )
+            else:
+                self._compile(self.load_events())
+
+        # [取消单日不可用时间]优先级高于[规则], 但不影响[培训班排课]
+        rule_days = self.rule_days if without_cancel_event else self.rule_days & ~self.cancel_days
+        self.unavailable: np.ndarray = np.zeros(shape, dtype=bool)
+        if not without_training_class:
+            self.unavailable |= self.class_days
+        if not without_rule:
+            self.unavailable |= rule_days
+
+    def load_events(self) -> QuerySet["Event"]:
+        """与时间窗口有交集的所有日程"""
+        return Event.objects.filter(
+            Q(start_date__lte=self.end_date) & (Q(end_date__gte=self.start_date) | Q(end_date__isnull=True)),
+            instructor_id__in=self.instructor_ids,
+        ).only("event_type", "freq_type", "freq_interval", "start_date", "end_date", "instructor_id")
+
+    def _compile(self, events: Iterable[Event]):
+        """将日程编译到矩阵中"""
+        for event in events:
+            row = self.instructor_id_to_row.get(event.instructor_id)
+            if row is None:
+                continue
+
+            start_col = max((event.start_date - self.start_date).days, 0)
+            end_col = len(self.days) if event.end_date is None else \
+                min((event.end_date - self.start_date).days + 1, len(self.days))
+            if start_col >= end_col:
+                continue
+
+            if event.event_type == Event.EventType.CLASS_SCHEDULE.value:
+                self.class_days[row, start_col:end_col] = True
+
+            elif event.event_type == Event.EventType.CANCEL_UNAVAILABILITY.value:
+                self.cancel_days[row, start_col:end_col] = True
+
+            elif event.event_type in Event.EventType.rule_types:
+                self.rule_days[row, start_col:end_col] |= self.rule_mask(event, start_col, end_col)
+
+    def _compile_day_statuses(self, day_statuses: Iterable[Tuple[int, datetime.date, str]]):
+        """将讲师每日状态编译到矩阵中"""
+        status_to_matrix: Dict[str, np.ndarray] = {
+            InstructorDayStatus.Status.CLASS_SCHEDULE.value: self.class_days,
+            InstructorDayStatus.Status.UNAVAILABLE.value: self.rule_days,
+            InstructorDayStatus.Status.CANCELED.value: self.cancel_days,
+        }
+        for instructor_id, current_date, status in day_statuses:
+            status_to_matrix[status][
+                self.instructor_id_to_row[instructor_id], (current_date - self.start_date).days
+            ] = True
+
+    def rule_mask(self, rule: Event, start_col: int, end_col: int) -> np.ndarray:
+        """规则在 [start_col, end_col) 列上命中的天"""
+        if rule.event_type == Event.EventType.ONE_TIME_UNAVAILABILITY.value:
+            return np.ones(end_col - start_col, dtype=bool)
+
+        isoweekdays = self.isoweekdays[start_col:end_col]
+        if rule.freq_type == Event.FreqType.WEEKLY:
+            return np.isin(isoweekdays, rule.freq_interval)
+
+        if rule.freq_type == Event.FreqType.MONTHLY:
+            return np.isin(self.monthdays[start_col:end_col], rule.freq_interval)
+
+        if rule.freq_type == Event.FreqType.BIWEEKLY:
+            # 以规则开始时间为基准，偶数周生效
+            delta_days = np.arange(start_col, end_col) + (self.start_date - rule.start_date).days
+            return ((delta_days // 7) % 2 == 0) & np.isin(isoweekdays, rule.freq_interval)
+
+        return np.zeros(end_col - start_col, dtype=bool)
+
+    def _columns(self, start_date: datetime.date, end_date: datetime.date) -> slice:
+        if start_date < self.start_date or end_date > self.end_date:
+            raise ValueError(f"查询时间[{start_date}, {end_date}]超出引擎时间窗口[{self.start_date}, {self.end_date}]")
+        return slice((start_date - self.start_date).days, (end_date - self.start_date).days + 1)
+
+    def is_idle(self, instructor_id: int, start_date: datetime.date, end_date: datetime.date) -> bool:
+        """在期间内该讲师是否都有空闲时间"""
+        return not self.unavailable[self.instructor_id_to_row[instructor_id], self._columns(start_date, end_date)].any()
+
+    def idle_instructor_ids(self, start_date: datetime.date, end_date: datetime.date) -> List[int]:
+        """在期间内都有空闲时间的讲师"""
+        busy: np.ndarray = self.unavailable[:, self._columns(start_date, end_date)].any(axis=1)
+        return [self.instructor_ids[row] for row in np.flatnonzero(~busy)]
+
+    def free_windows(self, days: int = global_constants.CLASS_DAYS) -> np.ndarray:
+        """
+        连续空闲窗口矩阵: result[讲师行, j] 为 True 表示该讲师从 self.days[j] 开始连续 days 天都有空
+        """
+        if days > len(self.days):
+            return np.zeros((len(self.instructor_ids), 0), dtype=bool)
+
+        busy_prefix = np.zeros((len(self.instructor_ids), len(self.days) + 1), dtype=np.int32)
+        np.cumsum(self.unavailable, axis=1, out=busy_prefix[:, 1:])
+        return busy_prefix[:, days:] == busy_prefix[:, :-days]
+
+    def earliest_free_windows(
+        self, limit: int, days: int = global_constants.CLASS_DAYS
+    ) -> List[Tuple[int, datetime.date]]:
+        """
+        最早的 limit 个连续空闲窗口 (讲师id, 开始时间), 按开始时间排序, 同一天按讲师顺序排序
+        """
+        start_cols, rows = np.nonzero(self.free_windows(days).T)
+        return [
+            (self.instructor_ids[row], self.start_date + datetime.timedelta(days=int(start_col)))
+            for start_col, row in zip(start_cols[:limit], rows[:limit])
+        ]
@@ -0,0 +1,170 @@
+import datetime
+import json
+from typing import Dict, Generator, List, Optional, Tuple, Union
+
+from django.db.models import Q, QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.my_lectures.handles.event import EventHandler
+from apps.platform_management.models import Event
+from apps.teaching_space.models import TrainingClass
+from common.utils import global_constants
+from common.utils.calendar import between
+from common.utils.drf.response import Response
+
+
+class CalendarBuilder:
+    """
+    稀疏日程构建
+
+    一次 select_related 查询加载与时间范围有交集的日程, 只为有数据的日期分配条目;
+    时间范围过大时按段构建并流式返回
+    """
+
+    def __init__(
+        self,
+        events: QuerySet["Event"],
+        start_date: datetime.date,
+        end_date: datetime.date,
+        origin_date: Optional[datetime.date] = None,
+    ):
+        self.events = events
+        self.start_date, self.end_date = start_date, end_date
+        # 培训班排课标记在 max(origin_date, 排课开始时间) 当天, 分段构建时保证跨段的排课只标记一次
+        self.origin_date: datetime.date = origin_date or start_date
+        self.calendar: Dict[datetime.date, dict] = {}
+        # 与时间范围有交集的培训班排课: (开始时间, 结束时间, 排课数据)
+        self.class_events: List[Tuple[datetime.date, Optional[datetime.date], dict]] = []
+
+    def load_events(self) -> QuerySet["Event"]:
+        """与时间范围有交集的日程, 培训班相关信息一并查出"""
+        return self.events.filter(
+            Q(start_date__lte=self.end_date) & (Q(end_date__gte=self.start_date) | Q(end_date__isnull=True))
+        ).select_related(
+            "training_class__course",
+            "training_class__target_client_company",
+            "training_class__instructor",
+        ).order_by("id")
+
+    def get_day(self, current_date: datetime.date) -> dict:
+        day: Optional[dict] = self.calendar.get(current_date)
+        if day is None:
+            day = self.calendar[current_date] = {
+                "date": current_date,
+                "is_available": True,
+                "data": [],
+                "rules": [],
+                "count": 0,
+                "is_canceled": False,
+            }
+        return day
+
+    def build(self) -> List[dict]:
+        """构建日程"""
+        for event in self.load_events():
+            marking_start_date = max(self.start_date, event.start_date)
+
+            # 如果未设置结束时间，以传入的结束时间作为最终的结束时间
+            marking_end_date = self.end_date if not event.end_date else min(self.end_date, event.end_date)
+
+            # 培训班排课
+            if event.event_type == Event.EventType.CLASS_SCHEDULE.value:
+                event_data: dict = self.build_event_data(event)
+                self.class_events.append((event.start_date, event.end_date, event_data))
+
+                marking_date = max(self.origin_date, event.start_date)
+                if self.start_date <= marking_date <= marking_end_date:
+                    day = self.get_day(marking_date)
+                    day["count"] += 1
+                    day["data"].append(event_data)
+
+            # 取消单日不可用时间
+            elif event.event_type == Event.EventType.CANCEL_UNAVAILABILITY.value:
+                assert event.start_date == event.end_date
+                self.marking_canceled(marking_start_date, marking_end_date)
+
+            # 登记一次性不可用时间规则和周期性不可用时间规则
+            elif event.event_type in Event.EventType.rule_types:
+                self.marking_unavailable(event, marking_start_date, marking_end_date)
+
+        # 只有取消标记的日期不返回
+        return [
+            day for _, day in sorted(self.calendar.items())
+            if day["data"] or day["rules"] or not day["is_available"]
+        ]
+
+    @classmethod
+    def build_event_data(cls, event: Event) -> Dict:
+        """
+        构建event数据
+        """
+        if event.event_type == Event.EventType.CLASS_SCHEDULE.value:
+            training_class: TrainingClass = event.training_class
+            return {
+                "id": training_class.id,
+                "start_date": training_class.start_date,
+                "end_date": training_class.start_date + datetime.timedelta(days=1),
+                "target_client_company_name": training_class.target_client_company_name,
+                "instructor_name": training_class.instructor_name,
+                "name": training_class.name,
+            }
+
+        return {
+            "id": event.id,
+            "event_type": event.event_type,
+            "freq_type": event.freq_type,
+            "freq_interval": event.freq_interval,
+            "start_date": event.start_date,
+            "end_date": event.end_date,
+        }
+
+    def marking_unavailable(self, event: Event, start_date: datetime.date, end_date: datetime.date):
+        """
+        标记不可用时间, 只为命中规则的日期分配条目
+        """
+        event_data: Optional[dict] = None
+        for current_date in between(start_date, end_date):
+            day: Optional[dict] = self.calendar.get(current_date)
+            if day and day["is_canceled"]:
+                continue
+
+            if event.event_type == Event.EventType.RECURRING_UNAVAILABILITY.value and \
+                    not EventHandler.is_current_date_in_rule(current_date, event):
+                continue
+
+            event_data = event_data or self.build_event_data(event)
+            day = day or self.get_day(current_date)
+            day["is_available"] = False
+            day["rules"].append(event_data)
+
+    def marking_canceled(self, start_date: datetime.date, end_date: datetime.date):
+        """
+        取消单日不可用时间
+        """
+        for current_date in between(start_date, end_date):
+            day = self.get_day(current_date)
+            day["is_canceled"] = True
+            day["is_available"] = True
+
+    def iter_days(self) -> Generator[dict, None, None]:
+        """按段构建, 每段只占用该段的内存"""
+        chunk_days = datetime.timedelta(days=global_constants.CALENDAR_STREAM_DAYS)
+        chunk_start_date = self.start_date
+        while chunk_start_date <= self.end_date:
+            chunk_end_date = min(chunk_start_date + chunk_days - datetime.timedelta(days=1), self.end_date)
+            yield from CalendarBuilder(self.events, chunk_start_date, chunk_end_date, self.origin_date).build()
+            chunk_start_date = chunk_end_date + datetime.timedelta(days=1)
+
+    def iter_response_content(self) -> Generator[str, None, None]:
+        """与 Response 相同的返回结构, 日程逐条输出"""
+        yield '{"result":true,"err_msg":"","data":['
+        for index, day in enumerate(self.iter_days()):
+            yield ("," if index else "") + json.dumps(day, cls=JSONEncoder, ensure_ascii=False)
+        yield '],"code":0}'
+
+    def to_response(self) -> Union[Response, StreamingHttpResponse]:
+        if (self.end_date - self.start_date).days < global_constants.CALENDAR_STREAM_DAYS:
+            return Response(self.build())
+
+        return StreamingHttpResponse(self.iter_response_content(), content_type="application/json")
@@ -0,0 +1,167 @@
+import datetime
+import time
+from functools import partial
+from typing import Dict, Iterable, List, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+
+from apps.my_lectures.handles.calendar_builder import CalendarBuilder
+from apps.platform_management.models import Event
+from apps.teaching_space.models import TrainingClass
+from common.utils.calendar import month_end, month_starts
+from common.utils.drf.response import Response
+
+
+class CalendarCache:
+    """
+    日程缓存
+
+    按 范围(讲师/管理公司/全部) + 月份 缓存日程块, 任意时间范围由月份块拼接而成;
+    每个范围有一个版本号, 日程或培训班变更时更新版本号, 旧版本的缓存块自然失效
+    """
+
+    KEY_PREFIX = "calendar"
+    ALL_SCOPE = "all"
+    TIMEOUT = 60 * 60 * 24
+
+    def __init__(self, scope: str, events: QuerySet["Event"]):
+        self.scope = scope
+        self.events = events
+
+    @classmethod
+    def instructor_scope(cls, instructor_id: int) -> str:
+        return f"instructor:{instructor_id}"
+
+    @classmethod
+    def manage_company_scope(cls, manage_company_id: int) -> str:
+        return f"manage_company:{manage_company_id}"
+
+    @classmethod
+    def version_key(cls, scope: str) -> str:
+        return f"{cls.KEY_PREFIX}:version:{scope}"
+
+    @classmethod
+    def bump(cls, scopes: Iterable[str]):
+        """事务提交后更新版本号, 使范围内已缓存的日程块失效"""
+        transaction.on_commit(partial(cls._bump, set(scopes)))
+
+    @classmethod
+    def _bump(cls, scopes: Iterable[str]):
+        version_keys: List[str] = [cls.version_key(scope) for scope in scopes]
+        key_to_version: Dict[str, int] = cache.get_many(version_keys)
+        cache.set_many(
+            {key: max(cls.new_version(), key_to_version.get(key, 0) + 1) for key in version_keys}, timeout=None
+        )
+
+    @classmethod
+    def new_version(cls) -> int:
+        """版本号取当前毫秒时间戳, 同时作为最后修改时间; 缓存丢失后重新生成也不会与旧版本号重复"""
+        return int(time.time() * 1000)
+
+    @classmethod
+    def get_version(cls, scope: str) -> int:
+        return cache.get_or_set(cls.version_key(scope), cls.new_version, timeout=None)
+
+    @classmethod
+    def bump_event(cls, event: Event, instructor_ids: Iterable[Optional[int]] = ()):
+        """日程变更: 涉及的讲师, 如果是培训班排课还包括所属管理公司和全部日程"""
+        scopes: List[str] = [
+            cls.instructor_scope(instructor_id)
+            for instructor_id in {event.instructor_id, *instructor_ids} if instructor_id is not None
+        ]
+        if event.event_type == Event.EventType.CLASS_SCHEDULE.value:
+            scopes.append(cls.ALL_SCOPE)
+            if event.training_class_id:
+                scopes.extend(cls.training_class_scopes(event.training_class_id))
+        cls.bump(scopes)
+
+    @classmethod
+    def bump_training_class(cls, training_class: TrainingClass, previous_scopes: Iterable[str] = ()):
+        """
+        培训班变更: 培训班名称、客户公司、讲师都会展示在日程中;
+        previous_scopes 为变更前的范围(training_class_scopes), 更换客户公司后原管理公司的日程也需要失效
+        """
+        cls.bump([cls.ALL_SCOPE, *previous_scopes, *cls.training_class_scopes(training_class.id)])
+
+    @classmethod
+    def bump_client_company(cls, client_company_id: int, manage_company_ids: Iterable[Optional[int]]):
+        """客户公司变更: 客户公司名称展示在日程中, 更换管理公司后新旧管理公司的日程都需要失效"""
+        scopes: List[str] = [
+            cls.manage_company_scope(manage_company_id)
+            for manage_company_id in set(manage_company_ids) if manage_company_id is not None
+        ]
+        scopes.extend(
+            cls.instructor_scope(instructor_id)
+            for instructor_id in Event.objects.filter(
+                training_class__target_client_company_id=client_company_id, instructor_id__isnull=False
+            ).values_list("instructor_id", flat=True).distinct()
+        )
+        cls.bump([cls.ALL_SCOPE, *scopes])
+
+    @classmethod
+    def training_class_scopes(cls, training_class_id: int) -> List[str]:
+        """培训班所属管理公司和排课讲师"""
+        scopes: List[str] = []
+        for manage_company_id, instructor_id in TrainingClass.objects.filter(id=training_class_id).values_list(
+            "target_client_company__affiliated_manage_company_id", "event__instructor_id"
+        ):
+            if manage_company_id:
+                scopes.append(cls.manage_company_scope(manage_company_id))
+            if instructor_id:
+                scopes.append(cls.instructor_scope(instructor_id))
+        return scopes
+
+    def get_blocks(self, start_date: datetime.date, end_date: datetime.date) -> List[dict]:
+        """时间范围内每个月的日程块, 缺失的月份构建后写回缓存"""
+        version: int = self.get_version(self.scope)
+        month_to_key: Dict[datetime.date, str] = {
+            month_start: f"{self.KEY_PREFIX}:{self.scope}:{version}:{month_start:%Y-%m}"
+            for month_start in month_starts(start_date, end_date)
+        }
+        key_to_block: Dict[str, dict] = cache.get_many(list(month_to_key.values()))
+
+        missing_blocks: Dict[str, dict] = {
+            key: self.build_block(month_start)
+            for month_start, key in month_to_key.items() if key not in key_to_block
+        }
+        if missing_blocks:
+            cache.set_many(missing_blocks, timeout=self.TIMEOUT)
+            key_to_block.update(missing_blocks)
+
+        return [key_to_block[key] for key in month_to_key.values()]
+
+    def build_block(self, month_start: datetime.date) -> dict:
+        """
+        月份日程块, 培训班排课标记在排课开始当天;
+        同时保留与该月有交集的培训班排课, 用于查询从月中开始时补齐开始当天的排课
+        """
+        builder = CalendarBuilder(self.events, month_start, month_end(month_start), origin_date=datetime.date.min)
+        return {"days": builder.build(), "class_events": builder.class_events}
+
+    def build(self, start_date: datetime.date, end_date: datetime.date) -> List[dict]:
+        """拼接月份日程块, 结果与 CalendarBuilder(events, start_date, end_date).build() 一致"""
+        blocks: List[dict] = self.get_blocks(start_date, end_date)
+        days: List[dict] = [
+            day for block in blocks for day in block["days"] if start_date <= day["date"] <= end_date
+        ]
+
+        # 查询开始前已开始的培训班排课, 标记在查询开始当天
+        if any(
+            event_start_date < start_date and (event_end_date is None or event_end_date >= start_date)
+            for event_start_date, event_end_date, _ in blocks[0]["class_events"]
+        ):
+            if not days or days[0]["date"] != start_date:
+                days.insert(0, CalendarBuilder(self.events, start_date, start_date).get_day(start_date))
+
+            days[0]["data"] = [
+                event_data for event_start_date, event_end_date, event_data in blocks[0]["class_events"]
+                if event_start_date <= start_date and (event_end_date is None or event_end_date >= start_date)
+            ]
+            days[0]["count"] = len(days[0]["data"])
+
+        return days
+
+    def to_response(self, start_date: datetime.date, end_date: datetime.date) -> Response:
+        return Response(self.build(start_date, end_date))
@@ -0,0 +1,185 @@
+import datetime
+from typing import Dict, Iterable, List, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef, Q, QuerySet
+from django.utils import timezone
+
+from apps.my_lectures.handles.event import EventHandler
+from apps.platform_management.models import Event, Instructor, InstructorDayStatus
+from common.utils import global_constants
+from common.utils.calendar import between
+
+
+class DayStatusHandler:
+    """
+    讲师每日状态物化
+
+    日程保存/删除时按天重建该日程的状态, 每晚定时任务把物化范围向后延伸并清理过去的状态,
+    “某天哪些讲师有空”由此变成按 (date, status) 索引的查询
+    """
+
+    # 已物化到的最后一天, 缓存丢失时从数据库重新计算
+    HORIZON_CACHE_KEY = "instructor_day_status:horizon"
+    BATCH_SIZE = 1000
+
+    EVENT_TYPE_TO_STATUS: Dict[str, str] = {
+        Event.EventType.CLASS_SCHEDULE.value: InstructorDayStatus.Status.CLASS_SCHEDULE.value,
+        Event.EventType.ONE_TIME_UNAVAILABILITY.value: InstructorDayStatus.Status.UNAVAILABLE.value,
+        Event.EventType.RECURRING_UNAVAILABILITY.value: InstructorDayStatus.Status.UNAVAILABLE.value,
+        Event.EventType.CANCEL_UNAVAILABILITY.value: InstructorDayStatus.Status.CANCELED.value,
+    }
+
+    @classmethod
+    def get_horizon(cls) -> Optional[datetime.date]:
+        """
+        物化范围的最后一天; 以已物化的最大日期为准, 没有日程覆盖到物化范围最后几天时会偏小,
+        只会让这几天回退到按日程计算, 再次延伸时补齐(写入忽略重复)
+        """
+        horizon: Optional[datetime.date] = cache.get(cls.HORIZON_CACHE_KEY)
+        if horizon is None:
+            horizon = InstructorDayStatus.objects.aggregate(date__max=Max("date"))["date__max"]
+            if horizon is not None:
+                cache.set(cls.HORIZON_CACHE_KEY, horizon, timeout=None)
+        return horizon
+
+    @classmethod
+    def next_horizon(cls) -> datetime.date:
+        return timezone.localdate() + datetime.timedelta(days=global_constants.DAY_STATUS_HORIZON_DAYS)
+
+    @classmethod
+    def window_start(cls) -> datetime.date:
+        """物化范围的第一天, 更早的每日状态由定时任务清理"""
+        return timezone.localdate() - datetime.timedelta(days=global_constants.DAY_STATUS_RETENTION_DAYS)
+
+    @classmethod
+    def is_materialized(cls, start_date: datetime.date, end_date: datetime.date) -> bool:
+        """[start_date, end_date] 是否都已物化, 否则(如定时任务尚未执行、查询过去的日期)需要回退到按日程计算"""
+        if start_date < cls.window_start():
+            return False
+
+        horizon: Optional[datetime.date] = cls.get_horizon()
+        return horizon is not None and end_date <= horizon
+
+    @classmethod
+    def build_day_statuses(
+        cls, event: Event, start_date: datetime.date, end_date: datetime.date
+    ) -> List[InstructorDayStatus]:
+        """日程在 [start_date, end_date] 内每天的状态"""
+        if event.instructor_id is None:
+            return []
+
+        start_date = max(start_date, event.start_date)
+        if event.end_date is not None:
+            end_date = min(end_date, event.end_date)
+
+        is_rule: bool = event.event_type in Event.EventType.rule_types
+        return [
+            InstructorDayStatus(
+                instructor_id=event.instructor_id,
+                date=current_date,
+                status=cls.EVENT_TYPE_TO_STATUS[event.event_type],
+                event_id=event.id,
+            )
+            for current_date in between(start_date, end_date)
+            if not is_rule or EventHandler.is_current_date_in_rule(current_date, event)
+        ]
+
+    @classmethod
+    def materialize_event(cls, event: Event):
+        """重建单个日程在物化范围内的每日状态, 尚未物化时由定时任务全量构建"""
+        horizon: Optional[datetime.date] = cls.get_horizon()
+        with transaction.atomic():
+            InstructorDayStatus.objects.filter(event_id=event.id).delete()
+            if horizon is not None:
+                InstructorDayStatus.objects.bulk_create(
+                    cls.build_day_statuses(event, cls.window_start(), horizon), batch_size=cls.BATCH_SIZE
+                )
+
+    @classmethod
+    def extend_horizon(cls, horizon: Optional[datetime.date] = None) -> int:
+        """
+        把物化范围延伸到 horizon, 只需要补齐没有结束时间或跨过上次物化范围的日程
+        尚未物化(每日状态为空)时从 window_start 开始构建
+        """
+        horizon = horizon or cls.next_horizon()
+        last_horizon: Optional[datetime.date] = cls.get_horizon()
+
+        events: QuerySet["Event"] = Event.objects.filter(instructor__isnull=False, start_date__lte=horizon)
+        if last_horizon is None:
+            start_date: datetime.date = cls.window_start()
+            events = events.filter(Q(end_date__gte=start_date) | Q(end_date__isnull=True))
+        elif horizon > last_horizon:
+            start_date = last_horizon + datetime.timedelta(days=1)
+            events = events.filter(Q(end_date__gt=last_horizon) | Q(end_date__isnull=True))
+        else:
+            return 0
+
+        created_count: int = 0
+        # 构建过程中途失败时不保留部分记录, 否则最大日期会把未构建的日程视为已物化
+        with transaction.atomic():
+            day_statuses: List[InstructorDayStatus] = []
+            for event in events.iterator():
+                day_statuses.extend(cls.build_day_statuses(event, start_date, horizon))
+                if len(day_statuses) >= cls.BATCH_SIZE:
+                    created_count += cls._bulk_create(day_statuses)
+                    day_statuses = []
+            created_count += cls._bulk_create(day_statuses)
+
+        cache.set(cls.HORIZON_CACHE_KEY, horizon, timeout=None)
+        return created_count
+
+    @classmethod
+    def prune(cls) -> int:
+        """清理物化范围之前的每日状态, 按 id 分批删除"""
+        day_statuses: QuerySet["InstructorDayStatus"] = InstructorDayStatus.objects.filter(
+            date__lt=cls.window_start()
+        )
+        deleted_count: int = 0
+        while True:
+            ids: List[int] = list(day_statuses.order_by("id").values_list("id", flat=True)[:cls.BATCH_SIZE])
+            if not ids:
+                return deleted_count
+
+            deleted_count += InstructorDayStatus.objects.filter(id__in=ids).delete()[0]
+
+    @classmethod
+    def _bulk_create(cls, day_statuses: List[InstructorDayStatus]) -> int:
+        InstructorDayStatus.objects.bulk_create(day_statuses, batch_size=cls.BATCH_SIZE, ignore_conflicts=True)
+        return len(day_statuses)
+
+    @classmethod
+    def busy_instructor_ids(cls, start_date: datetime.date, end_date: datetime.date) -> QuerySet:
+        """期间内有[培训班排课]或未被取消的[不可用时间]的讲师id"""
+        canceled: QuerySet["InstructorDayStatus"] = InstructorDayStatus.objects.filter(
+            instructor_id=OuterRef("instructor_id"),
+            date=OuterRef("date"),
+            status=InstructorDayStatus.Status.CANCELED,
+        )
+        return InstructorDayStatus.objects.filter(date__range=(start_date, end_date)).annotate(
+            is_canceled=Exists(canceled)
+        ).filter(
+            Q(status=InstructorDayStatus.Status.CLASS_SCHEDULE)
+            | Q(status=InstructorDayStatus.Status.UNAVAILABLE, is_canceled=False)
+        ).values("instructor_id")
+
+    @classmethod
+    def filter_idle_instructors(
+        cls, queryset: QuerySet["Instructor"], start_date: datetime.date, end_date: datetime.date
+    ) -> QuerySet["Instructor"]:
+        """在期间内都有空闲时间的讲师"""
+        if cls.is_materialized(start_date, end_date):
+            return queryset.exclude(id__in=cls.busy_instructor_ids(start_date, end_date))
+
+        return queryset.filter(id__in=EventHandler.get_idle_instructor_ids(
+            instructor_ids=queryset.values_list("id", flat=True), start_date=start_date, end_date=end_date,
+        ))
+
+    @classmethod
+    def load_day_statuses(
+        cls, instructor_ids: Iterable[int], start_date: datetime.date, end_date: datetime.date
+    ) -> QuerySet:
+        return InstructorDayStatus.objects.filter(
+            instructor_id__in=instructor_ids, date__range=(start_date, end_date)
+        ).values_list("instructor_id", "date", "status")
@@ -0,0 +1,165 @@
+import datetime
+from typing import Dict, Generator, List, Optional
+
+from django.core import signing
+from django.db.models import QuerySet
+
+from apps.my_lectures.handles.event import EventHandler
+from apps.platform_management.models import Event, Instructor
+from apps.teaching_space.models import TrainingClass
+
+
+class ScheduleICalendar:
+    """
+    讲师日程 iCalendar(RFC 5545) 订阅
+
+    周期性不可用时间输出为 RRULE, [取消单日不可用时间]输出为对应规则的 EXDATE, 不逐天展开
+    """
+
+    TOKEN_SALT = "my_lectures.schedule.ical"
+    PRODID = "-//training-center//schedule//CN"
+    WEEKDAYS: Dict[int, str] = {1: "MO", 2: "TU", 3: "WE", 4: "TH", 5: "FR", 6: "SA", 7: "SU"}
+    # 每行最多75个字节(不含换行)
+    LINE_OCTETS = 75
+
+    def __init__(self, instructor: Instructor, last_modified: datetime.datetime):
+        self.instructor = instructor
+        self.last_modified = last_modified
+
+    @classmethod
+    def build_token(cls, instructor_id: int) -> str:
+        return signing.Signer(salt=cls.TOKEN_SALT).sign(str(instructor_id))
+
+    @classmethod
+    def parse_token(cls, token: str) -> Optional[int]:
+        """订阅令牌 -> 讲师id, 无效令牌返回 None"""
+        try:
+            return int(signing.Signer(salt=cls.TOKEN_SALT).unsign(token))
+        except (signing.BadSignature, ValueError):
+            return None
+
+    @classmethod
+    def escape(cls, text: str) -> str:
+        return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+    @classmethod
+    def format_date(cls, date: datetime.date) -> str:
+        return date.strftime("%Y%m%d")
+
+    @classmethod
+    def fold(cls, line: str) -> str:
+        """超过75个字节的行折叠, 续行以空格开头, 不拆分多字节字符"""
+        lines: List[str] = []
+        current, current_octets, limit = "", 0, cls.LINE_OCTETS
+        for char in line:
+            char_octets = len(char.encode("utf-8"))
+            if current_octets + char_octets > limit:
+                lines.append(current)
+                current, current_octets, limit = " ", 1, cls.LINE_OCTETS
+            current += char
+            current_octets += char_octets
+        lines.append(current)
+        return "\r\n".join(lines) + "\r\n"
+
+    def load_events(self) -> QuerySet["Event"]:
+        return self.instructor.events.exclude(
+            event_type=Event.EventType.CANCEL_UNAVAILABILITY
+        ).select_related("training_class__course", "training_class__target_client_company").order_by("start_date")
+
+    def load_cancel_dates(self) -> List[datetime.date]:
+        return sorted(self.instructor.events.filter(
+            event_type=Event.EventType.CANCEL_UNAVAILABILITY
+        ).values_list("start_date", flat=True))
+
+    def iter_content(self) -> Generator[str, None, None]:
+        """逐行生成日历内容"""
+        yield from map(self.fold, [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"PRODID:{self.PRODID}",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{self.escape(self.instructor.username)}的日程",
+        ])
+
+        cancel_dates: List[datetime.date] = self.load_cancel_dates()
+        for event in self.load_events().iterator():
+            if event.event_type == Event.EventType.CLASS_SCHEDULE.value:
+                lines: List[str] = self.build_class_schedule(event)
+            else:
+                lines = self.build_rule(event, cancel_dates)
+
+            yield from map(self.fold, lines)
+
+        yield self.fold("END:VCALENDAR")
+
+    def build_vevent(self, event: Event, summary: str, start_date: datetime.date, lines: List[str]) -> List[str]:
+        return [
+            "BEGIN:VEVENT",
+            f"UID:event-{event.id}@training-center",
+            f"DTSTAMP:{self.last_modified.astimezone(datetime.timezone.utc):%Y%m%dT%H%M%SZ}",
+            f"DTSTART;VALUE=DATE:{self.format_date(start_date)}",
+            f"SUMMARY:{self.escape(summary)}",
+            *lines,
+            "END:VEVENT",
+        ]
+
+    def build_class_schedule(self, event: Event) -> List[str]:
+        """培训班排课: 全天事件, DTEND 不包含在内"""
+        training_class: Optional[TrainingClass] = event.training_class
+        end_date: datetime.date = event.end_date or event.start_date
+        lines: List[str] = [f"DTEND;VALUE=DATE:{self.format_date(end_date + datetime.timedelta(days=1))}"]
+        if training_class:
+            lines.append(f"DESCRIPTION:{self.escape(f'客户公司: {training_class.target_client_company_name}')}")
+            lines.append(f"LOCATION:{self.escape(training_class.location)}")
+
+        return self.build_vevent(event, training_class.name if training_class else "培训班排课", event.start_date, lines)
+
+    def build_rule(self, rule: Event, cancel_dates: List[datetime.date]) -> List[str]:
+        """
+        不可用时间规则: 每次出现为一个全天事件, 通过 RRULE 重复
+        一次性规则按天重复到结束时间, 周期性规则的开始时间取第一次命中规则的日期(RFC 5545 要求 DTSTART 与 RRULE 同步)
+        """
+        first_date: Optional[datetime.date] = self.get_first_date(rule)
+        if first_date is None:
+            return []
+
+        if rule.event_type == Event.EventType.ONE_TIME_UNAVAILABILITY.value:
+            rrule: str = "FREQ=DAILY"
+        elif rule.freq_type == Event.FreqType.MONTHLY:
+            rrule = f"FREQ=MONTHLY;BYMONTHDAY={','.join(map(str, sorted(rule.freq_interval)))}"
+        else:
+            # 每两周以规则开始时间起每7天为一周, 周起始日与规则开始时间的星期一致
+            rrule = f"FREQ=WEEKLY;BYDAY={','.join(self.WEEKDAYS[day] for day in sorted(rule.freq_interval))}"
+            if rule.freq_type == Event.FreqType.BIWEEKLY:
+                rrule += f";INTERVAL=2;WKST={self.WEEKDAYS[rule.start_date.isoweekday()]}"
+
+        if rule.end_date:
+            rrule += f";UNTIL={self.format_date(rule.end_date)}"
+
+        lines: List[str] = [
+            f"DTEND;VALUE=DATE:{self.format_date(first_date + datetime.timedelta(days=1))}",
+            f"RRULE:{rrule}",
+        ]
+
+        # [取消单日不可用时间]优先级高于规则
+        exdates: List[str] = [
+            self.format_date(cancel_date) for cancel_date in cancel_dates
+            if cancel_date >= first_date and EventHandler.is_current_date_in_rule(cancel_date, rule)
+        ]
+        if exdates:
+            lines.append(f"EXDATE;VALUE=DATE:{','.join(exdates)}")
+
+        return self.build_vevent(rule, "不可用", first_date, lines)
+
+    @classmethod
+    def get_first_date(cls, rule: Event) -> Optional[datetime.date]:
+        """规则第一次命中的日期, 最多检查一个周期"""
+        days: int = EventHandler.RULE_PERIOD_DAYS.get(rule.freq_type, 1) \
+            if rule.event_type == Event.EventType.RECURRING_UNAVAILABILITY.value else 1
+        for offset in range(days):
+            current_date: datetime.date = rule.start_date + datetime.timedelta(days=offset)
+            if EventHandler.is_current_date_in_rule(current_date, rule):
+                return current_date
+
+        return None
@@ -0,0 +1,71 @@
+import datetime
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Iterable, List, Optional
+
+from django.db.models import Q
+
+from apps.platform_management.models import Event, Instructor
+
+
+class ScheduleIndex:
+    """
+    讲师日程区间索引
+
+    日程按开始时间排序, 通过二分查找定位区间, 替代逐个日程逐天比较
+    """
+
+    def __init__(self, events: Iterable[Event]):
+        events: List[Event] = sorted(events, key=lambda event: event.start_date)
+
+        # [培训班排课]: 开始时间有序 + 结束时间前缀最大值, 用于判断某区间是否被覆盖
+        self.class_events: List[Event] = [
+            event for event in events if event.event_type == Event.EventType.CLASS_SCHEDULE.value
+        ]
+        self.class_starts: List[datetime.date] = [event.start_date for event in self.class_events]
+        self.class_max_ends: List[datetime.date] = list(accumulate(
+            (event.end_date or datetime.date.max for event in self.class_events), max
+        ))
+
+        # [取消单日不可用时间]: 开始时间有序
+        self.cancel_events: List[Event] = [
+            event for event in events if event.event_type == Event.EventType.CANCEL_UNAVAILABILITY.value
+        ]
+        self.cancel_dates: List[datetime.date] = [event.start_date for event in self.cancel_events]
+
+        # [不可用时间规则]
+        self.rules: List[Event] = [event for event in events if event.event_type in Event.EventType.rule_types]
+
+    @classmethod
+    def build(
+        cls, instructor: Instructor, start_date: datetime.date, end_date: Optional[datetime.date] = None
+    ) -> "ScheduleIndex":
+        """只加载与 [start_date, end_date] 有交集的日程, end_date 为空表示没有结束时间"""
+        events = instructor.events.filter(Q(end_date__gte=start_date) | Q(end_date__isnull=True))
+        if end_date is not None:
+            events = events.filter(start_date__lte=end_date)
+
+        return cls(events)
+
+    def is_covered_by_class(self, start_date: datetime.date, end_date: datetime.date) -> bool:
+        """[start_date, end_date] 是否整段落在某个培训班排课内"""
+        index = bisect_right(self.class_starts, start_date)
+        return index > 0 and self.class_max_ends[index - 1] >= end_date
+
+    def class_events_between(self, start_date: datetime.date, end_date: Optional[datetime.date]) -> List[Event]:
+        """与 [start_date, end_date] 有交集的培训班排课"""
+        stop = len(self.class_events) if end_date is None else bisect_right(self.class_starts, end_date)
+        return [
+            event for event in self.class_events[:stop]
+            if event.end_date is None or event.end_date >= start_date
+        ]
+
+    def cancel_events_between(self, start_date: datetime.date, end_date: Optional[datetime.date]) -> List[Event]:
+        """落在 [start_date, end_date] 内的取消单日不可用时间"""
+        stop = len(self.cancel_events) if end_date is None else bisect_right(self.cancel_dates, end_date)
+        return self.cancel_events[bisect_left(self.cancel_dates, start_date):stop]
+
+    def is_fully_canceled(self, start_date: datetime.date, end_date: datetime.date) -> bool:
+        """[start_date, end_date] 每一天是否都被取消了不可用时间"""
+        canceled_dates = {event.start_date for event in self.cancel_events_between(start_date, end_date)}
+        return len(canceled_dates) == (end_date - start_date).days + 1
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.12 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_lectures', '0013_alter_instructorenrolment_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='advertisement',
+            index=models.Index(fields=['is_revoked', 'deadline_datetime'], name='my_lectures_is_revo_3e233e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instructorenrolment',
+            index=models.Index(fields=['status', 'advertisement'], name='my_lectures_status_b100cb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instructorevent',
+            index=models.Index(fields=['event_type', 'status', 'start_date'], name='my_lectures_event_t_d22f2f_idx'),
+        ),
+    ]
@@ -1,10 +1,13 @@
+import datetime
 from typing import List
 
 from django.db import models
+from django.utils import timezone
 
 from apps.platform_management.models import Instructor
 from apps.teaching_space.models import TrainingClass
 from common.utils import global_constants
+from common.utils.counter_cache import CounterCache, CounterCacheModelMixin
 
 
 class InstructorEvent(models.Model):
@@ -61,15 +64,34 @@ class InstructorEvent(models.Model):
     start_date = models.DateField("开课时间", null=True, blank=True)
     review = models.TextField("课后复盘", default=global_constants.REVIEW_TEMPLATE)
 
+    @property
+    def deadline_date(self) -> datetime.date:
+        """邀请上课的截止日期, 优先使用可预约时间, 没有时为培训班开课时间"""
+        return self.start_date or self.training_class.start_date
+
+    @property
+    def effective_status(self) -> str:
+        """展示状态, 邀请上课过了截止日期仍未处理即为[已超时], 不必等待定时任务(StateSweeper)流转"""
+        if all([
+            self.event_type == self.EventType.INVITE_TO_CLASS,
+            self.status == self.Status.PENDING,
+            self.deadline_date <= timezone.localdate(),
+        ]):
+            return self.Status.TIMEOUT.value
+        return self.status
+
     def __str__(self):
         return f"{self.instructor.username} -> {self.event_name}"
 
     class Meta:
         verbose_name = "讲师事项"
         verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=["event_type", "status", "start_date"]),
+        ]
 
 
-class Advertisement(models.Model):
+class Advertisement(CounterCacheModelMixin, models.Model):
     """广告"""
 
     training_class = models.OneToOneField(
@@ -89,6 +111,9 @@ class Advertisement(models.Model):
     class Meta:
         verbose_name = "广告"
         verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=["is_revoked", "deadline_datetime"]),
+        ]
 
 
 class InstructorEnrolment(models.Model):
@@ -122,3 +147,10 @@ class InstructorEnrolment(models.Model):
     class Meta:
         verbose_name = "讲师报名表"
         verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=["status", "advertisement"]),
+        ]
+
+
+# 冗余计数字段
+CounterCache.register(Advertisement, "enrolment_count", "instructor_enrolments")
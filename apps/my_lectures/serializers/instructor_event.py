@@ -6,6 +6,7 @@ from common.utils.drf.serializer_fields import ChoiceField
 
 
 class InstructorEventListSerializer(serializers.ModelSerializer):
+    status = serializers.CharField(source="effective_status")
     created_datetime = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
 
     class Meta:
@@ -23,6 +24,7 @@ class InstructorEventRetrieveSerializer(serializers.ModelSerializer):
             ]
 
     training_class = TrainingInfoSerializer()
+    status = serializers.CharField(source="effective_status")
     created_datetime = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
 
     class Meta:
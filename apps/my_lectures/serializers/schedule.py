@@ -2,6 +2,7 @@ from rest_framework import serializers
 
 from apps.platform_management.models import Event
 from common.utils.drf.serializer_fields import ChoiceField, MappingField
+from common.utils.drf.serializer_validator import CalendarRangeSerializerValidator
 
 
 class EventCreateSerializer(serializers.ModelSerializer):
@@ -29,7 +30,7 @@ class EventCreateSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class EventListSerializer(serializers.Serializer):
+class EventListSerializer(CalendarRangeSerializerValidator, serializers.Serializer):
     start_date = serializers.DateField(label="开始时间")
     end_date = serializers.DateField(label="结束时间")
 
@@ -42,3 +43,7 @@ class EventRetrieveSerializer(serializers.ModelSerializer):
     class Meta:
         model = Event
         fields = ["id", "freq_type", "start_date", "end_date", "freq_interval", "event_type"]
+
+
+class ScheduleICalSerializer(serializers.Serializer):
+    token = serializers.CharField(label="订阅令牌")
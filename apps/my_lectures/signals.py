@@ -0,0 +1,62 @@
+from typing import Optional, Tuple
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.my_lectures.handles.calendar_cache import CalendarCache
+from apps.my_lectures.handles.day_status import DayStatusHandler
+from apps.platform_management.models import ClientCompany, Event
+from apps.teaching_space.models import TrainingClass
+
+
+@receiver(post_save, sender=Event)
+def materialize_event_day_statuses(sender, instance: Event, **kwargs):
+    """日程变更后重建讲师每日状态, 删除日程时每日状态随外键级联删除"""
+    DayStatusHandler.materialize_event(instance)
+
+
+@receiver(pre_save, sender=Event)
+def remember_event_instructor(sender, instance: Event, **kwargs):
+    """记录修改前的讲师, 讲师变更时两个讲师的日程缓存都需要失效"""
+    previous_instructor_id: Optional[int] = None
+    if instance.pk:
+        previous_instructor_id = Event.objects.filter(pk=instance.pk).values_list("instructor_id", flat=True).first()
+    instance._previous_instructor_id = previous_instructor_id
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_calendar_cache(sender, instance: Event, **kwargs):
+    CalendarCache.bump_event(instance, [getattr(instance, "_previous_instructor_id", None)])
+
+
+@receiver(pre_save, sender=TrainingClass)
+@receiver(pre_delete, sender=TrainingClass)
+def remember_training_class_calendar_scopes(sender, instance: TrainingClass, **kwargs):
+    """记录修改或删除前的日程范围, 更换客户公司后原管理公司的日程缓存也需要失效, 删除后已无法查询"""
+    instance._previous_calendar_scopes = CalendarCache.training_class_scopes(instance.pk) if instance.pk else []
+
+
+@receiver(post_save, sender=TrainingClass)
+@receiver(post_delete, sender=TrainingClass)
+def invalidate_training_class_calendar_cache(sender, instance: TrainingClass, **kwargs):
+    CalendarCache.bump_training_class(instance, getattr(instance, "_previous_calendar_scopes", []))
+
+
+@receiver(pre_save, sender=ClientCompany)
+def remember_client_company_calendar_fields(sender, instance: ClientCompany, **kwargs):
+    """记录修改前的名称和管理公司, 两者都会影响日程"""
+    instance._previous_calendar_fields = ClientCompany.objects.filter(pk=instance.pk).values_list(
+        "name", "affiliated_manage_company_id"
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=ClientCompany)
+def invalidate_client_company_calendar_cache(sender, instance: ClientCompany, created: bool, **kwargs):
+    previous_fields: Optional[Tuple[str, int]] = getattr(instance, "_previous_calendar_fields", None)
+    if created or previous_fields == (instance.name, instance.affiliated_manage_company_id):
+        return
+
+    CalendarCache.bump_client_company(
+        instance.id, [instance.affiliated_manage_company_id, previous_fields[1] if previous_fields else None]
+    )
@@ -0,0 +1,19 @@
+import logging
+
+from apps.my_lectures.handles.day_status import DayStatusHandler
+from celery_app import app
+from common.utils import colorize
+
+logger = logging.getLogger(__name__)
+
+
+@app.task(bind=True)
+@colorize.colorize_func
+def extend_instructor_day_status(func):
+    """延伸讲师每日状态的物化范围, 清理过去的每日状态"""
+    created_count: int = DayStatusHandler.extend_horizon()
+    deleted_count: int = DayStatusHandler.prune()
+
+    logger.info(
+        f"讲师每日状态已物化至 {DayStatusHandler.get_horizon()}, 新增{created_count}条记录, 清理{deleted_count}条记录"
+    )
@@ -2,7 +2,7 @@ import datetime
 from typing import Any, Dict
 
 from django.db import transaction
-from django.db.models import F, QuerySet
+from django.db.models import QuerySet
 from django.utils import timezone
 from rest_framework.decorators import action
 
@@ -32,10 +32,7 @@ class AdvertisementViewSet(ModelViewSet):
     def get_queryset(self):
         now: datetime.datetime = timezone.now().replace(tzinfo=datetime.timezone.utc)
 
-        # 所有讲师报名表处于[待聘用]状态且过了deadline的状态都更新为[已超时]
-        InstructorEnrolment.objects. \
-            filter(status=InstructorEnrolment.Status.PENDING, advertisement__deadline_datetime__lte=now). \
-            update(status=InstructorEnrolment.Status.TIMEOUT)
+        # 过了deadline的讲师报名表由定时任务(StateSweeper)更新为[已过期]
         return super().get_queryset().filter(deadline_datetime__gt=now)
 
     def list(self, request, *args, **kwargs):
@@ -125,7 +122,7 @@ class AdvertisementViewSet(ModelViewSet):
             return Response(result=False, err_msg="该广告与原有日程有冲突，不可报名")
 
         with transaction.atomic():
-            # 创建一条报名状况
+            # 创建一条报名状况, 广告报名人数由 CounterCache 同步加1
             _, created = InstructorEnrolment.objects.get_or_create(
                 instructor=self.request.user,
                 advertisement_id=validated_data["advertisement_id"],
@@ -133,10 +130,6 @@ class AdvertisementViewSet(ModelViewSet):
             if not created:
                 return Response(result=False, err_msg="已参加过报名")
 
-            # 广告报名人数加1
-            advertisement.enrolment_count += 1
-            advertisement.save()
-
         return Response()
 
     @action(methods=["POST"], detail=False)
@@ -145,7 +138,7 @@ class AdvertisementViewSet(ModelViewSet):
         validated_data = self.validated_data
 
         with transaction.atomic():
-            # 删除报名记录
+            # 删除报名记录, 广告报名人数由 CounterCache 同步减1
             deleted, _ = InstructorEnrolment.objects.filter(
                 instructor=self.request.user,
                 advertisement_id=validated_data["advertisement_id"],
@@ -155,10 +148,6 @@ class AdvertisementViewSet(ModelViewSet):
             if not deleted:
                 return Response(result=False, err_msg="找不到该报名记录")
 
-            # 广告报名人数减1
-            Advertisement.objects.filter(id=validated_data["advertisement_id"]).update(
-                enrolment_count=F('enrolment_count') - 1)
-
         return Response()
 
     @action(methods=["GET"], detail=False)
@@ -2,7 +2,6 @@ import datetime
 
 from django.db import transaction
 from django.db.models import QuerySet
-from django.utils import timezone
 from rest_framework.decorators import action
 
 from apps.my_lectures.filters.instructor_event import InstructorEventFilterClass
@@ -36,25 +35,8 @@ class InstructorEventModelViewSet(ModelViewSet):
 
     def get_queryset(self):
         queryset: QuerySet["InstructorEvent"] = super().get_queryset()
-        return queryset.filter(instructor=self.request.user)
-
-    def list(self, request, *args, **kwargs):
-        # 查询已经过了[截至时间]且[未处理]的单据
-        timeout_instructor_events: QuerySet[InstructorEvent] = self.get_queryset().filter(
-            start_date__lte=timezone.now().date(),
-            status=InstructorEvent.Status.PENDING,
-            event_type=InstructorEvent.EventType.INVITE_TO_CLASS
-        )
-
-        # 将单据状态为已超时
-        timeout_instructor_events.update(status=InstructorEvent.Status.TIMEOUT)
-
-        # 培训班发布状态修改为[未发布]
-        TrainingClass.objects. \
-            filter(instructor_event__in=timeout_instructor_events). \
-            update(publish_type=TrainingClass.PublishType.NONE)
-
-        return super().list(request, *args, **kwargs)
+        # 展示状态(effective_status)需要培训班开课时间
+        return queryset.filter(instructor=self.request.user).select_related("training_class")
 
     def create(self, request, *args, **kwargs):
         return Response(result=False)
@@ -69,7 +51,8 @@ class InstructorEventModelViewSet(ModelViewSet):
         if instructor_event.event_type != InstructorEvent.EventType.INVITE_TO_CLASS:
             return Response(result=False, err_msg="该单据类型不属于[邀请上课]")
 
-        if instructor_event.status == InstructorEvent.Status.TIMEOUT.value:
+        # 过了截止日期的单据由定时任务(StateSweeper)流转为[已超时]
+        if instructor_event.effective_status == InstructorEvent.Status.TIMEOUT.value:
             return Response(result=False, err_msg="该单据已过期")
 
         if instructor_event.status != InstructorEvent.Status.PENDING.value:
@@ -1,11 +1,25 @@
+import datetime
+from typing import Optional
+from urllib.parse import urlencode
+
 from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny
 
+from apps.my_lectures.handles.calendar_cache import CalendarCache
 from apps.my_lectures.handles.event import EventHandler
+from apps.my_lectures.handles.ical import ScheduleICalendar
 from apps.my_lectures.serializers.schedule import (
     EventCreateSerializer,
     EventListSerializer,
     EventRetrieveSerializer,
     EventUpdateSerializer,
+    ScheduleICalSerializer,
 )
 from apps.platform_management.models import Event, Instructor
 from common.utils.drf.modelviewset import ModelViewSet
@@ -21,6 +35,7 @@ class ScheduleModelViewSet(ModelViewSet):
         "retrieve": EventRetrieveSerializer,
         "create": EventCreateSerializer,
         "update": EventUpdateSerializer,
+        "ical": ScheduleICalSerializer,
     }
 
     def list(self, request, *args, **kwargs):
@@ -28,7 +43,41 @@ class ScheduleModelViewSet(ModelViewSet):
         validated_data = self.validated_data
 
         events: QuerySet["Event"] = self.get_queryset().filter(instructor=user)
-        return Response(EventHandler.build_calendars(events, validated_data["start_date"], validated_data["end_date"]))
+        return CalendarCache(CalendarCache.instructor_scope(user.id), events).to_response(
+            validated_data["start_date"], validated_data["end_date"]
+        )
+
+    @action(methods=["GET"], detail=False)
+    def ical_url(self, request, *args, **kwargs):
+        """日程订阅链接"""
+        query: str = urlencode({"token": ScheduleICalendar.build_token(self.request.user.id)})
+        return Response({"url": f"{request.build_absolute_uri(reverse('schedule-ical'))}?{query}"})
+
+    @action(methods=["GET"], detail=False, permission_classes=[AllowAny])
+    def ical(self, request, *args, **kwargs):
+        """日程订阅(iCalendar), 日程未变更时返回304"""
+        instructor_id: Optional[int] = ScheduleICalendar.parse_token(self.validated_data["token"])
+        instructor: Optional[Instructor] = Instructor.objects.filter(id=instructor_id).first()
+        if not instructor:
+            return Response(result=False, err_msg="订阅链接无效", status=status.HTTP_404_NOT_FOUND)
+
+        # 日程缓存版本号为毫秒时间戳, 同时作为 ETag 和最后修改时间
+        version: int = CalendarCache.get_version(CalendarCache.instructor_scope(instructor.id))
+        etag, last_modified = f'"{instructor.id}-{version}"', version // 1000
+        not_modified_response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified_response is not None:
+            return not_modified_response
+
+        response = StreamingHttpResponse(
+            ScheduleICalendar(
+                instructor, datetime.datetime.fromtimestamp(last_modified, tz=datetime.timezone.utc)
+            ).iter_content(),
+            content_type="text/calendar; charset=utf-8",
+        )
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "private, no-cache"
+        return response
 
     def create(self, request, *args, **kwargs):
         """日程规则创建"""
@@ -76,14 +76,10 @@ class ClientCompanyModelAdmin(admin.ModelAdmin):
         "contact_email",
         "contact_phone",
         "contact_person",
-        "affiliated_manage_company_name",
+        "affiliated_manage_company__name",
     ]
     form = ClientCompanyModelForm
 
-    @admin.display(description="学员数量")
-    def student_count(self, obj):
-        return obj.student_count
-
 
 @admin.register(ClientStudent)
 class ClientStudentModelAdmin(admin.ModelAdmin):
@@ -91,7 +87,7 @@ class ClientStudentModelAdmin(admin.ModelAdmin):
 
     list_display = ["id", "username", "gender", "id_number", "education", "email", "affiliated_client_company_name"]
     list_filter = ["gender", "education"]
-    search_fields = list_display
+    search_fields = ["id", "username", "gender", "id_number", "education", "email", "affiliated_client_company__name"]
     form = ClientStudentModelForm
 
 
@@ -109,7 +105,14 @@ class ClientApprovalSlipModelAdmin(admin.ModelAdmin):
         "formatted_submission_datetime",
     ]
     list_filter = ["status"]
-    search_fields = list_display
+    search_fields = [
+        "id",
+        "name",
+        "affiliated_manage_company__name",
+        "affiliated_client_company_name",
+        "submitter",
+        "status",
+    ]
     form = ClientApprovalSlipModelForm
 
     @admin.display(description="提单时间", ordering="submission_datetime")
@@ -152,3 +155,12 @@ class EventModelAdmin(admin.ModelAdmin):
     @admin.display(description="结束时间", ordering="end_date")
     def formatted_end_date(self, obj: Event):
         return obj.end_date.strftime("%Y年%m月%d日") if obj.end_date else None
+
+
+@admin.register(SMSOutbox)
+class SMSOutboxModelAdmin(admin.ModelAdmin):
+    """短信发件箱"""
+
+    list_display = ["id", "phone", "template_id", "status", "attempts", "next_attempt_at", "sent_at", "last_error"]
+    list_filter = ["status", "template_id"]
+    search_fields = ["phone", "serial_no"]
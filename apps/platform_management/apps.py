@@ -5,3 +5,9 @@ class PlatformManagementConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.platform_management"
     verbose_name = "平台管理"
+
+    def ready(self):
+        from apps.platform_management import signals  # noqa
+        from common.utils.counter_cache import CounterCache
+
+        CounterCache.connect_signals(self.label)
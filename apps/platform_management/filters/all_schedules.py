@@ -2,7 +2,6 @@ import django_filters
 from django.db.models import QuerySet
 
 from apps.platform_management.models import Event
-from apps.teaching_space.models import TrainingClass
 from common.utils.drf.filters import BaseFilterSet, NumberInFilter
 
 
@@ -13,16 +12,7 @@ class AllScheduleFilterClass(BaseFilterSet):
     training_class = NumberInFilter(field_name="training_class_id")
 
     def filter_manage_company(self, queryset: QuerySet["Event"], name, value):
-        Event.objects.filter(training_class__target_client_company__affiliated_manage_company_name__contains=1)
-        return queryset.filter(
-            training_class__in=TrainingClass.objects.filter(
-                id__in=[
-                    training_class.id
-                    for training_class in TrainingClass.objects.all()
-                    if training_class.affiliated_manage_company.id == value
-                ]
-            )
-        )
+        return queryset.filter(training_class__target_client_company__affiliated_manage_company_id=value)
 
     # def filter_client_company(self, queryset: QuerySet["Event"], name, value):
     #     return queryset.filter(
@@ -1,12 +1,11 @@
 import datetime
 from decimal import Decimal
-from typing import List
 
 import django_filters
-from django.db.models import Q, QuerySet
+from django.db.models import QuerySet
 
-from apps.my_lectures.handles.event import EventHandler
-from apps.platform_management.models import CourseTemplate, Event, Instructor
+from apps.my_lectures.handles.day_status import DayStatusHandler
+from apps.platform_management.models import CourseTemplate, Instructor
 from common.utils import global_constants
 from common.utils.drf.filters import BaseFilterSet, DynamicRangeFilter, PropertyFilter
 
@@ -22,29 +21,13 @@ class InstructorFilterClass(BaseFilterSet):
 
     @staticmethod
     def filter_availability_date(queryset: QuerySet["Instructor"], name: str, start_date: datetime.date):
-        instructor_ids: List = []
         end_date: datetime.date = start_date + datetime.timedelta(days=global_constants.CLASS_DAYS - 1)
 
         # 解除合作的讲师不考虑可预约时间
         queryset = queryset.filter(is_partnered=True)
 
-        # 没有任何时间的讲师一定可以预约
-        event_instructor_ids = Event.objects.filter(
-            Q(start_date__lte=end_date) & (Q(end_date__gte=start_date) | Q(end_date__isnull=True))
-        ).values_list("instructor_id", flat=True)
-        for instructor in queryset:
-            if instructor.id not in event_instructor_ids:
-                instructor_ids.append(instructor.id)
-                continue
-
-            if EventHandler.is_instructor_idle(
-                    instructor=instructor,
-                    start_date=start_date,
-                    end_date=end_date
-            ):
-                instructor_ids.append(instructor.id)
-
-        return queryset.filter(id__in=instructor_ids)
+        # 已物化时按讲师每日状态查询，否则所有讲师的日程一次加载，统一计算
+        return DayStatusHandler.filter_idle_instructors(queryset, start_date, end_date)
 
     @staticmethod
     def filter_course_id(queryset: QuerySet["Instructor"], name: str, course_id: Decimal):
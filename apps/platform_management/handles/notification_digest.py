@@ -0,0 +1,133 @@
+import datetime
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.platform_management.handles.sms_outbox import SMSOutboxHandler
+from apps.platform_management.models import NotificationLedger, SMSOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDigest:
+    """
+    通知汇总
+
+    一次运行中按手机号收集待发送的通知, 去掉当天已经发送过的 (手机号, 模板, 通知对象), 同时写入发送记录;
+    多个通知只有一个模板参数不同时合并为一条短信(如多个培训班名称以、连接), 否则合并后无法对应
+    (如培训班名称和考试时间), 或合并后超过变量长度限制, 每个通知各发送一条;
+    定时任务和手动触发重复执行时不会重复发送
+    """
+
+    SEPARATOR = "、"
+    # 腾讯云短信模板单个变量的长度上限, 超过时接口返回 InvalidParameterValue
+    MAX_PARAM_LENGTH = 35
+    # 发送记录保留天数
+    RETENTION_DAYS = 30
+    LOCK_TIMEOUT = 60 * 5
+
+    def __init__(self, template_id: str, date: Optional[datetime.date] = None):
+        self.template_id = template_id
+        self.date: datetime.date = date or timezone.localdate()
+        # 手机号 -> 通知对象id -> 模板参数
+        self.phone_to_subjects: Dict[str, Dict[int, List[str]]] = defaultdict(dict)
+
+    @property
+    def lock_key(self) -> str:
+        return f"notification_digest:{self.template_id}:{self.date}:lock"
+
+    def add(self, phone: str, subject_id: int, template_params: List[str]):
+        if phone:
+            self.phone_to_subjects[str(phone)][subject_id] = [str(param) for param in template_params]
+
+    def send(self) -> Optional[Dict[str, int]]:
+        """发送汇总后的通知, 同一模板的上一次发送未结束时跳过, 返回接收人数和通知数量"""
+        if not cache.add(self.lock_key, "lock", timeout=self.LOCK_TIMEOUT):
+            return None
+
+        try:
+            return self._send()
+        finally:
+            cache.delete(self.lock_key)
+
+    def _send(self) -> Dict[str, int]:
+        sent: Set[Tuple[str, int]] = set(
+            NotificationLedger.objects.filter(
+                template_id=self.template_id, date=self.date, phone__in=list(self.phone_to_subjects)
+            ).values_list("phone", "subject_id")
+        )
+
+        # (手机号, 模板参数) -> 通知对象id
+        message_to_subject_ids: Dict[Tuple[str, Tuple[str, ...]], List[int]] = {}
+        for phone, subject_id_to_params in self.phone_to_subjects.items():
+            subject_id_to_params = {
+                subject_id: template_params for subject_id, template_params in subject_id_to_params.items()
+                if (phone, subject_id) not in sent
+            }
+            for template_params, subject_ids in self.merge(subject_id_to_params).items():
+                message_to_subject_ids[(phone, template_params)] = subject_ids
+
+        if not settings.ENABLE_NOTIFY_SMS:
+            for phone, template_params in message_to_subject_ids:
+                logger.info(f"模拟给[{phone}]发送短信, 模板: {self.template_id}, 参数: {list(template_params)}")
+            return {"recipients": len({phone for phone, _ in message_to_subject_ids}), "notifications": 0}
+
+        with transaction.atomic():
+            messages: List[SMSOutbox] = SMSOutboxHandler.enqueue_messages(
+                self.template_id,
+                [(phone, list(template_params)) for phone, template_params in message_to_subject_ids],
+            )
+            ledgers: List[NotificationLedger] = [
+                NotificationLedger(
+                    phone=message.phone, template_id=self.template_id, subject_id=subject_id, date=self.date
+                )
+                for message in messages
+                for subject_id in message_to_subject_ids[(message.phone, tuple(message.template_params))]
+            ]
+            NotificationLedger.objects.bulk_create(ledgers, batch_size=SMSOutboxHandler.BATCH_SIZE)
+            NotificationLedger.objects.filter(
+                template_id=self.template_id, date__lt=self.date - datetime.timedelta(days=self.RETENTION_DAYS)
+            ).delete()
+
+        return {"recipients": len({message.phone for message in messages}), "notifications": len(ledgers)}
+
+    @classmethod
+    def merge(cls, subject_id_to_params: Dict[int, List[str]]) -> Dict[Tuple[str, ...], List[int]]:
+        """
+        合并一个手机号的通知, 返回 模板参数 -> 通知对象id;
+        模板参数相同的通知只发一条; 只有一个位置的参数不同时合并该位置(每条不超过 MAX_PARAM_LENGTH), 否则各发一条
+        """
+        params_to_subject_ids: Dict[Tuple[str, ...], List[int]] = defaultdict(list)
+        for subject_id, template_params in subject_id_to_params.items():
+            params_to_subject_ids[tuple(template_params)].append(subject_id)
+        if len(params_to_subject_ids) <= 1:
+            return params_to_subject_ids
+
+        different_positions: List[int] = [
+            position for position, column in enumerate(zip(*params_to_subject_ids)) if len(set(column)) > 1
+        ]
+        if len(different_positions) != 1:
+            return params_to_subject_ids
+
+        # 按顺序合并, 合并后超过 MAX_PARAM_LENGTH 时另起一条
+        position: int = different_positions[0]
+        merged: Dict[Tuple[str, ...], List[int]] = {}
+        values: List[str] = []
+        subject_ids: List[int] = []
+        for template_params, group_subject_ids in params_to_subject_ids.items():
+            if values and len(cls.SEPARATOR.join([*values, template_params[position]])) > cls.MAX_PARAM_LENGTH:
+                merged[cls.replace(template_params, position, cls.SEPARATOR.join(values))] = subject_ids
+                values, subject_ids = [], []
+            values.append(template_params[position])
+            subject_ids.extend(group_subject_ids)
+        merged[cls.replace(template_params, position, cls.SEPARATOR.join(values))] = subject_ids
+        return merged
+
+    @staticmethod
+    def replace(template_params: Tuple[str, ...], position: int, value: str) -> Tuple[str, ...]:
+        return (*template_params[:position], value, *template_params[position + 1:])
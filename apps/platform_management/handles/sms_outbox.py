@@ -0,0 +1,220 @@
+import datetime
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from tencentcloud.sms.v20210111.models import SendStatus
+
+from apps.platform_management.models import SMSOutbox
+from common.utils.sms import SMSClient, ThrottledSendStatus, get_sms_transport
+
+logger = logging.getLogger(__name__)
+
+
+class SMSOutboxHandler:
+    """
+    短信发件箱
+
+    业务代码在事务中调用 enqueue 写入发件箱, 事务提交后触发发送任务, 接口耗时不再占用事务和请求;
+    发送任务按 (模板, 模板参数) 分组, 每组一次请求发送多个手机号, 按每个手机号的发送状态记录结果,
+    失败的短信按指数退避重试, 超过重试次数或不可重试的错误标记为发送失败;
+    超过本地发送频率限制(SMSRateLimiter)的短信不计入重试次数, 延后到可以发送的时间;
+    每次请求前认领短信([发送中]), 请求后立即保存结果, 发送进程中断时认领过期后重新发送
+    """
+
+    BATCH_SIZE = 1000
+    MAX_ATTEMPTS = 5
+    # 第 n 次失败后等待 RETRY_BACKOFF * 2^(n-1) 秒重试
+    RETRY_BACKOFF = 60
+    # 重试也不会成功的错误码(号码错误、黑名单、模板参数错误等)
+    NON_RETRYABLE_CODE_PREFIXES = (
+        "InvalidParameterValue",
+        "FailedOperation.PhoneNumberInBlacklist",
+        "FailedOperation.TemplateIncorrectOrUnapproved",
+        "UnsupportedOperation",
+    )
+    LOCK_KEY = "sms_outbox:lock"
+    LOCK_TIMEOUT = 60 * 5
+    # 认领后未记录结果的短信在该时长后重新发送, 远大于一次请求的超时时间
+    SENDING_TIMEOUT = datetime.timedelta(minutes=10)
+    DELIVER_TASK = "apps.platform_management.tasks.deliver_sms_outbox"
+
+    @classmethod
+    def enqueue(cls, phone_numbers: List[str], template_id: str, template_params: List[str]) -> List[SMSOutbox]:
+        """写入发件箱, 参数与 SMSClient.send_sms 一致"""
+        return cls.enqueue_many(template_id, {phone: template_params for phone in phone_numbers})
+
+    @classmethod
+    def enqueue_many(cls, template_id: str, phone_to_template_params: Dict[str, List[str]]) -> List[SMSOutbox]:
+        """每个手机号使用各自的模板参数, 一次写入发件箱"""
+        return cls.enqueue_messages(template_id, list(phone_to_template_params.items()))
+
+    @classmethod
+    def enqueue_messages(cls, template_id: str, messages: List[Tuple[str, List[str]]]) -> List[SMSOutbox]:
+        """写入多条 (手机号, 模板参数) 短信, 同一手机号可以有多条, 返回的短信与写入顺序一致"""
+        if not settings.ENABLE_NOTIFY_SMS:
+            return []
+
+        if settings.NOTIFY_WHITELIST:
+            messages = [
+                (phone, template_params) for phone, template_params in messages if phone in settings.NOTIFY_WHITELIST
+            ]
+
+        if not messages:
+            return []
+
+        if template_id not in SMSClient.TEMPLATE_ID_TO_TEMPLATE:
+            raise ValueError(f"模板id无效: {template_id}")
+
+        outbox_messages: List[SMSOutbox] = SMSOutbox.objects.bulk_create([
+            SMSOutbox(
+                phone=str(phone), template_id=template_id, template_params=[str(param) for param in template_params]
+            )
+            for phone, template_params in messages
+        ], batch_size=cls.BATCH_SIZE)
+        transaction.on_commit(cls.trigger_delivery)
+        return outbox_messages
+
+    @classmethod
+    def trigger_delivery(cls):
+        """事务提交后立即发送, 消息队列不可用时由定时任务兜底"""
+        from celery_app import app
+
+        try:
+            app.send_task(cls.DELIVER_TASK)
+        except Exception as e:  # noqa
+            logger.warning(f"触发短信发送任务失败, 等待定时任务发送: {e}")
+
+    @classmethod
+    def due_messages(cls) -> QuerySet["SMSOutbox"]:
+        """到期的待发送短信, 以及认领后超过 SENDING_TIMEOUT 仍未记录结果(发送进程中断)的短信"""
+        return SMSOutbox.objects.filter(
+            status__in=[SMSOutbox.Status.PENDING, SMSOutbox.Status.SENDING], next_attempt_at__lte=timezone.now()
+        )
+
+    @classmethod
+    def deliver(cls, transport=None) -> Optional[Dict[str, int]]:
+        """发送到期的短信, 上一次发送未结束时跳过, 返回各状态的短信数量"""
+        if not cache.add(cls.LOCK_KEY, "lock", timeout=cls.LOCK_TIMEOUT):
+            return None
+
+        transport = transport or get_sms_transport()
+        counts: Dict[str, int] = {"sent": 0, "deferred": 0, "retrying": 0, "failed": 0}
+        try:
+            last_id: int = 0
+            while True:
+                batch: List[SMSOutbox] = list(cls.due_messages().filter(id__gt=last_id).order_by("id")[:cls.BATCH_SIZE])
+                if not batch:
+                    return counts
+
+                cls.deliver_batch(batch, transport, counts)
+                last_id = batch[-1].id
+        finally:
+            cache.delete(cls.LOCK_KEY)
+
+    @classmethod
+    def deliver_batch(cls, messages: List[SMSOutbox], transport, counts: Dict[str, int]):
+        group_to_messages: Dict[Tuple[str, Tuple[str, ...]], List[SMSOutbox]] = defaultdict(list)
+        for message in messages:
+            group_to_messages[(message.template_id, tuple(message.template_params))].append(message)
+
+        for (template_id, template_params), group_messages in group_to_messages.items():
+            # 同一分组内相同手机号只发送一次
+            phone_to_message_ids: Dict[str, List[int]] = defaultdict(list)
+            for message in group_messages:
+                phone_to_message_ids[message.phone].append(message.id)
+
+            phones: List[str] = list(phone_to_message_ids)
+            for start in range(0, len(phones), transport.MAX_PHONE_NUMBERS):
+                claimed_messages: List[SMSOutbox] = cls.claim([
+                    message_id for phone in phones[start:start + transport.MAX_PHONE_NUMBERS]
+                    for message_id in phone_to_message_ids[phone]
+                ])
+                if claimed_messages:
+                    cls.send(claimed_messages, template_id, list(template_params), transport, counts)
+
+                # 每次请求后续期锁, 批量较大时发送耗时可能超过 LOCK_TIMEOUT
+                cache.touch(cls.LOCK_KEY, cls.LOCK_TIMEOUT)
+
+    @classmethod
+    def claim(cls, message_ids: List[int]) -> List[SMSOutbox]:
+        """
+        发送前认领短信: 标记为[发送中], 认领在 SENDING_TIMEOUT 内有效;
+        跳过其他进程正在认领或已经处理的短信, 锁过期后并发执行的发送任务不会重复发送
+        """
+        with transaction.atomic():
+            messages: List[SMSOutbox] = list(
+                cls.due_messages().select_for_update(skip_locked=True).filter(id__in=message_ids).order_by("id")
+            )
+            if not messages:
+                return []
+
+            SMSOutbox.objects.filter(id__in=[message.id for message in messages]).update(
+                status=SMSOutbox.Status.SENDING, next_attempt_at=timezone.now() + cls.SENDING_TIMEOUT
+            )
+        return messages
+
+    @classmethod
+    def send(
+        cls, messages: List[SMSOutbox], template_id: str, template_params: List[str], transport, counts: Dict[str, int]
+    ):
+        """同一模板和参数的短信一次请求发送, 请求结束后立即保存结果"""
+        phone_to_messages: Dict[str, List[SMSOutbox]] = defaultdict(list)
+        for message in messages:
+            phone_to_messages[message.phone].append(message)
+
+        phone_to_status: Dict[str, SendStatus] = {}
+        request_error: str = ""
+        try:
+            for status in transport.send_request(list(phone_to_messages), template_id, template_params):
+                # 返回的手机号带 +86 前缀
+                phone_to_status[(status.PhoneNumber or "").replace("+86", "", 1)] = status
+        except Exception as e:  # noqa
+            request_error = f"接口调用失败: {e}"
+
+        for phone, phone_messages in phone_to_messages.items():
+            for message in phone_messages:
+                counts[cls.record(message, phone_to_status.get(phone), request_error)] += 1
+
+        SMSOutbox.objects.bulk_update(
+            messages, fields=["status", "attempts", "next_attempt_at", "last_error", "serial_no", "sent_at"]
+        )
+
+    @classmethod
+    def record(cls, message: SMSOutbox, status: Optional[SendStatus], request_error: str) -> str:
+        """记录一次发送结果, 返回 sent / deferred / retrying / failed"""
+        now: datetime.datetime = timezone.now()
+        if isinstance(status, ThrottledSendStatus):
+            message.status = SMSOutbox.Status.PENDING
+            message.next_attempt_at = now + datetime.timedelta(seconds=status.retry_after)
+            message.last_error = status.Message
+            return "deferred"
+
+        message.attempts += 1
+
+        # Fee代表计费条数, 为 0 代表未计费, 没有正确发送出去
+        if status is not None and status.Fee:
+            message.status = SMSOutbox.Status.SENT
+            message.serial_no = status.SerialNo or ""
+            message.sent_at = now
+            message.last_error = ""
+            return "sent"
+
+        if status is not None:
+            message.last_error = f"状态码: {status.Code}, 错误信息: {status.Message}"
+        else:
+            message.last_error = request_error or "无发送状态"
+
+        code: str = (status.Code or "") if status is not None else ""
+        if message.attempts >= cls.MAX_ATTEMPTS or code.startswith(cls.NON_RETRYABLE_CODE_PREFIXES):
+            message.status = SMSOutbox.Status.FAILED
+            return "failed"
+
+        message.status = SMSOutbox.Status.PENDING
+        message.next_attempt_at = now + datetime.timedelta(seconds=cls.RETRY_BACKOFF * 2 ** (message.attempts - 1))
+        return "retrying"
@@ -0,0 +1,68 @@
+import threading
+import time
+from typing import List, Type
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.utils import load_backend
+
+from common.utils.db_backends.pool import ConnectionPool, PooledDatabaseWrapperMixin
+
+
+class Command(BaseCommand):
+    help = (
+        "对比每次请求重新连接(未池化)与连接池的耗时: 每个请求取连接、执行查询、关闭连接, 与请求结束时 Django 关闭连接一致; "
+        "连接池的健康检查使用 MySQL 连接的 ping, 需要连接 MySQL(如 deploy/docker-compose.yml 中的 db)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default", help="数据库别名")
+        parser.add_argument("--requests", type=int, default=500, help="每个线程的请求数")
+        parser.add_argument("--queries", type=int, default=3, help="每个请求执行的查询数")
+        parser.add_argument("--concurrency", type=int, default=1, help="并发线程数, 模拟 eventlet/gevent worker")
+
+    def handle(self, *args, **options):
+        settings_dict: dict = connections[options["database"]].settings_dict
+        wrapper_class: Type[BaseDatabaseWrapper] = load_backend(settings_dict["ENGINE"]).DatabaseWrapper
+        if issubclass(wrapper_class, PooledDatabaseWrapperMixin):
+            pooled_class: Type[BaseDatabaseWrapper] = wrapper_class
+        else:
+            pooled_class = type("PooledDatabaseWrapper", (PooledDatabaseWrapperMixin, wrapper_class), {})
+        plain_class: Type[BaseDatabaseWrapper] = next(
+            base for base in pooled_class.__mro__[1:] if not issubclass(base, PooledDatabaseWrapperMixin)
+        )
+
+        for name, database_wrapper_class in [("未池化", plain_class), ("连接池", pooled_class)]:
+            alias: str = f"benchmark:{options['database']}"
+            elapsed: float = self.run(database_wrapper_class, settings_dict, alias, options)
+            total_requests: int = options["requests"] * options["concurrency"]
+            self.stdout.write(
+                f"{name}: {total_requests}个请求, 耗时{elapsed:.2f}s, "
+                f"平均{elapsed * 1000 / total_requests:.2f}ms/请求, {total_requests / elapsed:.0f}请求/s"
+            )
+
+            pool = ConnectionPool.pools.pop(alias, None)
+            if pool is not None:
+                self.stdout.write(f"{name}: {pool.stats}")
+                pool.clear()
+
+    @staticmethod
+    def run(database_wrapper_class: Type[BaseDatabaseWrapper], settings_dict: dict, alias: str, options: dict) -> float:
+        def worker():
+            # 与 Django 一样每个线程使用自己的 DatabaseWrapper
+            connection: BaseDatabaseWrapper = database_wrapper_class(settings_dict, alias)
+            for _ in range(options["requests"]):
+                with connection.cursor() as cursor:
+                    for _ in range(options["queries"]):
+                        cursor.execute("SELECT 1")
+                        cursor.fetchone()
+                connection.close()
+
+        threads: List[threading.Thread] = [threading.Thread(target=worker) for _ in range(options["concurrency"])]
+        start_time: float = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start_time
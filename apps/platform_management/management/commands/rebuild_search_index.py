@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from common.utils.drf.search import SearchIndex
+
+
+class Command(BaseCommand):
+    help = "重建默认搜索的 n-gram 词元(使用 MySQL FULLTEXT 索引时无需执行)"
+
+    def handle(self, *args, **kwargs):
+        for model in list(SearchIndex.registry):
+            count: int = SearchIndex.rebuild(model)
+            self.stdout.write(f"{model._meta.label}: {count}")
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.12 on 2026-10-18 17:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform_management', '0040_auto_20250109_1838'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstructorDayStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('status', models.CharField(
+                    choices=[('class_schedule', '培训班排课'), ('unavailable', '不可用'), ('canceled', '取消不可用')], max_length=16,
+                    verbose_name='状态')),
+                ('event', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='day_statuses',
+                    to='platform_management.event', verbose_name='日程事件')),
+                ('instructor', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='day_statuses',
+                    to='platform_management.instructor', verbose_name='讲师')),
+            ],
+            options={
+                'verbose_name': '讲师每日状态',
+                'verbose_name_plural': '讲师每日状态',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='instructordaystatus',
+            index=models.Index(fields=['instructor', 'date'], name='platform_ma_instruc_9e0e74_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='instructordaystatus',
+            index=models.Index(fields=['date', 'status'], name='platform_ma_date_0dacda_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='instructordaystatus',
+            unique_together={('event', 'date')},
+        ),
+    ]
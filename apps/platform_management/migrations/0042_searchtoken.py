@@ -0,0 +1,77 @@
+# Generated by Django 3.2.12 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+# 默认搜索的 FULLTEXT 索引, 迁移中固定 SQL, 不依赖运行时代码
+FULLTEXT_TABLE_TO_COLUMNS = {
+    'platform_management_instructor': ['username', 'introduction', 'city'],
+    'platform_management_clientstudent': [
+        'username', 'affiliated_client_company_name', 'email', 'phone', 'department', 'position', 'gender',
+        'id_number', 'education',
+    ],
+    'platform_management_clientcompany': ['name', 'contact_email', 'affiliated_manage_company_name'],
+    'platform_management_coursetemplate': ['name', 'course_overview'],
+}
+
+
+def index_name(table):
+    """与 FullTextBackend.index_name 一致: ft_<model_name>_search"""
+    return f"ft_{table[len('platform_management_'):]}_search"
+
+
+def is_fulltext_available(schema_editor):
+    """MySQL 5.7.6 起内置 ngram 分词, MariaDB 不支持"""
+    connection = schema_editor.connection
+    return connection.vendor == 'mysql' and not connection.mysql_is_mariadb
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    if not is_fulltext_available(schema_editor):
+        return
+
+    for table, columns in FULLTEXT_TABLE_TO_COLUMNS.items():
+        schema_editor.execute(
+            f"ALTER TABLE `{table}` ADD FULLTEXT INDEX `{index_name(table)}` "
+            f"({', '.join(f'`{column}`' for column in columns)}) WITH PARSER ngram"
+        )
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if not is_fulltext_available(schema_editor):
+        return
+
+    for table in FULLTEXT_TABLE_TO_COLUMNS:
+        schema_editor.execute(f"ALTER TABLE `{table}` DROP INDEX `{index_name(table)}`")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform_management', '0041_instructordaystatus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=64, verbose_name='模型')),
+                ('object_id', models.BigIntegerField(verbose_name='记录id')),
+                ('token', models.CharField(max_length=2, verbose_name='词元')),
+                ('count', models.PositiveIntegerField(default=1, verbose_name='出现次数')),
+            ],
+            options={
+                'verbose_name': '搜索词元',
+                'verbose_name_plural': '搜索词元',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchtoken',
+            index=models.Index(fields=['model', 'token', 'object_id'], name='platform_ma_model_c91be7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchtoken',
+            index=models.Index(fields=['model', 'object_id'], name='platform_ma_model_46267b_idx'),
+        ),
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
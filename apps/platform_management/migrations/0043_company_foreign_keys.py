@@ -0,0 +1,51 @@
+# Generated by Django 3.2.12 on 2026-10-18 20:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform_management', '0042_searchtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientcompany',
+            name='affiliated_manage_company',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.CASCADE, to='platform_management.managecompany',
+                verbose_name='管理公司'),
+        ),
+        migrations.AddField(
+            model_name='clientstudent',
+            name='affiliated_client_company',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.CASCADE, to='platform_management.clientcompany',
+                verbose_name='客户公司'),
+        ),
+        migrations.AddField(
+            model_name='clientapprovalslip',
+            name='affiliated_manage_company',
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.CASCADE, related_name='client_approval_slips',
+                to='platform_management.managecompany', verbose_name='管理公司'),
+        ),
+        # 名称字段改为可空, 回滚时重新添加的名称列由 0044 回填
+        migrations.AlterField(
+            model_name='clientcompany',
+            name='affiliated_manage_company_name',
+            field=models.CharField(max_length=128, null=True, verbose_name='管理公司'),
+        ),
+        migrations.AlterField(
+            model_name='clientstudent',
+            name='affiliated_client_company_name',
+            field=models.CharField(max_length=128, null=True, verbose_name='客户公司'),
+        ),
+        migrations.AlterField(
+            model_name='clientapprovalslip',
+            name='affiliated_manage_company_name',
+            field=models.CharField(max_length=128, null=True, verbose_name='管理公司'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.12 on 2026-10-18 20:10
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+# 每批回填的记录数, 避免长时间锁表
+BATCH_SIZE = 1000
+
+# (模型, 外键, 名称字段, 外键指向的模型)
+FOREIGN_KEYS = [
+    ('ClientCompany', 'affiliated_manage_company', 'affiliated_manage_company_name', 'ManageCompany'),
+    ('ClientStudent', 'affiliated_client_company', 'affiliated_client_company_name', 'ClientCompany'),
+    ('ClientApprovalSlip', 'affiliated_manage_company', 'affiliated_manage_company_name', 'ManageCompany'),
+]
+
+
+def iter_batches(queryset):
+    """按 id 分批"""
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:BATCH_SIZE])
+        if not ids:
+            return
+        yield queryset.filter(id__in=ids)
+        last_id = ids[-1]
+
+
+def backfill_foreign_keys(apps, schema_editor):
+    # 先检查所有名称都能找到对应的公司, 避免回填到一半失败
+    missing_names = {}
+    for model_name, _, name_field, related_model_name in FOREIGN_KEYS:
+        model = apps.get_model('platform_management', model_name)
+        related_model = apps.get_model('platform_management', related_model_name)
+        names = set(model.objects.values_list(name_field, flat=True).distinct())
+        names -= set(related_model.objects.filter(name__in=names).values_list('name', flat=True))
+        if names:
+            missing_names[model_name] = sorted(names)
+
+    if missing_names:
+        raise RuntimeError(f'以下名称找不到对应的公司, 请先修正数据后重新迁移: {missing_names}')
+
+    for model_name, foreign_key, name_field, related_model_name in FOREIGN_KEYS:
+        model = apps.get_model('platform_management', model_name)
+        related_model = apps.get_model('platform_management', related_model_name)
+        related_id = Subquery(related_model.objects.filter(name=OuterRef(name_field)).values('id')[:1])
+        for batch in iter_batches(model.objects.filter(**{f'{foreign_key}__isnull': True})):
+            batch.update(**{f'{foreign_key}_id': related_id})
+
+
+def backfill_names(apps, schema_editor):
+    for model_name, foreign_key, name_field, _ in FOREIGN_KEYS:
+        model = apps.get_model('platform_management', model_name)
+        related_model = model._meta.get_field(foreign_key).related_model
+        related_name = Subquery(related_model.objects.filter(id=OuterRef(f'{foreign_key}_id')).values('name')[:1])
+        for batch in iter_batches(model.objects.all()):
+            batch.update(**{name_field: related_name})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform_management', '0043_company_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_foreign_keys, backfill_names),
+    ]
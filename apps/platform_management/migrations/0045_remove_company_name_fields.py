@@ -0,0 +1,102 @@
+# Generated by Django 3.2.12 on 2026-10-18 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# 名称字段删除前后的 FULLTEXT 索引列, 迁移中固定 SQL, 不依赖运行时代码
+FULLTEXT_TABLE_TO_COLUMNS_BEFORE = {
+    'platform_management_clientstudent': [
+        'username', 'affiliated_client_company_name', 'email', 'phone', 'department', 'position', 'gender',
+        'id_number', 'education',
+    ],
+    'platform_management_clientcompany': ['name', 'contact_email', 'affiliated_manage_company_name'],
+}
+FULLTEXT_TABLE_TO_COLUMNS_AFTER = {
+    'platform_management_clientstudent': [
+        'username', 'email', 'phone', 'department', 'position', 'gender', 'id_number', 'education',
+    ],
+    'platform_management_clientcompany': ['name', 'contact_email'],
+}
+
+
+def index_name(table):
+    """与 FullTextBackend.index_name 一致: ft_<model_name>_search"""
+    return f"ft_{table[len('platform_management_'):]}_search"
+
+
+def is_fulltext_available(schema_editor):
+    connection = schema_editor.connection
+    return connection.vendor == 'mysql' and not connection.mysql_is_mariadb
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if not is_fulltext_available(schema_editor):
+        return
+
+    for table in FULLTEXT_TABLE_TO_COLUMNS_AFTER:
+        schema_editor.execute(f"ALTER TABLE `{table}` DROP INDEX `{index_name(table)}`")
+
+
+def create_fulltext_indexes(table_to_columns):
+    def create(apps, schema_editor):
+        if not is_fulltext_available(schema_editor):
+            return
+
+        for table, columns in table_to_columns.items():
+            schema_editor.execute(
+                f"ALTER TABLE `{table}` ADD FULLTEXT INDEX `{index_name(table)}` "
+                f"({', '.join(f'`{column}`' for column in columns)}) WITH PARSER ngram"
+            )
+
+    return create
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform_management', '0044_backfill_company_foreign_keys'),
+    ]
+
+    operations = [
+        # 名称字段包含在 FULLTEXT 索引中, 删除字段后按新的字段列表重建
+        migrations.RunPython(drop_fulltext_indexes, create_fulltext_indexes(FULLTEXT_TABLE_TO_COLUMNS_BEFORE)),
+        migrations.RemoveField(
+            model_name='clientapprovalslip',
+            name='affiliated_manage_company_name',
+        ),
+        migrations.RemoveField(
+            model_name='clientcompany',
+            name='affiliated_manage_company_name',
+        ),
+        migrations.RemoveField(
+            model_name='clientstudent',
+            name='affiliated_client_company_name',
+        ),
+        migrations.AlterField(
+            model_name='clientapprovalslip',
+            name='affiliated_client_company_name',
+            field=models.CharField(db_index=True, max_length=128, verbose_name='客户公司'),
+        ),
+        migrations.AlterField(
+            model_name='clientapprovalslip',
+            name='affiliated_manage_company',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, related_name='client_approval_slips',
+                to='platform_management.managecompany', verbose_name='管理公司'),
+        ),
+        migrations.AlterField(
+            model_name='clientcompany',
+            name='affiliated_manage_company',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to='platform_management.managecompany',
+                verbose_name='管理公司'),
+        ),
+        migrations.AlterField(
+            model_name='clientstudent',
+            name='affiliated_client_company',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to='platform_management.clientcompany',
+                verbose_name='客户公司'),
+        ),
+        migrations.RunPython(create_fulltext_indexes(FULLTEXT_TABLE_TO_COLUMNS_AFTER), drop_fulltext_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.12 on 2026-10-18 18:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_students(apps, schema_editor):
+    ClientCompany = apps.get_model('platform_management', 'ClientCompany')
+    ClientStudent = apps.get_model('platform_management', 'ClientStudent')
+
+    student_count = ClientStudent.objects.filter(affiliated_client_company=OuterRef('pk')).order_by().values(
+        'affiliated_client_company'
+    ).annotate(count=Count('pk')).values('count')
+    ClientCompany.objects.update(student_count=Coalesce(Subquery(student_count), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform_management', '0045_remove_company_name_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientcompany',
+            name='student_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='学员数量'),
+        ),
+        migrations.RunPython(count_students, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.12 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform_management', '0046_clientcompany_student_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coursetemplate',
+            name='class_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='开班次数'),
+        ),
+        migrations.AlterField(
+            model_name='coursetemplate',
+            name='client_company_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='客户数'),
+        ),
+        migrations.AlterField(
+            model_name='coursetemplate',
+            name='num_instructors',
+            field=models.IntegerField(default=0, editable=False, verbose_name='讲师数量'),
+        ),
+        migrations.AlterField(
+            model_name='coursetemplate',
+            name='trainees_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='培训人次'),
+        ),
+    ]
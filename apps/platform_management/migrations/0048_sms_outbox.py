@@ -0,0 +1,40 @@
+# Generated by Django 3.2.12 on 2026-10-18 18:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform_management', '0047_course_template_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SMSOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=32, verbose_name='手机号')),
+                ('template_id', models.CharField(max_length=32, verbose_name='模板id')),
+                ('template_params', models.JSONField(default=list, verbose_name='模板参数')),
+                ('status', models.CharField(
+                    choices=[('pending', '待发送'), ('sent', '已发送'), ('failed', '发送失败')], default='pending', max_length=16,
+                    verbose_name='状态')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='发送次数')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='下次发送时间')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='最近一次错误')),
+                ('serial_no', models.CharField(blank=True, default='', max_length=64, verbose_name='发送流水号')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='发送时间')),
+            ],
+            options={
+                'verbose_name': '短信发件箱',
+                'verbose_name_plural': '短信发件箱',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='smsoutbox',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='platform_ma_status_2ffc1e_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.12 on 2026-10-18 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform_management', '0048_sms_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=32, verbose_name='手机号')),
+                ('template_id', models.CharField(max_length=32, verbose_name='模板id')),
+                ('subject_id', models.BigIntegerField(verbose_name='通知对象id')),
+                ('date', models.DateField(verbose_name='通知日期')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '通知发送记录',
+                'verbose_name_plural': '通知发送记录',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notificationledger',
+            index=models.Index(fields=['template_id', 'date'], name='platform_ma_templat_aaeb44_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='notificationledger',
+            unique_together={('phone', 'template_id', 'subject_id', 'date')},
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.12 on 2026-10-18 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform_management', '0049_notification_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='smsoutbox',
+            name='status',
+            field=models.CharField(
+                choices=[('pending', '待发送'), ('sending', '发送中'), ('sent', '已发送'), ('failed', '发送失败')],
+                default='pending', max_length=16, verbose_name='状态'),
+        ),
+    ]
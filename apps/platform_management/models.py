@@ -1,11 +1,16 @@
 from typing import List
 
 from django.contrib.auth.models import AbstractUser, Group, Permission
-from django.db import models, transaction
-from django.db.models import QuerySet
+from django.db import models
+from django.db.models import F, QuerySet
+from django.utils import timezone
 from django.utils.functional import classproperty
 
 from common.utils import global_constants
+from common.utils.counter_cache import CounterCache, CounterCacheModelMixin
+from common.utils.drf.property_expressions import PropertyExpressions
+from common.utils.drf.search import SearchIndex
+from common.utils.identity_map import IdentityMap
 
 
 class Attachment(models.Model):
@@ -68,10 +73,11 @@ class CourseTemplate(models.Model):
     assessment_method = models.CharField("考核方式", choices=AssessmentMethod.choices, max_length=16)
     attachments = models.JSONField("附件区域", default=list)
     certification = models.CharField("认证证书", max_length=32)
-    trainees_count = models.IntegerField("培训人次")
-    client_company_count = models.IntegerField("客户数")
-    class_count = models.IntegerField("开班次数")
-    num_instructors = models.IntegerField("讲师数量")
+    # 统计字段, 由培训班变更批量更新(CourseStatisticsHandler)
+    trainees_count = models.IntegerField("培训人次", default=0, editable=False)
+    client_company_count = models.IntegerField("客户数", default=0, editable=False)
+    class_count = models.IntegerField("开班次数", default=0, editable=False)
+    num_instructors = models.IntegerField("讲师数量", default=0, editable=False)
     material_content = models.TextField("教材内容")  # 富文本
     course_overview = models.TextField("课程概述")
     target_students = models.TextField("目标学员", default="")  # 富文本
@@ -97,7 +103,7 @@ class CourseTemplate(models.Model):
 
     @classproperty
     def names(self):
-        return list(self.objects.values_list("name", flat=True))
+        return IdentityMap.values(self, "name")
 
     class Meta:
         ordering = ["-id"]
@@ -119,7 +125,7 @@ class ManageCompany(models.Model):
     @property
     def client_companies(self) -> QuerySet["ClientCompany"]:
         """该管理公司下所有客户公司"""
-        return ClientCompany.objects.filter(affiliated_manage_company_name=self.name)
+        return ClientCompany.objects.filter(affiliated_manage_company_id=self.id)
 
     @property
     def client_company_names(self) -> List[str]:
@@ -129,28 +135,18 @@ class ManageCompany(models.Model):
     @property
     def students(self) -> QuerySet["ClientStudent"]:
         """该管理公司下所有客户学员"""
-        return ClientStudent.objects.filter(
-            affiliated_client_company_name__in=self.client_companies.values_list("name", flat=True)
-        )
+        return ClientStudent.objects.filter(affiliated_client_company__affiliated_manage_company_id=self.id)
 
     @classproperty
     def names(self) -> List[str]:
         """管理公司所有名称"""
-        return list(self.objects.values_list("name", flat=True))
+        return IdentityMap.values(self, "name")
 
     def delete(self, using=None, keep_parents=False):
         """删除管理公司时删除下面所有客户公司"""
         self.client_companies.delete()
         super().delete(using, keep_parents)
 
-    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
-        with transaction.atomic():
-            ClientCompany.objects. \
-                filter(affiliated_manage_company_name=ManageCompany.objects.get(id=self.id).name). \
-                update(affiliated_manage_company_name=self.name)
-
-            super().save(force_insert, force_update, using, update_fields)
-
     def __str__(self):
         return self.name
 
@@ -190,7 +186,7 @@ class Administrator(AbstractUser):
 
     @property
     def affiliated_manage_company_name(self) -> str:
-        return self.affiliated_manage_company.name
+        return IdentityMap.related(self, "affiliated_manage_company").name
 
     @property
     def is_super_administrator(self) -> bool:
@@ -253,7 +249,7 @@ class Instructor(models.Model):
         verbose_name_plural = verbose_name
 
 
-class ClientCompany(models.Model):
+class ClientCompany(CounterCacheModelMixin, models.Model):
     """客户公司"""
 
     class PaymentMethod(models.TextChoices):
@@ -268,7 +264,11 @@ class ClientCompany(models.Model):
     contact_phone = models.CharField("电话", max_length=16)
     contact_email = models.EmailField("邮箱", max_length=256)
     payment_method = models.CharField("参会费支付方式", choices=PaymentMethod.choices, max_length=32)
-    affiliated_manage_company_name = models.CharField("管理公司", max_length=128)
+    affiliated_manage_company = models.ForeignKey(
+        ManageCompany,
+        on_delete=models.CASCADE,
+        verbose_name="管理公司",
+    )
 
     # 通讯信息
     certificate_address = models.CharField("证书收件地址", max_length=256)
@@ -283,23 +283,26 @@ class ClientCompany(models.Model):
     bank_name = models.CharField("开户行", max_length=128)
     bank_account = models.CharField("账号", max_length=64)
 
+    # 冗余计数, 由 CounterCache 维护
+    student_count = models.IntegerField("学员数量", default=0, editable=False)
     created_date = models.DateField("创建时间", auto_now_add=True)
 
     @property
     def students(self) -> QuerySet["ClientStudent"]:
-        return ClientStudent.objects.filter(affiliated_client_company_name=self.name)
+        return ClientStudent.objects.filter(affiliated_client_company_id=self.id)
 
     @property
-    def affiliated_manage_company(self) -> ManageCompany:
-        return ManageCompany.objects.get(name=self.affiliated_manage_company_name)
+    def affiliated_manage_company_name(self) -> str:
+        return IdentityMap.related(self, "affiliated_manage_company").name
 
-    @property
-    def student_count(self) -> int:
-        return self.students.count()
+    @affiliated_manage_company_name.setter
+    def affiliated_manage_company_name(self, name: str):
+        """兼容按名称写入管理公司"""
+        self.affiliated_manage_company = IdentityMap.get(ManageCompany, name=name)
 
     @classproperty
     def names(self) -> List[str]:
-        return list(self.objects.values_list("name", flat=True))
+        return IdentityMap.values(self, "name")
 
     def delete(self, using=None, keep_parents=False):
         from apps.teaching_space.models import TrainingClass
@@ -308,14 +311,6 @@ class ClientCompany(models.Model):
         self.students.delete()
         super().delete(using, keep_parents)
 
-    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
-        with transaction.atomic():
-            ClientStudent.objects. \
-                filter(affiliated_client_company_name=ClientCompany.objects.get(id=self.id).name). \
-                update(affiliated_client_company_name=self.name)
-
-            super().save(force_insert, force_update, using, update_fields)
-
     def __str__(self):
         return self.name
 
@@ -340,7 +335,11 @@ class ClientStudent(models.Model):
     education = models.CharField("学历", choices=Education.choices, max_length=32)
     phone = models.CharField("电话", max_length=16, unique=True)
     email = models.EmailField("邮箱", max_length=256, blank=True)
-    affiliated_client_company_name = models.CharField("客户公司", max_length=128)
+    affiliated_client_company = models.ForeignKey(
+        ClientCompany,
+        on_delete=models.CASCADE,
+        verbose_name="客户公司",
+    )
     department = models.CharField("部门", max_length=128, blank=True)
     position = models.CharField("职位", max_length=128, blank=True)
     id_photo = models.JSONField("证件照")
@@ -349,12 +348,17 @@ class ClientStudent(models.Model):
     created_date = models.DateField("创建时间", auto_now_add=True)
 
     @property
-    def affiliated_client_company(self) -> ClientCompany:
-        return ClientCompany.objects.get(name=self.affiliated_client_company_name)
+    def affiliated_client_company_name(self) -> str:
+        return IdentityMap.related(self, "affiliated_client_company").name
+
+    @affiliated_client_company_name.setter
+    def affiliated_client_company_name(self, name: str):
+        """兼容按名称写入客户公司"""
+        self.affiliated_client_company = IdentityMap.get(ClientCompany, name=name)
 
     @property
     def affiliated_manage_company(self) -> ManageCompany:
-        return ManageCompany.objects.get(name=self.affiliated_client_company.affiliated_manage_company_name)
+        return IdentityMap.related(IdentityMap.related(self, "affiliated_client_company"), "affiliated_manage_company")
 
     @property
     def affiliated_manage_company_name(self) -> str:
@@ -362,7 +366,7 @@ class ClientStudent(models.Model):
 
     @property
     def affiliated_manage_company_id(self) -> int:
-        return self.affiliated_manage_company.id
+        return IdentityMap.related(self, "affiliated_client_company").affiliated_manage_company_id
 
     @property
     def is_anonymous(self) -> bool:
@@ -405,20 +409,31 @@ class ClientApprovalSlip(models.Model):
         REJECTED = "rejected", "驳回"
 
     name = models.CharField("标题", max_length=128)
-    affiliated_manage_company_name = models.CharField("管理公司", max_length=128)
-    affiliated_client_company_name = models.CharField("客户公司", max_length=128)
+    affiliated_manage_company = models.ForeignKey(
+        ManageCompany,
+        on_delete=models.CASCADE,
+        verbose_name="管理公司",
+        related_name="client_approval_slips",
+    )
+    # 申请的客户公司在审批通过后才创建, 保留名称
+    affiliated_client_company_name = models.CharField("客户公司", max_length=128, db_index=True)
     submitter = models.CharField("提单人", max_length=128)
     status = models.CharField("状态", choices=Status.choices, max_length=32, default=Status.PENDING.value)
     submission_datetime = models.DateTimeField("提单时间")
     submission_info = models.JSONField("提交信息", default=dict)
 
     @property
-    def affiliated_manage_company(self) -> ManageCompany:
-        return ManageCompany.objects.get(name=self.affiliated_manage_company_name)
+    def affiliated_manage_company_name(self) -> str:
+        return IdentityMap.related(self, "affiliated_manage_company").name
+
+    @affiliated_manage_company_name.setter
+    def affiliated_manage_company_name(self, name: str):
+        """兼容按名称写入管理公司"""
+        self.affiliated_manage_company = IdentityMap.get(ManageCompany, name=name)
 
     @property
     def affiliated_client_company(self) -> ClientCompany:
-        return ClientCompany.objects.get(name=self.affiliated_client_company_name)
+        return IdentityMap.get(ClientCompany, name=self.affiliated_client_company_name)
 
     def __str__(self):
         return self.name
@@ -484,3 +499,131 @@ class Event(models.Model):
     class Meta:
         verbose_name = "日程事件"
         verbose_name_plural = verbose_name
+
+
+class InstructorDayStatus(models.Model):
+    """讲师每日状态, 由日程事件按天物化, 用于按日期直接查询讲师是否空闲"""
+
+    class Status(models.TextChoices):
+        CLASS_SCHEDULE = "class_schedule", "培训班排课"
+        UNAVAILABLE = "unavailable", "不可用"
+        CANCELED = "canceled", "取消不可用"
+
+    instructor = models.ForeignKey(
+        Instructor, related_name="day_statuses", verbose_name="讲师", on_delete=models.CASCADE
+    )
+    date = models.DateField("日期")
+    status = models.CharField("状态", max_length=16, choices=Status.choices)
+    event = models.ForeignKey(Event, related_name="day_statuses", verbose_name="日程事件", on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = "讲师每日状态"
+        verbose_name_plural = verbose_name
+        unique_together = [("event", "date")]
+        indexes = [
+            models.Index(fields=["instructor", "date"]),
+            models.Index(fields=["date", "status"]),
+        ]
+
+
+class SearchToken(models.Model):
+    """默认搜索的 n-gram 词元, 未使用 MySQL FULLTEXT 索引时由保存信号维护"""
+
+    model = models.CharField("模型", max_length=64)
+    object_id = models.BigIntegerField("记录id")
+    token = models.CharField("词元", max_length=2)
+    count = models.PositiveIntegerField("出现次数", default=1)
+
+    class Meta:
+        verbose_name = "搜索词元"
+        verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=["model", "token", "object_id"]),
+            models.Index(fields=["model", "object_id"]),
+        ]
+
+
+class SMSOutbox(models.Model):
+    """短信发件箱, 与业务数据在同一事务中写入, 由定时任务分组批量发送, 失败按退避时间重试"""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "待发送"
+        SENDING = "sending", "发送中"
+        SENT = "sent", "已发送"
+        FAILED = "failed", "发送失败"
+
+    phone = models.CharField("手机号", max_length=32)
+    template_id = models.CharField("模板id", max_length=32)
+    template_params = models.JSONField("模板参数", default=list)
+    status = models.CharField("状态", max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField("发送次数", default=0)
+    next_attempt_at = models.DateTimeField("下次发送时间", default=timezone.now)
+    last_error = models.TextField("最近一次错误", blank=True, default="")
+    serial_no = models.CharField("发送流水号", max_length=64, blank=True, default="")
+    created_at = models.DateTimeField("创建时间", auto_now_add=True)
+    sent_at = models.DateTimeField("发送时间", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "短信发件箱"
+        verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+
+class NotificationLedger(models.Model):
+    """通知发送记录, 同一手机号同一模板的同一对象(讲师事项、考试等)每天只通知一次"""
+
+    phone = models.CharField("手机号", max_length=32)
+    template_id = models.CharField("模板id", max_length=32)
+    subject_id = models.BigIntegerField("通知对象id")
+    date = models.DateField("通知日期")
+    created_at = models.DateTimeField("创建时间", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "通知发送记录"
+        verbose_name_plural = verbose_name
+        unique_together = [("phone", "template_id", "subject_id", "date")]
+        indexes = [
+            models.Index(fields=["template_id", "date"]),
+        ]
+
+
+# 属性对应的 ORM 表达式, 用于在数据库中筛选、搜索和排序
+PropertyExpressions.register(
+    Administrator,
+    affiliated_manage_company_name=F("affiliated_manage_company__name"),
+)
+
+PropertyExpressions.register(
+    ClientCompany,
+    affiliated_manage_company_name=F("affiliated_manage_company__name"),
+)
+
+PropertyExpressions.register(
+    ClientStudent,
+    affiliated_client_company_name=F("affiliated_client_company__name"),
+    affiliated_manage_company_name=F("affiliated_client_company__affiliated_manage_company__name"),
+    affiliated_manage_company_id=F("affiliated_client_company__affiliated_manage_company_id"),
+)
+
+PropertyExpressions.register(
+    ClientApprovalSlip,
+    affiliated_manage_company_name=F("affiliated_manage_company__name"),
+)
+
+# 默认搜索框的索引字段, 与各 FilterSet 中参与 default 搜索的字符串字段一致
+SearchIndex.register(Instructor, "username", "introduction", "city")
+SearchIndex.register(
+    ClientStudent, "username", "email", "phone", "department", "position", "gender", "id_number", "education",
+)
+SearchIndex.register(ClientCompany, "name", "contact_email")
+SearchIndex.register(CourseTemplate, "name", "course_overview")
+
+# 请求内按 id / 名称 查找的参考表
+IdentityMap.register(ManageCompany, "name")
+IdentityMap.register(ClientCompany, "name")
+IdentityMap.register(CourseTemplate, "name")
+
+# 冗余计数字段
+CounterCache.register(ClientCompany, "student_count", "clientstudent")
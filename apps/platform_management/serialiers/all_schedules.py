@@ -1,6 +1,8 @@
 from rest_framework import serializers
 
+from common.utils.drf.serializer_validator import CalendarRangeSerializerValidator
 
-class AllScheduleListSerializer(serializers.Serializer):
+
+class AllScheduleListSerializer(CalendarRangeSerializerValidator, serializers.Serializer):
     start_date = serializers.DateField(label="开始时间")
     end_date = serializers.DateField(label="结束时间")
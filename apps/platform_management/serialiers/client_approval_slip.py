@@ -15,6 +15,7 @@ from common.utils.drf.serializer_fields import ChoiceField
 
 class ClientApprovalSlipListSerializer(serializers.ModelSerializer):
     submission_datetime = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
+    affiliated_manage_company_name = serializers.CharField(label="管理公司", read_only=True)
 
     class Meta:
         model = ClientApprovalSlip
@@ -23,6 +24,7 @@ class ClientApprovalSlipListSerializer(serializers.ModelSerializer):
 
 class ClientApprovalSlipCreateSerializer(serializers.ModelSerializer):
     submission_info = ClientCompanyCreateSerializer(label="客户公司申请信息")
+    affiliated_manage_company_name = serializers.CharField(label="管理公司", read_only=True)
 
     def to_internal_value(self, data):
         if ClientCompany.objects.filter(name=data.get("name", "")).exists():
@@ -57,7 +59,7 @@ class ClientApprovalSlipCreateSerializer(serializers.ModelSerializer):
             "submitter",
             "submission_datetime",
             "name",
-            "affiliated_manage_company_name",
+            "affiliated_manage_company",
             "affiliated_client_company_name",
         ]
 
@@ -21,6 +21,7 @@ class ClientCompanyListSerializer(serializers.ModelSerializer):
 
 class ClientCompanyRetrieveSerializer(serializers.ModelSerializer):
     # payment_method = serializers.CharField(source='get_payment_method_display')
+    affiliated_manage_company_name = serializers.CharField(label="管理公司", read_only=True)
 
     class Meta:
         model = ClientCompany
@@ -29,10 +30,12 @@ class ClientCompanyRetrieveSerializer(serializers.ModelSerializer):
 
 class ClientCompanyUpdateSerializer(serializers.ModelSerializer, BasicSerializerValidator):
     payment_method = ChoiceField(choices=ClientCompany.PaymentMethod.choices)
+    affiliated_manage_company_name = serializers.CharField(label="管理公司", max_length=128)
 
     class Meta:
         model = ClientCompany
         fields = "__all__"
+        read_only_fields = ["affiliated_manage_company"]
 
 
 class ClientCompanyCreateSerializer(ClientCompanyUpdateSerializer):
@@ -41,3 +44,4 @@ class ClientCompanyCreateSerializer(ClientCompanyUpdateSerializer):
     class Meta:
         model = ClientCompany
         fields = "__all__"
+        read_only_fields = ["affiliated_manage_company"]
@@ -36,7 +36,8 @@ class ResourceInfoSerializer(serializers.Serializer):
 
 
 class ClientStudentListSerializer(serializers.ModelSerializer):
-    affiliated_client_company_id = serializers.ReadOnlyField(source="affiliated_client_company.id")
+    affiliated_client_company_id = serializers.ReadOnlyField()
+    affiliated_client_company_name = serializers.CharField(label="客户公司", read_only=True)
     training_classes = ListSerializer(
         child={
             "name": serializers.CharField()
@@ -57,6 +58,7 @@ class ClientStudentCreateSerializer(
     phone = UniqueCharField(label="学员手机号码", max_length=16)
     education = ChoiceField(label="学历", choices=ClientStudent.Education.choices)
     id_photo = ResourceInfoSerializer(label="资源信息", default={})
+    affiliated_client_company_name = serializers.CharField(label="客户公司", max_length=128)
 
     def to_internal_value(self, data):
         return super().to_internal_value(data)
@@ -80,11 +82,13 @@ class ClientStudentCreateSerializer(
     class Meta:
         model = ClientStudent
         fields = "__all__"
+        read_only_fields = ["affiliated_client_company"]
 
 
 class ClientStudentUpdateSerializer(serializers.ModelSerializer, BasicSerializerValidator):
     education = ChoiceField(label="学历", choices=ClientStudent.Education.choices)
     id_photo = ResourceInfoSerializer(label="资源信息", default={})
+    affiliated_client_company_name = serializers.CharField(label="客户公司", max_length=128)
 
     def save(self, **kwargs):
         # 只有修改的手机号和原来的手机号不一致需要校验唯一
@@ -95,9 +99,11 @@ class ClientStudentUpdateSerializer(serializers.ModelSerializer, BasicSerializer
     class Meta:
         model = ClientStudent
         fields = "__all__"
+        read_only_fields = ["affiliated_client_company"]
 
 
 class ClientStudentRetrieveSerializer(serializers.ModelSerializer):
+    affiliated_client_company_name = serializers.CharField(label="客户公司", read_only=True)
     training_classes = ListSerializer(
         child={
             "name": serializers.CharField(label="培训班名称")
@@ -113,6 +119,7 @@ class ClientStudentRetrieveSerializer(serializers.ModelSerializer):
 class ClientStudentBatchImportSerializer(serializers.ModelSerializer, BasicSerializerValidator):
     education = ChoiceField(label="学历", choices=ClientStudent.Education.choices)
     phone = serializers.CharField(label="学员手机号码", max_length=16)
+    affiliated_client_company_name = serializers.CharField(label="客户公司", max_length=128)
 
     def validate(self, attrs):
         # attrs["education"] = dict(ClientStudent.Education.choices).get(attrs["education"])
@@ -121,6 +128,7 @@ class ClientStudentBatchImportSerializer(serializers.ModelSerializer, BasicSeria
     class Meta:
         model = ClientStudent
         exclude = ["last_login", "id_photo"]
+        read_only_fields = ["affiliated_client_company"]
 
 
 class ClientStudentStatisticSerializer(serializers.Serializer):
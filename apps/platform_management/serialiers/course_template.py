@@ -52,7 +52,7 @@ class CourseTemplateUpdateSerializer(serializers.ModelSerializer):
     )
 
     def update(self, instance, validated_data):
-        if validated_data["status"] == CourseTemplate.Status.PREPARATION and validated_data["class_count"] > 5:
+        if validated_data["status"] == CourseTemplate.Status.PREPARATION and instance.class_count > 5:
             raise serializers.ValidationError("[准备期]课程授课次数不能超过5次")
 
         return super().update(instance, validated_data)
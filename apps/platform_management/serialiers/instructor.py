@@ -5,6 +5,7 @@ from apps.platform_management.serialiers.client_student import ResourceInfoSeria
 from common.utils.drf.serializer_fields import ChoiceField, UniqueCharField
 from common.utils.drf.serializer_validator import (
     BasicSerializerValidator,
+    CalendarRangeSerializerValidator,
     PhoneCreateSerializerValidator,
 )
 from common.utils.global_constants import AppModule
@@ -76,7 +77,7 @@ class InstructorPartialUpdateSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class InstructorCalendarSerializer(serializers.Serializer):
+class InstructorCalendarSerializer(CalendarRangeSerializerValidator, serializers.Serializer):
     start_date = serializers.DateField(label="开始时间")
     end_date = serializers.DateField(label="结束时间")
 
@@ -0,0 +1,30 @@
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.platform_management.models import (
+    ClientCompany,
+    ClientStudent,
+    CourseTemplate,
+    Instructor,
+)
+from common.utils.drf.search import SearchIndex
+
+
+@receiver(post_save, sender=Instructor)
+@receiver(post_save, sender=ClientStudent)
+@receiver(post_save, sender=ClientCompany)
+@receiver(post_save, sender=CourseTemplate)
+def update_search_index(sender, instance: Model, update_fields=None, **kwargs):
+    """保存后更新搜索索引, 只更新了非索引字段(如 last_login)时跳过"""
+    if update_fields is not None and not set(update_fields) & set(SearchIndex.get_fields(sender)):
+        return
+    SearchIndex.update([instance], sender)
+
+
+@receiver(post_delete, sender=Instructor)
+@receiver(post_delete, sender=ClientStudent)
+@receiver(post_delete, sender=ClientCompany)
+@receiver(post_delete, sender=CourseTemplate)
+def remove_search_index(sender, instance: Model, **kwargs):
+    SearchIndex.remove(sender, [instance.pk])
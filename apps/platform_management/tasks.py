@@ -1,7 +1,10 @@
 import logging
+from typing import Dict, Optional
 
+from apps.platform_management.handles.sms_outbox import SMSOutboxHandler
 from celery_app import app
 from common.utils import colorize
+from common.utils.counter_cache import CounterCache
 
 logger = logging.getLogger(__name__)
 
@@ -25,3 +28,27 @@ def checking_training_class(*args, **kwargs):
 def test(*args, **kwargs):
     print("EXECUTE ------------> test")
     print(f"args: {args}, kwargs: {kwargs}")
+
+
+@app.task(bind=True)
+@colorize.colorize_func
+def reconcile_counters(func):
+    """修复冗余计数字段的偏差"""
+    field_to_repaired_count: Dict[str, int] = CounterCache.reconcile()
+
+    logger.info(f"冗余计数字段已校正: {field_to_repaired_count}")
+
+
+@app.task(bind=True)
+@colorize.colorize_func
+def deliver_sms_outbox(func):
+    """发送短信发件箱中到期的短信"""
+    counts: Optional[Dict[str, int]] = SMSOutboxHandler.deliver()
+    if counts is None:
+        logger.info("上一次短信发送尚未结束, 跳过")
+        return
+
+    logger.info(
+        f"短信发送完成: 成功{counts['sent']}条, 限流延后{counts['deferred']}条, "
+        f"待重试{counts['retrying']}条, 失败{counts['failed']}条"
+    )
@@ -11,6 +11,8 @@ from .views.client_student import ClientStudentModelViewSet
 from .views.course_template import CourseTemplateModelViewSet
 from .views.instructor import InstructorModelViewSet
 from .views.management_company import ManagementCompanyModelViewSet
+from .views.query_stats import ConnectionStatsView, QueryStatsView
+from .views.sms_stats import SMSStatsView
 
 router = routers.SimpleRouter(trailing_slash=True)
 
@@ -52,5 +54,9 @@ router.register(r"administrator", AdministratorModelViewSet, basename="administr
 urlpatterns = [
     path("", include(router.urls)),
     path("attachment/", FileUploadDownloadView.as_view(), name="file-upload-download"),
+    # 查询统计
+    path("query_stats/", QueryStatsView.as_view(), name="query-stats"),
+    path("connection_stats/", ConnectionStatsView.as_view(), name="connection-stats"),
+    path("sms_stats/", SMSStatsView.as_view(), name="sms-stats"),
     # path("attachment/<int:pk>/", FileDownloadView.as_view(), name="file-download"),
 ]
@@ -3,7 +3,8 @@ from collections import defaultdict
 from django.db.models import QuerySet
 from rest_framework.decorators import action
 
-from apps.my_lectures.handles.event import EventHandler
+from apps.my_lectures.handles.calendar_builder import CalendarBuilder
+from apps.my_lectures.handles.calendar_cache import CalendarCache
 from apps.platform_management.filters.all_schedules import AllScheduleFilterClass
 from apps.platform_management.models import (
     Administrator,
@@ -35,19 +36,29 @@ class AllScheduleModelViewSet(ModelViewSet):
         user: Administrator = self.request.user
         queryset: QuerySet["Event"] = super().get_queryset().filter(event_type=Event.EventType.CLASS_SCHEDULE.value)
         if not self.request.user.is_super_administrator:
-            affiliated_manage_company_name = user.affiliated_manage_company_name
             queryset = queryset.filter(
-                training_class__target_client_company__affiliated_manage_company_name=affiliated_manage_company_name)
+                training_class__target_client_company__affiliated_manage_company_id=user.affiliated_manage_company_id)
         return queryset
 
+    def get_calendar_scope(self) -> str:
+        user: Administrator = self.request.user
+        if user.is_super_administrator:
+            return CalendarCache.ALL_SCOPE
+        return CalendarCache.manage_company_scope(user.affiliated_manage_company_id)
+
     def list(self, request, *args, **kwargs):
         validated_data = self.validated_data
-        return Response(
-            EventHandler.build_calendars(
+
+        # 带筛选条件的查询不走缓存
+        if any(field in self.request.query_params for field in self.filter_class.base_filters):
+            return CalendarBuilder(
                 self.filter_queryset(self.get_queryset()),
                 validated_data["start_date"],
                 validated_data["end_date"],
-            )
+            ).to_response()
+
+        return CalendarCache(self.get_calendar_scope(), self.get_queryset()).to_response(
+            validated_data["start_date"], validated_data["end_date"]
         )
 
     @staticmethod
@@ -23,7 +23,7 @@ from common.utils.drf.response import Response
 
 class ClientApprovalSlipModelViewSet(ModelViewSet):
     permission_classes = [SuperAdministratorPermission]
-    queryset = ClientApprovalSlip.objects.all()
+    queryset = ClientApprovalSlip.objects.select_related("affiliated_manage_company")
     serializer_class = ClientApprovalSlipCreateSerializer
     filter_class = ClientApprovalSlipFilterClass
     ACTION_MAP = {
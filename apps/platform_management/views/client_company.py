@@ -20,7 +20,7 @@ from common.utils.drf.response import Response
 class ClientCompanyModelViewSet(ModelViewSet):
     permission_classes = [SuperAdministratorPermission]
     serializer_class = ClientCompanyListSerializer
-    queryset = ClientCompany.objects.all()
+    queryset = ClientCompany.objects.select_related("affiliated_manage_company")
     filter_class = ClientCompanyFilterClass
     ACTION_MAP = {
         "list": ClientCompanyListSerializer,
@@ -43,7 +43,7 @@ class ClientCompanyModelViewSet(ModelViewSet):
         # 非超级管理员只能看到自己所属管理公司下面的客户公司
         user: Administrator = self.request.user
         if not user.is_super_administrator:
-            queryset = queryset.filter(affiliated_manage_company_name=user.affiliated_manage_company_name)
+            queryset = queryset.filter(affiliated_manage_company_id=user.affiliated_manage_company_id)
 
         return queryset
 
@@ -30,7 +30,9 @@ from common.utils.global_constants import AppModule
 class ClientStudentModelViewSet(ModelViewSet):
     permission_classes = [SuperAdministratorPermission | ManageCompanyAdministratorPermission]
     serializer_class = ClientStudentCreateSerializer
-    queryset = ClientStudent.objects.prefetch_related('training_classes__course')
+    queryset = ClientStudent.objects.select_related("affiliated_client_company").prefetch_related(
+        'training_classes__course'
+    )
     enable_batch_import = True
     batch_import_template_path = "common/utils/excel_parser/templates/客户学员批量导入模板.xlsx"
     batch_import_mapping = CLIENT_STUDENT_EXCEL_MAPPING
@@ -57,7 +59,9 @@ class ClientStudentModelViewSet(ModelViewSet):
 
         # 非超级管理员只能看到自己所属管理公司下面的所有学员
         if not user.is_super_administrator:
-            queryset: QuerySet["ClientStudent"] = user.affiliated_manage_company.students
+            queryset = queryset.filter(
+                affiliated_client_company__affiliated_manage_company_id=user.affiliated_manage_company_id
+            )
 
         return queryset
 
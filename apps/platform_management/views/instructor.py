@@ -5,7 +5,7 @@ from django.utils import timezone
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 
-from apps.my_lectures.handles.event import EventHandler
+from apps.my_lectures.handles.calendar_cache import CalendarCache
 from apps.my_lectures.models import InstructorEvent
 from apps.platform_management.filters.instructor import (
     InstructorFilterClass,
@@ -108,12 +108,9 @@ class InstructorModelViewSet(ModelViewSet):
         validated_data = self.validated_data
         instructor: Instructor = self.get_object()
 
-        return Response(
-            EventHandler.build_calendars(
-                instructor.events.all(),
-                start_date=validated_data["start_date"],
-                end_date=validated_data["end_date"],
-            )
+        return CalendarCache(CalendarCache.instructor_scope(instructor.id), instructor.events.all()).to_response(
+            start_date=validated_data["start_date"],
+            end_date=validated_data["end_date"],
         )
 
     @action(methods=["GET"], detail=True)
@@ -44,7 +44,7 @@ class ManagementCompanyModelViewSet(ModelViewSet):
 
         user: Administrator = self.request.user
         if not user.is_super_administrator:
-            return queryset.filter(name=user.affiliated_manage_company_name)
+            return queryset.filter(id=user.affiliated_manage_company_id)
 
         return queryset
 
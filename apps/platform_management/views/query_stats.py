@@ -0,0 +1,28 @@
+from rest_framework import generics
+
+from common.utils.db_backends.pool import ConnectionPool
+from common.utils.drf.permissions import SuperAdministratorPermission
+from common.utils.drf.response import Response
+from common.utils.query_budget import QueryStats
+
+
+class QueryStatsView(generics.GenericAPIView):
+    """各视图的 SQL 查询统计"""
+
+    permission_classes = [SuperAdministratorPermission]
+
+    def get(self, request, *args, **kwargs):
+        return Response(QueryStats.summary())
+
+    def delete(self, request, *args, **kwargs):
+        QueryStats.reset()
+        return Response()
+
+
+class ConnectionStatsView(generics.GenericAPIView):
+    """当前进程各数据库连接池的使用情况和等待时间"""
+
+    permission_classes = [SuperAdministratorPermission]
+
+    def get(self, request, *args, **kwargs):
+        return Response(ConnectionPool.all_stats())
@@ -0,0 +1,23 @@
+from django.db.models import Count
+from rest_framework import generics
+
+from apps.platform_management.models import SMSOutbox
+from common.utils.drf.permissions import SuperAdministratorPermission
+from common.utils.drf.response import Response
+from common.utils.sms import SMSRateLimiter
+
+
+class SMSStatsView(generics.GenericAPIView):
+    """短信发送频率限制的通过、限流次数, 以及发件箱各状态的短信数量"""
+
+    permission_classes = [SuperAdministratorPermission]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "rate_limit": SMSRateLimiter.stats(),
+            "outbox": dict(SMSOutbox.objects.values_list("status").annotate(count=Count("id")).order_by()),
+        })
+
+    def delete(self, request, *args, **kwargs):
+        SMSRateLimiter.limiter.reset_stats()
+        return Response()
@@ -18,10 +18,6 @@ class TrainingClassModelAdmin(admin.ModelAdmin):
     def name(self, obj: TrainingClass) -> str:
         return obj.name
 
-    @admin.display(description="学员数量")
-    def student_count(self, obj: TrainingClass) -> int:
-        return obj.student_count
-
     @admin.display(description="讲师名称")
     def instructor_name(self, obj: TrainingClass) -> str:
         return obj.instructor_name
@@ -5,3 +5,9 @@ class TeachingSpaceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.teaching_space"
     verbose_name = "授课空间"
+
+    def ready(self):
+        from apps.teaching_space import signals  # noqa
+        from common.utils.counter_cache import CounterCache
+
+        CounterCache.connect_signals(self.label)
@@ -0,0 +1,70 @@
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.db.models import Count, Sum
+
+from apps.platform_management.models import CourseTemplate
+from apps.teaching_space.models import CourseStatisticsChange, TrainingClass
+
+
+class CourseStatisticsHandler:
+    """
+    课程模板统计字段(培训人次、客户数、开班次数、讲师数量)
+
+    培训班新增/删除/状态变更、学员增减时记录涉及的课程, 定时任务批量取出变更,
+    只重新统计这些课程的培训班(已取消的不计入), 不做全表聚合
+    """
+
+    BATCH_SIZE = 500
+    FIELDS = ["trainees_count", "client_company_count", "class_count", "num_instructors"]
+
+    @classmethod
+    def enqueue(cls, course_ids: Iterable[int]):
+        """记录需要重新统计的课程, 与培训班变更在同一事务中提交"""
+        CourseStatisticsChange.objects.bulk_create([
+            CourseStatisticsChange(course_id=course_id) for course_id in set(course_ids) if course_id is not None
+        ])
+
+    @classmethod
+    def aggregate(cls, course_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+        """课程 -> 统计字段, 学员人次取培训班的冗余学员数量, 不需要关联中间表"""
+        rows = TrainingClass.objects.filter(course_id__in=list(course_ids)).exclude(
+            status=TrainingClass.Status.CANCELLED
+        ).order_by().values("course_id").annotate(
+            trainees_count=Sum("student_count"),
+            client_company_count=Count("target_client_company", distinct=True),
+            class_count=Count("id"),
+            num_instructors=Count("instructor", distinct=True),
+        )
+        return {row.pop("course_id"): row for row in rows}
+
+    @classmethod
+    def refresh(cls, course_ids: Iterable[int]) -> int:
+        course_ids = set(course_ids)
+        course_id_to_statistics: Dict[int, Dict[str, int]] = cls.aggregate(course_ids)
+
+        courses: List[CourseTemplate] = list(CourseTemplate.objects.filter(id__in=course_ids).only("id", *cls.FIELDS))
+        for course in courses:
+            statistics: Dict[str, int] = course_id_to_statistics.get(course.id, {})
+            for field in cls.FIELDS:
+                setattr(course, field, statistics.get(field) or 0)
+
+        CourseTemplate.objects.bulk_update(courses, cls.FIELDS, batch_size=cls.BATCH_SIZE)
+        return len(courses)
+
+    @classmethod
+    def process(cls, batch_size: int = BATCH_SIZE) -> int:
+        """
+        按批取出变更并重新统计, 直到没有变更, 返回统计的课程数
+        只删除已取出的变更, 处理期间新提交的变更留给下一批
+        """
+        refreshed_count: int = 0
+        while True:
+            changes: List[Tuple[int, int]] = list(
+                CourseStatisticsChange.objects.order_by("id").values_list("id", "course_id")[:batch_size]
+            )
+            if not changes:
+                return refreshed_count
+
+            course_ids: Set[int] = {course_id for _, course_id in changes}
+            refreshed_count += cls.refresh(course_ids)
+            CourseStatisticsChange.objects.filter(id__in=[change_id for change_id, _ in changes]).delete()
@@ -0,0 +1,167 @@
+import datetime
+import json
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import QuerySet, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from exam_system.models import ExamArrange, ExamGrade, ExamStudent, PaperArrange
+
+
+class ExamAutoCommitHandler:
+    """
+    考试结束自动提交
+
+    只取结束时间已过且有未提交答卷的考试, 按 id 分批取出这些考试的未提交答卷,
+    已作答的答卷每批按考试条件更新, 未作答的答卷逐份创建答案记录并提交; 超过时间预算时停止, 剩余的留给下一次运行;
+    指定 exam_ids 时只处理这些考试(考试结束时投递的 ETA 任务)
+    """
+
+    BATCH_SIZE = 500
+    # 每次运行的时间预算, 小于调度间隔(1分钟), 保证两次运行不会重叠
+    TIME_BUDGET = 45
+    LOCK_KEY = "exam_auto_commit:lock"
+    LOCK_TIMEOUT = 60 * 5
+    METRICS_KEY = "exam_auto_commit:last_run"
+    # 这里考试系统的开考时间有八小时的时间差
+    TIME_OFFSET = datetime.timedelta(hours=8)
+
+    def __init__(self, exam_ids: Optional[List[int]] = None):
+        self.now: datetime.datetime = timezone.now() + self.TIME_OFFSET
+        self.exam_ids: Optional[List[int]] = exam_ids
+        self.processed_count: int = 0
+        self.generated_count: int = 0
+
+    @classmethod
+    def last_run(cls) -> Optional[dict]:
+        """上一次运行的处理数量和耗时"""
+        return cache.get(cls.METRICS_KEY)
+
+    def run(self) -> Optional[dict]:
+        """上一次运行未结束时跳过, 返回本次运行的指标"""
+        if not cache.add(self.LOCK_KEY, "lock", timeout=self.LOCK_TIMEOUT):
+            return None
+
+        start_time: float = time.perf_counter()
+        try:
+            is_finished: bool = self.commit_ended_exams(deadline=start_time + self.TIME_BUDGET)
+        finally:
+            cache.delete(self.LOCK_KEY)
+
+        metrics: dict = {
+            "processed": self.processed_count,
+            "generated_grades": self.generated_count,
+            "elapsed": round(time.perf_counter() - start_time, 3),
+            "is_finished": is_finished,
+            "finished_at": timezone.now(),
+        }
+        cache.set(self.METRICS_KEY, metrics, timeout=None)
+        return metrics
+
+    def commit_ended_exams(self, deadline: float) -> bool:
+        """处理所有结束的考试, 超过时间预算时返回 False"""
+        exams: QuerySet["ExamArrange"] = ExamArrange.objects.filter(
+            end_time__lte=self.now,
+            id__in=ExamStudent.objects.filter(is_commit=False).values("exam_id"),
+        )
+        if self.exam_ids is not None:
+            exams = exams.filter(id__in=self.exam_ids)
+
+        exam_id_to_exam: Dict[int, ExamArrange] = {
+            exam.id: exam for exam in exams.only("id", "end_time", "paper_id")
+        }
+        if not exam_id_to_exam:
+            return True
+
+        # 试卷 -> 题目id
+        paper_id_to_exercise_ids: Dict[int, List[str]] = {
+            paper.id: paper.instance_exercise.split(";")
+            for paper in PaperArrange.objects.filter(
+                id__in={exam.paper_id for exam in exam_id_to_exam.values()}
+            ).only("id", "instance_exercise")
+        }
+
+        exam_students = ExamStudent.objects.filter(is_commit=False, exam_id__in=list(exam_id_to_exam)).order_by("id")
+        last_id: int = 0
+        while time.perf_counter() < deadline:
+            batch: List[ExamStudent] = list(exam_students.filter(id__gt=last_id)[:self.BATCH_SIZE])
+            if not batch:
+                return True
+
+            self.commit_batch(batch, exam_id_to_exam, paper_id_to_exercise_ids)
+            last_id = batch[-1].id
+
+        return False
+
+    def commit_batch(
+        self,
+        exam_students: List[ExamStudent],
+        exam_id_to_exam: Dict[int, ExamArrange],
+        paper_id_to_exercise_ids: Dict[int, List[str]],
+    ):
+        """
+        答卷读出后考生仍可能提交, 所有更新都以未提交为条件, 不回写读出时的答卷内容:
+        已作答的答卷按考试一次条件更新提交状态; 未作答的答卷逐份写入答案记录, 期间考生已作答或提交时删除创建的答案记录
+        """
+        with transaction.atomic(using="exam-system"):
+            exam_id_to_answered_ids: Dict[int, List[int]] = defaultdict(list)
+            for exam_student in exam_students:
+                if exam_student.has_grades:
+                    exam_id_to_answered_ids[exam_student.exam_id].append(exam_student.id)
+                    continue
+
+                self.commit_unanswered(
+                    exam_student,
+                    exam_id_to_exam[exam_student.exam_id],
+                    paper_id_to_exercise_ids.get(exam_id_to_exam[exam_student.exam_id].paper_id, []),
+                )
+
+            for exam_id, exam_student_ids in exam_id_to_answered_ids.items():
+                exam: ExamArrange = exam_id_to_exam[exam_id]
+                self.processed_count += ExamStudent.objects.filter(id__in=exam_student_ids, is_commit=False).update(
+                    # 自动提交
+                    is_commit=True,
+                    # 如果考试有开考时间，优先使用开考时间，否则使用考试结束时间
+                    start_time=Coalesce("start_time", Value(exam.end_time)),
+                    # 考生结束考试时间为考试结束时间
+                    completion_time=exam.end_time,
+                )
+
+    def commit_unanswered(self, exam_student: ExamStudent, exam: ExamArrange, exercise_ids: List[str]):
+        """未作答的答卷自动创建答案记录实例并提交"""
+        exercise_id_to_grade: Dict[str, ExamGrade] = {
+            exercise_id: ExamGrade(answer="", exam_id=exam.id, is_check=True, grade=0) for exercise_id in exercise_ids
+        }
+        placeholders: List[ExamGrade] = list(exercise_id_to_grade.values())
+        self.create_placeholders(placeholders)
+
+        committed: int = ExamStudent.objects.filter(id=exam_student.id, is_commit=False, answer_ids="{}").update(
+            is_commit=True,
+            start_time=exam_student.start_time or exam.end_time,
+            completion_time=exam.end_time,
+            answer_ids=json.dumps({exercise_id: grade.id for exercise_id, grade in exercise_id_to_grade.items()}),
+        )
+        if not committed:
+            ExamGrade.objects.filter(id__in=[grade.id for grade in placeholders]).delete()
+            return
+
+        self.processed_count += 1
+        self.generated_count += len(placeholders)
+
+    @classmethod
+    def create_placeholders(cls, placeholders: List[ExamGrade]):
+        """
+        创建答案记录
+        MySQL 批量插入不返回主键, 考试系统也会同时写入答案记录(迟交、批卷), 无法按插入顺序取回主键, 逐条插入
+        """
+        if connections["exam-system"].features.can_return_rows_from_bulk_insert:
+            ExamGrade.objects.bulk_create(placeholders, batch_size=cls.BATCH_SIZE)
+            return
+
+        for grade in placeholders:
+            grade.save(using="exam-system")
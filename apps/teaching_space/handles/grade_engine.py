@@ -0,0 +1,100 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from common.utils import global_constants
+from exam_system.models import ExamArrange, ExamGrade, ExamStudent
+
+
+class GradeEngine:
+    """
+    成绩引擎
+
+    一次查询加载所有考试安排(含科目), 批量解析答卷的 answer_ids, 一次查询取出所有答案的分数,
+    各科分数 ✖ 百分比、是否完成、是否通过都在数组上向量化计算, 不再逐个答卷查询 exam_info / grade
+    """
+
+    # 每次查询的答案id数量, 避免 IN 列表过长
+    BATCH_SIZE = 5000
+
+    def __init__(self, exam_students: Iterable[ExamStudent]):
+        self.exam_students: List[ExamStudent] = list(exam_students)
+
+        self.exam_id_to_arrange: Dict[int, ExamArrange] = {
+            exam.id: exam for exam in ExamArrange.objects.filter(
+                id__in={exam_student.exam_id for exam_student in self.exam_students}
+            ).select_related("subject")
+        }
+
+        # 答卷 -> 答案id
+        self.exam_student_id_to_answer_ids: Dict[int, List[int]] = {
+            exam_student.id: list(json.loads(exam_student.answer_ids or "{}").values())
+            for exam_student in self.exam_students
+        }
+        answer_id_to_grade: Dict[int, float] = self.load_answer_grades(
+            {answer_id for answer_ids in self.exam_student_id_to_answer_ids.values() for answer_id in answer_ids}
+        )
+
+        # 答卷 -> 分数, 与 ExamStudent.grade 一致
+        self.exam_student_id_to_score: Dict[int, float] = {
+            exam_student_id: round(sum(answer_id_to_grade.get(answer_id, 0) for answer_id in answer_ids), 1)
+            for exam_student_id, answer_ids in self.exam_student_id_to_answer_ids.items()
+        }
+
+    @classmethod
+    def load_answer_grades(cls, answer_ids: Iterable[int]) -> Dict[int, float]:
+        answer_ids = list(answer_ids)
+        answer_id_to_grade: Dict[int, float] = {}
+        for start in range(0, len(answer_ids), cls.BATCH_SIZE):
+            answer_id_to_grade.update(
+                ExamGrade.objects.filter(id__in=answer_ids[start:start + cls.BATCH_SIZE]).values_list("id", "grade")
+            )
+        return answer_id_to_grade
+
+    def exam_info(self, exam_student: ExamStudent) -> dict:
+        """与 ExamStudent.exam_info 一致"""
+        exam: Optional[ExamArrange] = self.exam_id_to_arrange.get(exam_student.exam_id)
+        if exam is None:
+            return {}
+
+        return {
+            "title": exam.title,
+            "subject_name": exam.subject.display_name,
+            "training_class_id": exam.training_class_id,
+            "score": self.exam_student_id_to_score.get(exam_student.id, 0),
+        }
+
+    @classmethod
+    def summarize(
+        cls, group_to_grades: Dict[Any, List[dict]], group_to_passing_score: Dict[Any, float]
+    ) -> Dict[Any, dict]:
+        """
+        按分组(学员/培训班)汇总已序列化的各科成绩
+        总分 = sum(各科分数 ✖ 百分比), 所有科目都有成绩时才计算总分和是否通过
+        """
+        groups: List[Any] = list(group_to_grades)
+        exam_infos: List[dict] = [
+            grade["exam_info"] for group in groups for grade in group_to_grades[group] if grade["exam_info"]
+        ]
+        rows: np.ndarray = np.array([
+            row for row, group in enumerate(groups) for grade in group_to_grades[group] if grade["exam_info"]
+        ], dtype=np.int64)
+        weighted_scores: np.ndarray = np.array([
+            exam_info["score"] * global_constants.subject_percentage.get(exam_info["subject_name"], 0)
+            for exam_info in exam_infos
+        ], dtype=float)
+
+        scores: np.ndarray = np.bincount(rows, weights=weighted_scores, minlength=len(groups))
+        is_finished: np.ndarray = np.array([
+            len(group_to_grades[group]) == len(global_constants.subject_titles) for group in groups
+        ], dtype=bool)
+        is_pass: np.ndarray = scores >= np.array([group_to_passing_score[group] for group in groups], dtype=float)
+
+        return {
+            group: {
+                "score": round(float(scores[row]), 1) if is_finished[row] else None,
+                "is_pass": bool(is_pass[row]) if is_finished[row] else None,
+            }
+            for row, group in enumerate(groups)
+        }
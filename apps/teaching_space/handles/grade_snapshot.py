@@ -0,0 +1,252 @@
+import datetime
+import logging
+from typing import Dict, Iterable, List, Optional, Type
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Max, Q, QuerySet
+from django.utils import timezone
+
+from apps.teaching_space.handles.grade_engine import GradeEngine
+from apps.teaching_space.handles.scheduled_transitions import ScheduledTransitions
+from apps.teaching_space.models import ExamSnapshot, ExamStudentSnapshot, TrainingClass
+from exam_system.models import ExamArrange, ExamStudent
+
+logger = logging.getLogger(__name__)
+
+
+class GradeSnapshotHandler:
+    """
+    成绩快照
+
+    定时任务从考试系统增量同步考试安排和答卷(含答卷总分)到本地快照表:
+    考试按 update_time 高水位同步, 新答卷按 id 高水位同步;
+    答卷没有更新时间, 批卷、自动提交会修改分数和提交状态, 未发布成绩的近期考试、近期发布成绩的培训班每次重新同步,
+    发布成绩后投递任务立即同步该培训班的答卷; 定时同步与发布后的同步共用一把锁, 避免同时新增同一答卷的快照;
+    成绩页面在快照新鲜时读取快照, 否则直接读取考试系统; 不再重新同步的培训班, 培训班成绩页面直接读取考试系统
+    """
+
+    BATCH_SIZE = 500
+    # 超过该时长未同步视为过期
+    MAX_AGE = datetime.timedelta(minutes=10)
+    # 结束时间在该天数内且未发布成绩的考试、发布成绩在该天数内的培训班的考试, 每次重新同步答卷
+    OPEN_DAYS = 30
+    SYNCED_AT_KEY = "grade_snapshot:synced_at"
+    LOCK_KEY = "grade_snapshot:lock"
+    LOCK_TIMEOUT = 60 * 10
+    SYNC_TRAINING_CLASS_TASK = "apps.teaching_space.tasks.sync_training_class_grade_snapshots"
+
+    EXAM_FIELDS = ["title", "subject_name", "training_class_id", "start_time", "end_time", "update_time"]
+    EXAM_STUDENT_FIELDS = [
+        "exam_id", "title", "subject_name", "training_class_id", "student_name", "password", "start_time",
+        "is_commit", "score",
+    ]
+
+    @classmethod
+    def synced_at(cls) -> Optional[datetime.datetime]:
+        return cache.get(cls.SYNCED_AT_KEY)
+
+    @classmethod
+    def is_fresh(cls) -> bool:
+        synced_at: Optional[datetime.datetime] = cls.synced_at()
+        return synced_at is not None and timezone.now() - synced_at <= cls.MAX_AGE
+
+    @classmethod
+    def is_open(cls, training_class: TrainingClass) -> bool:
+        """培训班的答卷是否仍在每次重新同步"""
+        open_since: datetime.datetime = timezone.now() - datetime.timedelta(days=cls.OPEN_DAYS)
+        if training_class.is_published:
+            return bool(training_class.published_datetime and training_class.published_datetime >= open_since)
+        return ExamSnapshot.objects.filter(training_class_id=training_class.id, end_time__gte=open_since).exists()
+
+    @classmethod
+    def sync(cls) -> Optional[Dict[str, int]]:
+        """同步一次, 其他同步尚未结束时跳过, 返回各部分同步的记录数"""
+        if not cache.add(cls.LOCK_KEY, "lock", timeout=cls.LOCK_TIMEOUT):
+            return None
+
+        try:
+            started_at: datetime.datetime = timezone.now()
+            counts: Dict[str, int] = {
+                "exams": cls.sync_exams(),
+                "new_exam_students": cls.sync_new_exam_students(),
+                "open_exam_students": cls.sync_open_exam_students(),
+            }
+            cache.set(cls.SYNCED_AT_KEY, started_at, timeout=None)
+            return counts
+        finally:
+            cache.delete(cls.LOCK_KEY)
+
+    # region 考试
+    @classmethod
+    def sync_exams(cls) -> int:
+        """按 (update_time, id) 分批拉取, 同一时间可能有多条, 从高水位时间(含)开始拉取, 写入是幂等的"""
+        high_water: Optional[datetime.datetime] = ExamSnapshot.objects.aggregate(
+            update_time__max=Max("update_time")
+        )["update_time__max"]
+
+        exams: QuerySet["ExamArrange"] = ExamArrange.objects.select_related("subject").order_by("update_time", "id")
+        if high_water is not None:
+            exams = exams.filter(update_time__gte=high_water)
+
+        count: int = 0
+        while True:
+            batch: List[ExamArrange] = list(exams[:cls.BATCH_SIZE])
+            if not batch:
+                return count
+
+            cls.save_exams(batch)
+            count += len(batch)
+            last: ExamArrange = batch[-1]
+            exams = exams.filter(Q(update_time__gt=last.update_time) | Q(update_time=last.update_time, id__gt=last.id))
+
+    @classmethod
+    def save_exams(cls, exams: List[ExamArrange]):
+        exam_id_to_snapshot: Dict[int, ExamSnapshot] = {
+            exam.id: ExamSnapshot(
+                exam_id=exam.id,
+                title=exam.title,
+                subject_name=exam.subject.display_name,
+                training_class_id=exam.training_class_id,
+                start_time=exam.start_time,
+                end_time=exam.end_time,
+                update_time=exam.update_time,
+            )
+            for exam in exams
+        }
+
+        with transaction.atomic():
+            cls.upsert(ExamSnapshot, "exam_id", exam_id_to_snapshot, cls.EXAM_FIELDS)
+
+            # 考试新增或修改后重新投递考试结束自动提交任务
+            ScheduledTransitions.schedule_exams(exams)
+
+            # 答卷快照冗余了考试信息, 考试修改后一并更新
+            for exam_id, snapshot in exam_id_to_snapshot.items():
+                ExamStudentSnapshot.objects.filter(exam_id=exam_id).exclude(
+                    title=snapshot.title, subject_name=snapshot.subject_name,
+                    training_class_id=snapshot.training_class_id,
+                ).update(
+                    title=snapshot.title, subject_name=snapshot.subject_name,
+                    training_class_id=snapshot.training_class_id,
+                )
+    # endregion
+
+    # region 答卷
+    @classmethod
+    def sync_new_exam_students(cls) -> int:
+        high_water: int = ExamStudentSnapshot.objects.aggregate(
+            exam_student_id__max=Max("exam_student_id")
+        )["exam_student_id__max"] or 0
+        return cls.sync_exam_students(ExamStudent.objects.filter(id__gt=high_water))
+
+    @classmethod
+    def sync_open_exam_students(cls) -> int:
+        """
+        未发布成绩的近期考试, 答卷的分数和提交状态可能仍在变化;
+        发布成绩后仍可能重新批卷(change_grade_people), 发布后 OPEN_DAYS 天内继续同步
+        """
+        open_since: datetime.datetime = timezone.now() - datetime.timedelta(days=cls.OPEN_DAYS)
+        open_exam_ids: List[int] = list(
+            ExamSnapshot.objects.filter(
+                Q(end_time__gte=open_since) & ~Q(
+                    training_class_id__in=TrainingClass.objects.filter(is_published=True).values("id")
+                )
+                | Q(
+                    training_class_id__in=TrainingClass.objects.filter(
+                        is_published=True, published_datetime__gte=open_since
+                    ).values("id")
+                )
+            ).values_list("exam_id", flat=True)
+        )
+        if not open_exam_ids:
+            return 0
+        return cls.sync_exam_students(ExamStudent.objects.filter(exam_id__in=open_exam_ids))
+
+    @classmethod
+    def trigger_training_class_sync(cls, training_class_id: int):
+        """事务提交后投递同步培训班答卷的任务, 投递失败时该培训班由定时同步处理(近期发布成绩的培训班每次重新同步)"""
+        from celery_app import app
+
+        def send_task():
+            try:
+                app.send_task(cls.SYNC_TRAINING_CLASS_TASK, args=[training_class_id])
+            except Exception as e:  # noqa
+                logger.warning(f"投递培训班[{training_class_id}]成绩快照同步任务失败, 等待定时同步: {e}")
+
+        transaction.on_commit(send_task)
+
+    @classmethod
+    def sync_training_class(cls, training_class_id: int) -> Optional[int]:
+        """
+        同步培训班所有考试的答卷, 发布成绩后调用; 以考试系统的考试安排为准, 尚未同步的考试一并同步;
+        其他同步尚未结束时返回 None
+        """
+        if not cache.add(cls.LOCK_KEY, "lock", timeout=cls.LOCK_TIMEOUT):
+            return None
+
+        try:
+            return cls.sync_exam_students(ExamStudent.objects.filter(
+                exam_id__in=list(
+                    ExamArrange.objects.filter(training_class_id=training_class_id).values_list("id", flat=True)
+                )
+            ))
+        finally:
+            cache.delete(cls.LOCK_KEY)
+
+    @classmethod
+    def sync_exam_students(cls, exam_students: QuerySet["ExamStudent"]) -> int:
+        """按 id 分批, 每批由成绩引擎一次计算所有答卷的分数"""
+        exam_students = exam_students.order_by("id")
+        count, last_id = 0, 0
+        while True:
+            batch: List[ExamStudent] = list(exam_students.filter(id__gt=last_id)[:cls.BATCH_SIZE])
+            if not batch:
+                return count
+
+            cls.save_exam_students(batch)
+            count += len(batch)
+            last_id = batch[-1].id
+
+    @classmethod
+    def save_exam_students(cls, exam_students: List[ExamStudent]):
+        grade_engine = GradeEngine(exam_students)
+
+        exam_student_id_to_snapshot: Dict[int, ExamStudentSnapshot] = {}
+        for exam_student in exam_students:
+            exam_info: dict = grade_engine.exam_info(exam_student)
+            # 考试已删除
+            if not exam_info:
+                continue
+
+            exam_student_id_to_snapshot[exam_student.id] = ExamStudentSnapshot(
+                exam_student_id=exam_student.id,
+                exam_id=exam_student.exam_id,
+                title=exam_info["title"],
+                subject_name=exam_info["subject_name"],
+                training_class_id=exam_info["training_class_id"],
+                student_name=exam_student.student_name,
+                password=exam_student.password,
+                start_time=exam_student.start_time,
+                is_commit=bool(exam_student.is_commit),
+                score=exam_info["score"],
+            )
+
+        with transaction.atomic():
+            cls.upsert(ExamStudentSnapshot, "exam_student_id", exam_student_id_to_snapshot, cls.EXAM_STUDENT_FIELDS)
+    # endregion
+
+    @classmethod
+    def upsert(
+        cls, model: Type[models.Model], key: str, key_to_instance: Dict[int, models.Model], fields: Iterable[str]
+    ):
+        """按唯一键批量更新已有记录, 新增其余记录"""
+        fields = list(fields)
+        existing: List[models.Model] = list(model.objects.filter(**{f"{key}__in": list(key_to_instance)}))
+        for instance in existing:
+            snapshot: models.Model = key_to_instance.pop(getattr(instance, key))
+            for field in fields:
+                setattr(instance, field, getattr(snapshot, field))
+
+        model.objects.bulk_update(existing, fields, batch_size=cls.BATCH_SIZE)
+        model.objects.bulk_create(key_to_instance.values(), batch_size=cls.BATCH_SIZE)
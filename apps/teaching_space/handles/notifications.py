@@ -0,0 +1,68 @@
+import datetime
+from typing import Dict, List, Optional
+
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+
+from apps.my_lectures.models import InstructorEvent
+from apps.platform_management.handles.notification_digest import NotificationDigest
+from apps.teaching_space.models import TrainingClass
+from common.utils.soft_fk import prefetch_soft_fk
+from exam_system.models import ExamArrange, ExamStudent
+
+
+class TrainingNotificationHandler:
+    """培训班的定时通知, 定时任务和 detect 接口共用, 每个接收人每天汇总为一条短信"""
+
+    # 通知讲师确认培训班安排
+    CONFIRM_SCHEDULE_TEMPLATE_ID = "2330584"
+    # 通知考生参加考试
+    TAKE_EXAM_TEMPLATE_ID = "2330581"
+
+    @classmethod
+    def notify_teacher_confirm_schedule(cls) -> Optional[Dict[str, int]]:
+        """通知讲师确认两天内开始的培训班安排"""
+        # 这里考试系统的开考时间有八小时的时间差
+        now: datetime.datetime = timezone.now() + datetime.timedelta(hours=8)
+
+        digest = NotificationDigest(cls.CONFIRM_SCHEDULE_TEMPLATE_ID)
+        for instructor_event in InstructorEvent.objects.filter(
+            # 两天内
+            start_date__range=[now, now + datetime.timedelta(days=2)],
+            # 邀请讲课
+            event_type=InstructorEvent.EventType.INVITE_TO_CLASS,
+            # 未处理
+            status=InstructorEvent.Status.PENDING,
+        ).select_related("training_class__instructor"):
+            if instructor_event.training_class.instructor:
+                digest.add(
+                    phone=instructor_event.training_class.instructor.phone,
+                    subject_id=instructor_event.id,
+                    template_params=[instructor_event.training_class.name],
+                )
+
+        return digest.send()
+
+    @classmethod
+    def notify_student_take_exam(cls) -> Optional[Dict[str, int]]:
+        """提前两天通知考生参加考试"""
+        # 这里考试系统的开考时间有八小时的时间差
+        now: datetime.datetime = timezone.now() + datetime.timedelta(hours=8)
+        exams: List[ExamArrange] = list(
+            ExamArrange.objects.filter(start_time__range=[now, now + datetime.timedelta(days=2)])
+        )
+        # 批量加载考试所属的培训班(跨库)及课程
+        prefetch_related_objects(prefetch_soft_fk(exams, "training_class_id", TrainingClass), "course")
+        exam_id_to_exam: Dict[int, ExamArrange] = {exam.id: exam for exam in exams}
+
+        digest = NotificationDigest(cls.TAKE_EXAM_TEMPLATE_ID)
+        exam_students = ExamStudent.objects.filter(exam_id__in=list(exam_id_to_exam)).only("exam_id", "student_name")
+        for exam_student in exam_students:
+            exam: ExamArrange = exam_id_to_exam[exam_student.exam_id]
+            digest.add(
+                phone=exam_student.phone,
+                subject_id=exam.id,
+                template_params=[exam.training_class.name, exam.start_time.strftime('%Y-%m-%d %H:%M:%S'), "xxx网址"],
+            )
+
+        return digest.send()
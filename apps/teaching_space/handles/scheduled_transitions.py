@@ -0,0 +1,122 @@
+import datetime
+import logging
+from typing import Dict, Iterable, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.teaching_space.handles.exam_auto_commit import ExamAutoCommitHandler
+from apps.teaching_space.handles.state_sweeper import StateSweeper
+from apps.teaching_space.models import TrainingClass
+from exam_system.models import ExamArrange
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledTransitions:
+    """
+    按时间点触发的状态流转
+
+    考试结束自动提交、培训班开课不再定时轮询, 在考试结束时间、开课当天零点给每个对象投递一个 ETA 任务,
+    考试或培训班的时间修改后重新投递, 提前执行的旧任务不满足条件, 不做任何处理;
+    Redis broker 中超过 visibility_timeout(默认1小时)未确认的 ETA 任务会被重复投递, 所以只投递 HORIZON 内到期的任务,
+    更晚的由低频对账(reconcile)在进入 HORIZON 后投递, 对账同时补处理错过的对象
+    """
+
+    # 只投递该时长内到期的任务, 大于对账间隔(30分钟), 小于 broker 的 visibility_timeout
+    HORIZON = datetime.timedelta(minutes=45)
+    # 在到期时间后延迟执行, 避免各机器时钟偏差导致提前执行
+    ETA_DELAY = datetime.timedelta(seconds=5)
+    COMMIT_EXAM_TASK = "apps.teaching_space.tasks.commit_exam"
+    START_TRAINING_CLASS_TASK = "apps.teaching_space.tasks.start_training_class"
+
+    @classmethod
+    def schedule(cls, task_name: str, object_id: int, eta: datetime.datetime, force: bool = False) -> bool:
+        """
+        事务提交后在 eta 执行 task_name(object_id), 超过 HORIZON 的不投递;
+        同一对象相同的 eta 只投递一次, 对象变更时(force)任务条件可能已经变化, 总是重新投递
+        """
+        now: datetime.datetime = timezone.now()
+        if eta - now > cls.HORIZON:
+            return False
+
+        key: str = f"scheduled_transitions:{task_name}:{object_id}"
+        if not force and cache.get(key) == eta.timestamp():
+            return False
+
+        # 任务丢失时, 到期 HORIZON 后由对账重新投递
+        cache.set(key, eta.timestamp(), timeout=int((max(eta, now) - now + cls.HORIZON).total_seconds()))
+        transaction.on_commit(lambda: cls.send_task(task_name, object_id, eta))
+        return True
+
+    @classmethod
+    def send_task(cls, task_name: str, object_id: int, eta: datetime.datetime):
+        from celery_app import app
+
+        try:
+            app.send_task(task_name, args=[object_id], eta=eta + cls.ETA_DELAY)
+        except Exception as e:  # noqa
+            logger.warning(f"投递任务[{task_name}]失败, 等待对账任务投递: {e}")
+
+    # region 考试结束
+    @classmethod
+    def exam_end_time(cls, exam: ExamArrange) -> datetime.datetime:
+        """考试系统的时间有八小时的时间差"""
+        return exam.end_time - ExamAutoCommitHandler.TIME_OFFSET
+
+    @classmethod
+    def schedule_exams(cls, exams: Iterable[ExamArrange]) -> int:
+        """考试结束时自动提交未提交的答卷"""
+        return sum(cls.schedule(cls.COMMIT_EXAM_TASK, exam.id, cls.exam_end_time(exam)) for exam in exams)
+    # endregion
+
+    # region 开课
+    @classmethod
+    def start_datetime(cls, training_class: TrainingClass) -> datetime.datetime:
+        """开课当天零点"""
+        return timezone.make_aware(datetime.datetime.combine(training_class.start_date, datetime.time.min))
+
+    @classmethod
+    def schedule_training_classes(cls, training_classes: Iterable[TrainingClass], force: bool = False) -> int:
+        """
+        开课当天零点将培训班流转为[开课中];
+        开课还取决于发布类型和课程排期, 这些变更后开课时间不变也要重新投递(force)
+        """
+        return sum(
+            cls.schedule(
+                cls.START_TRAINING_CLASS_TASK, training_class.id, cls.start_datetime(training_class), force=force
+            )
+            for training_class in training_classes
+            if training_class.status == TrainingClass.Status.PREPARING and training_class.start_date
+        )
+    # endregion
+
+    @classmethod
+    def reconcile(cls) -> Dict[str, int]:
+        """补处理错过的考试和培训班, 投递 HORIZON 内到期的任务, 返回各部分的数量"""
+        now: datetime.datetime = timezone.now()
+
+        metrics: Optional[dict] = ExamAutoCommitHandler().run()
+        started_count: int = StateSweeper(now).start_training_classes()
+
+        exam_now: datetime.datetime = now + ExamAutoCommitHandler.TIME_OFFSET
+        scheduled_exam_count: int = cls.schedule_exams(
+            ExamArrange.objects.filter(end_time__gt=exam_now, end_time__lte=exam_now + cls.HORIZON).only(
+                "id", "end_time"
+            )
+        )
+        scheduled_training_class_count: int = cls.schedule_training_classes(
+            TrainingClass.objects.filter(
+                status=TrainingClass.Status.PREPARING,
+                start_date__gt=timezone.localdate(now),
+                start_date__lte=timezone.localdate(now + cls.HORIZON),
+            ).only("id", "status", "start_date")
+        )
+
+        return {
+            "committed_exam_students": metrics["processed"] if metrics else 0,
+            "started_classes": started_count,
+            "scheduled_exams": scheduled_exam_count,
+            "scheduled_classes": scheduled_training_class_count,
+        }
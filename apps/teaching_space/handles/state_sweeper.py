@@ -0,0 +1,194 @@
+import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from apps.my_lectures.handles.calendar_cache import CalendarCache
+from apps.my_lectures.models import Advertisement, InstructorEnrolment, InstructorEvent
+from apps.teaching_space.handles.course_statistics import CourseStatisticsHandler
+from apps.teaching_space.models import TrainingClass
+from common.utils import global_constants
+
+
+class StateSweeper:
+    """
+    状态流转
+
+    邀请上课超时、广告报名截止、结课这些随时间发生的状态流转由定时任务分批处理, 列表和详情接口只读;
+    开课由开课时间的 ETA 任务触发(ScheduledTransitions), 这里只提供处理方法;
+    每批更新都以原状态为条件, 与用户同时操作时不会覆盖用户的修改; queryset.update 不触发信号,
+    涉及统计和日程的字段变更时手动通知课程统计和日程缓存
+    """
+
+    BATCH_SIZE = 500
+    # 结课后等待上传问卷数据(analyze_score)的天数, 超过后自动结课
+    FINISH_GRACE_DAYS = 30
+    LOCK_KEY = "state_sweeper:lock"
+    LOCK_TIMEOUT = 60 * 5
+
+    def __init__(self, now: Optional[datetime.datetime] = None):
+        self.now: datetime.datetime = now or timezone.now()
+        self.today: datetime.date = timezone.localdate(self.now)
+
+    def run(self) -> Optional[Dict[str, int]]:
+        """执行所有状态流转, 上一次执行未结束时跳过, 返回各流转的记录数"""
+        if not cache.add(self.LOCK_KEY, "lock", timeout=self.LOCK_TIMEOUT):
+            return None
+
+        try:
+            return {
+                "timeout_invitations": self.timeout_invitations(),
+                "expired_advertisements": self.expire_advertisements(),
+                "timeout_enrolments": self.timeout_enrolments(),
+                "finished_classes": self.finish_training_classes(),
+            }
+        finally:
+            cache.delete(self.LOCK_KEY)
+
+    @classmethod
+    def iter_batches(cls, queryset: QuerySet, *fields: str) -> Iterator[List[Tuple]]:
+        """按 id 分批取出 (id, *fields), 处理后的记录不再满足条件, 每批从上一批最大的 id 继续"""
+        last_id: int = 0
+        while True:
+            rows: List[Tuple] = list(
+                queryset.filter(id__gt=last_id).order_by("id").values_list("id", *fields)[:cls.BATCH_SIZE]
+            )
+            if not rows:
+                return
+
+            yield rows
+            last_id = rows[-1][0]
+
+    def timeout_invitations(self) -> int:
+        """[待处理]的邀请上课过了截止日期(InstructorEvent.deadline_date)流转为[已超时], 培训班恢复为[未发布]"""
+        instructor_events: QuerySet["InstructorEvent"] = InstructorEvent.objects.filter(
+            Q(start_date__lte=self.today) | Q(start_date__isnull=True, training_class__start_date__lte=self.today),
+            event_type=InstructorEvent.EventType.INVITE_TO_CLASS,
+            status=InstructorEvent.Status.PENDING,
+        )
+
+        count: int = 0
+        for rows in self.iter_batches(instructor_events, "training_class_id"):
+            with transaction.atomic():
+                count += InstructorEvent.objects.filter(
+                    id__in=[row[0] for row in rows], status=InstructorEvent.Status.PENDING
+                ).update(status=InstructorEvent.Status.TIMEOUT)
+
+                # 仍有其他待处理或已同意的邀请时保持[指定讲师]
+                TrainingClass.objects.filter(
+                    id__in={row[1] for row in rows}, publish_type=TrainingClass.PublishType.DESIGNATE_INSTRUCTOR
+                ).exclude(
+                    instructor_event__event_type=InstructorEvent.EventType.INVITE_TO_CLASS,
+                    instructor_event__status__in=[InstructorEvent.Status.PENDING, InstructorEvent.Status.AGREED],
+                ).update(publish_type=TrainingClass.PublishType.NONE)
+        return count
+
+    def expire_advertisements(self) -> int:
+        """报名截止仍未聘用讲师的广告, 培训班恢复为[未发布], 清除讲师报名表"""
+        advertisements: QuerySet["Advertisement"] = Advertisement.objects.filter(
+            is_revoked=False,
+            deadline_datetime__lte=self.now,
+            training_class__publish_type=TrainingClass.PublishType.PUBLISH_ADVERTISEMENT,
+        ).exclude(instructor_enrolments__status=InstructorEnrolment.Status.ACCEPTED)
+
+        count: int = 0
+        for rows in self.iter_batches(advertisements, "training_class_id"):
+            training_classes: List[TrainingClass] = list(TrainingClass.objects.filter(
+                id__in=[row[1] for row in rows], publish_type=TrainingClass.PublishType.PUBLISH_ADVERTISEMENT
+            ))
+            with transaction.atomic():
+                # 读取后可能已聘用讲师, 更新和删除都以仍未聘用为条件
+                count += TrainingClass.objects.filter(
+                    id__in=[training_class.id for training_class in training_classes],
+                    publish_type=TrainingClass.PublishType.PUBLISH_ADVERTISEMENT,
+                ).exclude(
+                    advertisement__instructor_enrolments__status=InstructorEnrolment.Status.ACCEPTED
+                ).update(publish_type=TrainingClass.PublishType.NONE, instructor=None)
+
+                # 广告报名人数由 CounterCache 同步
+                InstructorEnrolment.objects.filter(advertisement_id__in=[row[0] for row in rows]).exclude(
+                    advertisement__instructor_enrolments__status=InstructorEnrolment.Status.ACCEPTED
+                ).delete()
+
+            CourseStatisticsHandler.enqueue([training_class.course_id for training_class in training_classes])
+            for training_class in training_classes:
+                CalendarCache.bump_training_class(training_class)
+        return count
+
+    def timeout_enrolments(self) -> int:
+        """报名截止后仍[待聘用]的讲师报名表流转为[已过期]"""
+        instructor_enrolments: QuerySet["InstructorEnrolment"] = InstructorEnrolment.objects.filter(
+            status=InstructorEnrolment.Status.PENDING, advertisement__deadline_datetime__lte=self.now
+        )
+
+        count: int = 0
+        for rows in self.iter_batches(instructor_enrolments):
+            count += InstructorEnrolment.objects.filter(
+                id__in=[row[0] for row in rows], status=InstructorEnrolment.Status.PENDING
+            ).update(status=InstructorEnrolment.Status.TIMEOUT)
+        return count
+
+    def start_training_classes(self, training_class_ids: Optional[List[int]] = None) -> int:
+        """
+        [筹备中] + [发布广告或指定讲师] + [有课程排期] + [到达开课时间] 的培训班流转为[开课中],
+        指定 training_class_ids 时只处理这些培训班
+        """
+        training_classes: QuerySet["TrainingClass"] = TrainingClass.objects.filter(
+            status=TrainingClass.Status.PREPARING,
+            start_date__lte=self.today,
+            publish_type__in=[
+                TrainingClass.PublishType.DESIGNATE_INSTRUCTOR, TrainingClass.PublishType.PUBLISH_ADVERTISEMENT
+            ],
+            event__isnull=False,
+        )
+        if training_class_ids is not None:
+            training_classes = training_classes.filter(id__in=training_class_ids)
+
+        count: int = 0
+        for rows in self.iter_batches(training_classes):
+            count += TrainingClass.objects.filter(
+                id__in=[row[0] for row in rows], status=TrainingClass.Status.PREPARING
+            ).update(status=TrainingClass.Status.IN_PROGRESS)
+        return count
+
+    def finish_training_classes(self) -> int:
+        """
+        结课超过 FINISH_GRACE_DAYS 天仍未上传问卷数据的[开课中]培训班流转为[已结课], 讲师产生[填写复盘]单据;
+        正常情况下由上传问卷数据(analyze_score)结课并更新讲师评分
+        """
+        training_classes: QuerySet["TrainingClass"] = TrainingClass.objects.filter(
+            status=TrainingClass.Status.IN_PROGRESS,
+            start_date__lte=self.today - datetime.timedelta(
+                days=global_constants.CLASS_DAYS - 1 + self.FINISH_GRACE_DAYS
+            ),
+        )
+
+        count: int = 0
+        for rows in self.iter_batches(training_classes):
+            finished_training_classes: List[TrainingClass] = list(
+                TrainingClass.objects.select_related("target_client_company").filter(
+                    id__in=[row[0] for row in rows], status=TrainingClass.Status.IN_PROGRESS
+                )
+            )
+            with transaction.atomic():
+                count += TrainingClass.objects.filter(
+                    id__in=[training_class.id for training_class in finished_training_classes],
+                    status=TrainingClass.Status.IN_PROGRESS,
+                ).update(status=TrainingClass.Status.COMPLETED)
+
+                # 与 analyze_score 一致
+                InstructorEvent.objects.bulk_create([
+                    InstructorEvent(
+                        event_name=f"[{training_class.target_client_company_name}] 的课后复盘等待填写",
+                        event_type=InstructorEvent.EventType.POST_CLASS_REVIEW,
+                        initiator=training_class.creator,
+                        training_class=training_class,
+                        instructor_id=training_class.instructor_id,
+                    )
+                    for training_class in finished_training_classes
+                    if training_class.instructor_id and training_class.target_client_company
+                ], batch_size=self.BATCH_SIZE)
+        return count
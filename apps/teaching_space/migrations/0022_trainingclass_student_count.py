@@ -0,0 +1,31 @@
+# Generated by Django 3.2.12 on 2026-10-18 18:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_students(apps, schema_editor):
+    TrainingClass = apps.get_model('teaching_space', 'TrainingClass')
+    Through = TrainingClass.client_students.through
+
+    student_count = Through.objects.filter(trainingclass=OuterRef('pk')).order_by().values(
+        'trainingclass'
+    ).annotate(count=Count('pk')).values('count')
+    TrainingClass.objects.update(student_count=Coalesce(Subquery(student_count), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teaching_space', '0021_trainingclass_is_published'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingclass',
+            name='student_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='学员数量'),
+        ),
+        migrations.RunPython(count_students, migrations.RunPython.noop),
+    ]
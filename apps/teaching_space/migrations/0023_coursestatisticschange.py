@@ -0,0 +1,41 @@
+# Generated by Django 3.2.12 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+def enqueue_all_courses(apps, schema_editor):
+    """原有统计字段为手工填写, 全部课程重新统计一次"""
+    CourseTemplate = apps.get_model('platform_management', 'CourseTemplate')
+    CourseStatisticsChange = apps.get_model('teaching_space', 'CourseStatisticsChange')
+
+    CourseStatisticsChange.objects.bulk_create(
+        [
+            CourseStatisticsChange(course_id=course_id)
+            for course_id in CourseTemplate.objects.values_list('id', flat=True)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('platform_management', '0047_course_template_statistics'),
+        ('teaching_space', '0022_trainingclass_student_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStatisticsChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course_id', models.BigIntegerField(verbose_name='课程id')),
+                ('created_datetime', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '课程统计变更',
+                'verbose_name_plural': '课程统计变更',
+            },
+        ),
+        migrations.RunPython(enqueue_all_courses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.12 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teaching_space', '0023_coursestatisticschange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_id', models.IntegerField(unique=True, verbose_name='考试id')),
+                ('title', models.TextField(verbose_name='考试名称')),
+                ('subject_name', models.CharField(max_length=256, verbose_name='科目')),
+                ('training_class_id', models.IntegerField(db_index=True, verbose_name='培训班id')),
+                ('start_time', models.DateTimeField(verbose_name='开考时间')),
+                ('end_time', models.DateTimeField(verbose_name='结束时间')),
+                ('update_time', models.DateTimeField(db_index=True, verbose_name='考试系统更新时间')),
+            ],
+            options={
+                'verbose_name': '考试快照',
+                'verbose_name_plural': '考试快照',
+            },
+        ),
+        migrations.CreateModel(
+            name='ExamStudentSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_student_id', models.IntegerField(unique=True, verbose_name='答卷id')),
+                ('exam_id', models.IntegerField(db_index=True, verbose_name='考试id')),
+                ('title', models.TextField(verbose_name='考试名称')),
+                ('subject_name', models.CharField(max_length=256, verbose_name='科目')),
+                ('training_class_id', models.IntegerField(db_index=True, verbose_name='培训班id')),
+                ('student_name', models.CharField(db_index=True, max_length=255, verbose_name='考生')),
+                ('password', models.CharField(max_length=255, verbose_name='密码')),
+                ('start_time', models.DateTimeField(null=True, verbose_name='开考时间')),
+                ('is_commit', models.BooleanField(default=False, verbose_name='是否提交')),
+                ('score', models.FloatField(default=0, verbose_name='分数')),
+            ],
+            options={
+                'verbose_name': '答卷快照',
+                'verbose_name_plural': '答卷快照',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.12 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teaching_space', '0024_grade_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trainingclass',
+            index=models.Index(fields=['status', 'start_date'], name='teaching_sp_status_09f354_idx'),
+        ),
+    ]
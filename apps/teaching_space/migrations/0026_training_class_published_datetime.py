@@ -0,0 +1,18 @@
+# Generated by Django 3.2.12 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teaching_space', '0025_training_class_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingclass',
+            name='published_datetime',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='成绩发布时间'),
+        ),
+    ]
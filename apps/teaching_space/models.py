@@ -1,6 +1,8 @@
 import datetime
 
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Concat
 
 from apps.platform_management.models import (
     ClientCompany,
@@ -10,9 +12,12 @@ from apps.platform_management.models import (
     ManageCompany,
 )
 from common.utils import global_constants
+from common.utils.counter_cache import CounterCache, CounterCacheModelMixin
+from common.utils.drf.property_expressions import PropertyExpressions
+from common.utils.identity_map import IdentityMap
 
 
-class TrainingClass(models.Model):
+class TrainingClass(CounterCacheModelMixin, models.Model):
     """培训班"""
 
     class Status(models.TextChoices):
@@ -73,6 +78,7 @@ class TrainingClass(models.Model):
     questionnaire_qr_code = models.JSONField("问卷二维码", default=dict)
     passing_score = models.IntegerField("及格总分数线", default=0)
     is_published = models.BooleanField("是否发布成绩", default=False)
+    published_datetime = models.DateTimeField("成绩发布时间", null=True, blank=True)
 
     client_students = models.ManyToManyField(
         ClientStudent,
@@ -80,26 +86,28 @@ class TrainingClass(models.Model):
         blank=True,
         related_name="training_classes"
     )
+    # 冗余计数, 由 CounterCache 维护
+    student_count = models.IntegerField("学员数量", default=0, editable=False)
 
     @property
     def course_name(self) -> CourseTemplate:
         """课程名称"""
-        return CourseTemplate.objects.get(name=self.course.name)
+        return IdentityMap.related(self, "course")
 
     @property
     def name(self) -> str:
         """培训班名称"""
-        return f"{self.course.name}-{self.session_number}"
+        return f"{IdentityMap.related(self, 'course').name}-{self.session_number}"
 
     @property
     def target_client_company_name(self) -> str:
         """客户公司名称"""
-        return self.target_client_company.name
+        return IdentityMap.related(self, "target_client_company").name
 
     @property
     def num_lessons(self) -> int:
         """课时数量"""
-        return self.course.num_lessons
+        return IdentityMap.related(self, "course").num_lessons
 
     @property
     def instructor_name(self) -> str:
@@ -109,7 +117,7 @@ class TrainingClass(models.Model):
     @property
     def affiliated_manage_company(self) -> ManageCompany:
         """管理公司"""
-        return self.target_client_company.affiliated_manage_company
+        return IdentityMap.related(IdentityMap.related(self, "target_client_company"), "affiliated_manage_company")
 
     @property
     def affiliated_manage_company_name(self) -> str:
@@ -121,18 +129,13 @@ class TrainingClass(models.Model):
         """结课时间"""
         return self.start_date + datetime.timedelta(days=global_constants.CLASS_DAYS - 1)
 
-    @property
-    def student_count(self) -> int:
-        """学员数量"""
-        return self.client_students.count()
-
     @property
     def instructor_count(self) -> int:
         """讲师数量"""
-        from apps.my_lectures.models import InstructorEnrolment
-
         if self.publish_type == TrainingClass.PublishType.PUBLISH_ADVERTISEMENT:
-            return InstructorEnrolment.objects.filter(advertisement__training_class=self).count()
+            # 广告的报名人数
+            advertisement = getattr(self, "advertisement", None)
+            return advertisement.enrolment_count if advertisement else 0
 
         if self.publish_type == TrainingClass.PublishType.DESIGNATE_INSTRUCTOR:
             return 1
@@ -154,3 +157,76 @@ class TrainingClass(models.Model):
         ordering = ["-id"]
         verbose_name = "培训班"
         verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=["status", "start_date"]),
+        ]
+
+
+class CourseStatisticsChange(models.Model):
+    """课程统计变更, 培训班变更后记录涉及的课程, 由定时任务批量重新统计"""
+
+    # 不使用外键, 删除课程时级联删除培训班也会记录变更
+    course_id = models.BigIntegerField("课程id")
+    created_datetime = models.DateTimeField("创建时间", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "课程统计变更"
+        verbose_name_plural = verbose_name
+
+
+class ExamSnapshot(models.Model):
+    """考试系统的考试安排快照, 由定时任务按 update_time 增量同步"""
+
+    exam_id = models.IntegerField("考试id", unique=True)
+    title = models.TextField("考试名称")
+    subject_name = models.CharField("科目", max_length=256)
+    training_class_id = models.IntegerField("培训班id", db_index=True)
+    start_time = models.DateTimeField("开考时间")
+    end_time = models.DateTimeField("结束时间")
+    update_time = models.DateTimeField("考试系统更新时间", db_index=True)
+
+    class Meta:
+        verbose_name = "考试快照"
+        verbose_name_plural = verbose_name
+
+
+class ExamStudentSnapshot(models.Model):
+    """考试系统的答卷快照, 冗余考试信息和答卷总分, 成绩页面直接读取, 不再跨库逐行查询"""
+
+    exam_student_id = models.IntegerField("答卷id", unique=True)
+    exam_id = models.IntegerField("考试id", db_index=True)
+    title = models.TextField("考试名称")
+    subject_name = models.CharField("科目", max_length=256)
+    training_class_id = models.IntegerField("培训班id", db_index=True)
+    student_name = models.CharField("考生", max_length=255, db_index=True)
+    password = models.CharField("密码", max_length=255)
+    start_time = models.DateTimeField("开考时间", null=True)
+    is_commit = models.BooleanField("是否提交", default=False)
+    score = models.FloatField("分数", default=0)
+
+    @property
+    def exam_info(self) -> dict:
+        """与 ExamStudent.exam_info 一致"""
+        return {
+            "title": self.title,
+            "subject_name": self.subject_name,
+            "training_class_id": self.training_class_id,
+            "score": self.score,
+        }
+
+    class Meta:
+        verbose_name = "答卷快照"
+        verbose_name_plural = verbose_name
+
+
+# 属性对应的 ORM 表达式, 用于在数据库中筛选、搜索和排序
+PropertyExpressions.register(
+    TrainingClass,
+    name=Concat("course__name", Value("-"), "session_number", output_field=models.CharField()),
+    target_client_company_name=F("target_client_company__name"),
+    instructor_name=Coalesce("instructor__username", Value(""), output_field=models.CharField()),
+    affiliated_manage_company_name=F("target_client_company__affiliated_manage_company__name"),
+)
+
+# 冗余计数字段
+CounterCache.register(TrainingClass, "student_count", "client_students")
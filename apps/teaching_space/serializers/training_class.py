@@ -1,5 +1,5 @@
 import datetime
-from typing import List
+from typing import Optional
 
 import pytz
 from django.db import transaction
@@ -8,6 +8,7 @@ from rest_framework import serializers
 
 from apps.my_lectures.handles.event import EventHandler
 from apps.my_lectures.models import InstructorEnrolment, InstructorEvent
+from apps.platform_management.handles.sms_outbox import SMSOutboxHandler
 from apps.platform_management.models import (
     Administrator,
     ClientCompany,
@@ -23,12 +24,12 @@ from apps.platform_management.serialiers.course_template import (
     CourseTemplateCreateSerializer,
 )
 from apps.platform_management.serialiers.instructor import InstructorListSerializer
+from apps.teaching_space.handles.grade_engine import GradeEngine
 from apps.teaching_space.models import TrainingClass
 from common.utils import global_constants
 from common.utils.drf.exceptions import TrainingClassScheduleConflictError
 from common.utils.drf.serializer_fields import ChoiceField, ModelInstanceField
 from common.utils.drf.serializer_validator import BasicSerializerValidator
-from common.utils.sms import sms_client
 from exam_system.models import ExamStudent
 
 
@@ -128,7 +129,7 @@ class TrainingClassUpdateSerializer(serializers.ModelSerializer):
                     # 修改后的时间讲师有空，修改排期的开课和结课时间
                     if EventHandler.is_instructor_idle(schedule_event.instructor, check_start_date, check_end_date):
                         # 通知讲师
-                        errors: List[str] = sms_client.send_sms(
+                        SMSOutboxHandler.enqueue(
                             phone_numbers=[schedule_event.instructor.phone],
                             template_id="2330587",
                             template_params=[
@@ -137,8 +138,6 @@ class TrainingClassUpdateSerializer(serializers.ModelSerializer):
                                 start_date.strftime("%Y-%m-%d"),
                             ],
                         )
-                        if errors:
-                            raise serializers.ValidationError(str(errors))
 
                         # 重新调整开课和结课时间
                         schedule_event.start_date = start_date
@@ -152,13 +151,11 @@ class TrainingClassUpdateSerializer(serializers.ModelSerializer):
 
                         # 通知讲师
                         if training_class.instructor:
-                            errors: List[str] = sms_client.send_sms(
+                            SMSOutboxHandler.enqueue(
                                 phone_numbers=[training_class.instructor.phone],
                                 template_id="2330586",
                                 template_params=[training_class.name]
                             )
-                            if errors:
-                                raise serializers.ValidationError(str(errors))
 
                         # 如果发布类型为[指定讲师]，将讲师的单据状态修改为[已指定其他讲师]
                         if training_class.publish_type == TrainingClass.PublishType.DESIGNATE_INSTRUCTOR:
@@ -213,12 +210,39 @@ class TrainingClassDesignateInstructorSerializer(serializers.Serializer):
 
 class TrainingClassInstructorEventSerializer(serializers.ModelSerializer):
     """讲师事项"""
-    status = serializers.CharField(label="讲师单据状态")
+    status = serializers.CharField(label="讲师单据状态", source="effective_status")
     instructor = InstructorListSerializer(label="讲师信息")
 
     class Meta:
         model = InstructorEvent
         fields = ["status", "instructor"]
+
+
+class TrainingClassAvailableSlotsSerializer(serializers.Serializer):
+    """可排课时间"""
+    course = ModelInstanceField(model=CourseTemplate, label="课程id")
+    start_date = serializers.DateField(required=False, label="开始时间")
+    end_date = serializers.DateField(required=False, label="结束时间")
+    city = serializers.CharField(required=False, label="城市")
+    limit = serializers.IntegerField(default=20, min_value=1, max_value=100, label="返回数量")
+
+    def validate(self, attrs):
+        # 只能安排在未来的时间, 默认查询未来半年
+        today: datetime.date = timezone.now().date()
+        attrs["start_date"] = attrs.get("start_date") or today + datetime.timedelta(days=1)
+        attrs["end_date"] = attrs.get("end_date") or attrs["start_date"] + datetime.timedelta(
+            days=global_constants.AVAILABLE_SLOTS_DAYS - 1)
+
+        if attrs["start_date"] <= today:
+            raise serializers.ValidationError("开始时间必须大于当前时间")
+
+        if attrs["start_date"] > attrs["end_date"]:
+            raise serializers.ValidationError("结束时间必须大于或等于开始时间")
+
+        if (attrs["end_date"] - attrs["start_date"]).days >= global_constants.CALENDAR_MAX_DAYS:
+            raise serializers.ValidationError(f"查询范围不能超过{global_constants.CALENDAR_MAX_DAYS}天")
+
+        return attrs
 # endregion
 
 
@@ -276,6 +300,12 @@ class TrainingClassAnalyzeScoreSerializer(serializers.Serializer):
 # region 学员成绩
 class TrainingCLassGradesSerializer(serializers.ModelSerializer):
     start_time = serializers.DateTimeField(label="开考时间", format="%Y-%m-%d %H:%M:%S", default_timezone=pytz.utc)
+    exam_info = serializers.SerializerMethodField()
+
+    def get_exam_info(self, obj: ExamStudent) -> dict:
+        """由成绩引擎批量计算, 未传入时逐个查询"""
+        grade_engine: Optional[GradeEngine] = self.context.get("grade_engine")
+        return grade_engine.exam_info(obj) if grade_engine else obj.exam_info
 
     class Meta:
         model = ExamStudent
@@ -0,0 +1,89 @@
+from typing import List, Optional, Set
+
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from apps.platform_management.models import ClientStudent, Event
+from apps.teaching_space.handles.course_statistics import CourseStatisticsHandler
+from apps.teaching_space.handles.scheduled_transitions import ScheduledTransitions
+from apps.teaching_space.models import TrainingClass
+
+# 影响课程统计的培训班字段
+STATISTICS_FIELDS = ["course_id", "status", "target_client_company_id", "instructor_id"]
+# 影响开课任务的培训班字段
+START_FIELDS = ["start_date", "status", "publish_type"]
+
+
+@receiver(pre_save, sender=TrainingClass)
+def remember_training_class_statistics(sender, instance: TrainingClass, **kwargs):
+    """
+    记录修改前影响统计和开课任务的字段, 只有这些字段变化时才重新统计或重新投递开课任务,
+    课程变更时原课程也要重新统计
+    """
+    previous: Optional[dict] = None
+    if instance.pk:
+        previous = TrainingClass.objects.filter(pk=instance.pk).values(*STATISTICS_FIELDS, *START_FIELDS).first()
+    instance._previous_statistics = previous
+
+
+@receiver(post_save, sender=TrainingClass)
+def enqueue_training_class_statistics(sender, instance: TrainingClass, created: bool, **kwargs):
+    previous: Optional[dict] = getattr(instance, "_previous_statistics", None)
+    if not created and previous and all(previous[field] == getattr(instance, field) for field in STATISTICS_FIELDS):
+        return
+
+    CourseStatisticsHandler.enqueue([instance.course_id, previous["course_id"] if previous else None])
+
+
+@receiver(post_save, sender=TrainingClass)
+def schedule_training_class_start(sender, instance: TrainingClass, created: bool, **kwargs):
+    """开课时间、状态、发布类型变化后重新投递开课任务"""
+    previous: Optional[dict] = getattr(instance, "_previous_statistics", None)
+    if not created and previous and all(previous[field] == getattr(instance, field) for field in START_FIELDS):
+        return
+
+    ScheduledTransitions.schedule_training_classes([instance], force=True)
+
+
+@receiver(post_save, sender=Event)
+def schedule_class_schedule_start(sender, instance: Event, created: bool, **kwargs):
+    """有课程排期才能开课, 开课当天才排课时需要投递开课任务"""
+    if created and instance.event_type == Event.EventType.CLASS_SCHEDULE and instance.training_class_id:
+        ScheduledTransitions.schedule_training_classes([instance.training_class], force=True)
+
+
+@receiver(post_delete, sender=TrainingClass)
+def enqueue_deleted_training_class_statistics(sender, instance: TrainingClass, **kwargs):
+    CourseStatisticsHandler.enqueue([instance.course_id])
+
+
+@receiver(m2m_changed, sender=TrainingClass.client_students.through)
+def enqueue_client_students_statistics(
+    sender, instance, action: str, reverse: bool, pk_set: Optional[Set[int]], **kwargs
+):
+    """学员增减影响培训人次, 从学员一侧修改时 pk_set 为培训班, 清空时取学员当前所在的培训班"""
+    if action not in ("pre_add", "pre_remove", "pre_clear"):
+        return
+
+    if not reverse:
+        CourseStatisticsHandler.enqueue([instance.course_id])
+        return
+
+    training_classes = TrainingClass.objects.filter(id__in=pk_set) if pk_set is not None \
+        else TrainingClass.objects.filter(client_students=instance)
+    course_ids: List[int] = list(training_classes.values_list("course_id", flat=True))
+    CourseStatisticsHandler.enqueue(course_ids)
+
+
+@receiver(pre_delete, sender=ClientStudent)
+def enqueue_deleted_student_statistics(sender, instance: ClientStudent, **kwargs):
+    """删除学员时中间表随之删除, 不会触发 m2m_changed"""
+    CourseStatisticsHandler.enqueue(
+        TrainingClass.objects.filter(client_students=instance).values_list("course_id", flat=True)
+    )
@@ -1,45 +1,45 @@
-import datetime
 import logging
-from typing import List
-
-from django.conf import settings
-from django.db.models import QuerySet
-from django.utils import timezone
-
-from apps.my_lectures.models import InstructorEvent
-from apps.teaching_space.models import TrainingClass
+from typing import Dict, Optional
+
+from apps.teaching_space.handles.course_statistics import CourseStatisticsHandler
+from apps.teaching_space.handles.exam_auto_commit import ExamAutoCommitHandler
+from apps.teaching_space.handles.grade_snapshot import GradeSnapshotHandler
+from apps.teaching_space.handles.notifications import TrainingNotificationHandler
+from apps.teaching_space.handles.scheduled_transitions import ScheduledTransitions
+from apps.teaching_space.handles.state_sweeper import StateSweeper
 from celery_app import app
 from common.utils import colorize
-from common.utils.sms import sms_client
-from exam_system.models import ExamArrange, ExamStudent
 
 logger = logging.getLogger(__name__)
 
+# 考试自动提交的锁被占用时, 每隔几秒重试, 重试次数用完后由对账任务处理
+COMMIT_EXAM_RETRY_DELAY = 5
+COMMIT_EXAM_MAX_RETRIES = 12
+# 发布成绩后同步培训班答卷时锁被占用, 每隔几秒重试, 重试次数用完后由定时同步处理
+SYNC_TRAINING_CLASS_RETRY_DELAY = 10
+SYNC_TRAINING_CLASS_MAX_RETRIES = 30
+
 
 @app.task(bind=True)
 @colorize.colorize_func
-def start_training_class(func):
-    """开课检测"""
-    now_date: datetime.date = datetime.datetime.now().date()
-
-    # 寻找 [状态在<发布广告>或<指定讲师>] + [有课程排期] + [筹备中] + [时间到达开课时间] 的培训班
-    training_classes_to_update: QuerySet["TrainingClass"] = TrainingClass.objects.filter(
-        # 筹备中
-        status=TrainingClass.Status.PREPARING,
-        # 时间到达开课时间
-        start_date__lte=now_date,
-        # 状态在<发布广告>或<指定讲师>
-        publish_type__in=[
-            TrainingClass.PublishType.DESIGNATE_INSTRUCTOR, TrainingClass.PublishType.PUBLISH_ADVERTISEMENT
-        ],
-        # 有课程排期
-        event__isnull=False,
-    )
+def sweep_states(func):
+    """随时间发生的状态流转: 邀请上课超时、广告报名截止、结课"""
+    counts: Optional[Dict[str, int]] = StateSweeper().run()
+    if counts is None:
+        logger.info("上一次状态流转尚未结束, 跳过")
+        return
+
+    if any(counts.values()):
+        logger.info(f"状态流转完成: {counts}")
 
-    # 将状态流转为 [开课中]
-    update_count: int = training_classes_to_update.count()
-    if update_count > 0:
-        training_classes_to_update.update(status=TrainingClass.Status.IN_PROGRESS)
+
+@app.task(bind=True)
+@colorize.colorize_func
+def start_training_class(func, training_class_id: Optional[int] = None):
+    """开课检测, 开课时间的 ETA 任务只处理该培训班"""
+    update_count: int = StateSweeper().start_training_classes(
+        None if training_class_id is None else [training_class_id]
+    )
 
     logger.info(f"共有{update_count}条培训班记录由 [筹备中] 转成 [已开课] ")
 
@@ -48,95 +48,106 @@ def start_training_class(func):
 @colorize.colorize_func
 def finish_training_class(func):
     """结课检测"""
+    update_count: int = StateSweeper().finish_training_classes()
+
+    logger.info(f"共有{update_count}条培训班记录由 [开课中] 转成 [已结课] ")
 
 
 @app.task(bind=True)
 @colorize.colorize_func
 def detect_exam_end_time(func):
     """检查考试结束时间"""
-    # 这里考试系统的开考时间有八小时的时间差
-    now = timezone.now() + datetime.timedelta(hours=8)
-
-    update_exam_students: List[ExamStudent] = []
-    for exam_student in ExamStudent.objects.filter(is_commit=False):
-        exam = exam_student.exam_arrange
+    metrics: Optional[dict] = ExamAutoCommitHandler().run()
+    if metrics is None:
+        logger.info("上一次考试自动提交尚未结束, 跳过")
+        return
 
-        # 如果未提交的考卷且到考试结束时间的
-        if exam and exam.end_time <= now:
-            # 自动提交
-            exam_student.is_commit = True
+    log_exam_auto_commit(metrics)
 
-            # 如果考试有开考时间，优先使用开考时间，否则使用考试结束时间
-            exam_student.start_time = exam_student.start_time or exam.end_time
 
-            # 考生结束考试时间为考试结束时间
-            exam_student.completion_time = exam.end_time
-
-            # 自动创建答案记录实例
-            if not exam_student.has_grades:
-                exam_student.auto_generate_grades()
+@app.task(bind=True)
+@colorize.colorize_func
+def commit_exam(func, exam_id: int):
+    """考试结束时间的 ETA 任务, 自动提交该考试未提交的答卷"""
+    metrics: Optional[dict] = ExamAutoCommitHandler(exam_ids=[exam_id]).run()
+    if metrics is None:
+        logger.info(f"考试[{exam_id}]: 其他考试自动提交尚未结束, 稍后重试")
+        raise func.retry(countdown=COMMIT_EXAM_RETRY_DELAY, max_retries=COMMIT_EXAM_MAX_RETRIES)
+
+    log_exam_auto_commit(metrics)
+    if not metrics["is_finished"]:
+        raise func.retry(countdown=0, max_retries=COMMIT_EXAM_MAX_RETRIES)
+
+
+def log_exam_auto_commit(metrics: dict):
+    logger.info(
+        f"共有{metrics['processed']}个学生自动提交, 创建{metrics['generated_grades']}条答案记录, "
+        f"耗时{metrics['elapsed']}s{'' if metrics['is_finished'] else ', 剩余的下次继续处理'}"
+    )
 
-            update_exam_students.append(exam_student)
 
-    ExamStudent.objects. \
-        bulk_update(update_exam_students, fields=["is_commit", "start_time", "completion_time"], batch_size=500)
+@app.task(bind=True)
+@colorize.colorize_func
+def reconcile_transitions(func):
+    """对账: 补处理错过的考试自动提交和开课, 投递即将到期的 ETA 任务"""
+    counts: Dict[str, int] = ScheduledTransitions.reconcile()
 
-    logger.info(f"共有{len(update_exam_students)}个学生自动提交")
+    logger.info(f"考试自动提交和开课对账完成: {counts}")
 
 
 @app.task(bind=True)
 @colorize.colorize_func
 def notify_student_take_exam(func):
     """提前两天通知考生参加考试"""
-    errors: List[str] = []
-
-    # 这里考试系统的开考时间有八小时的时间差
-    now: datetime.datetime = timezone.now() + datetime.timedelta(hours=8)
-    for exam in ExamArrange.objects.filter(start_time__range=[now, now + datetime.timedelta(days=2)]):
-        if settings.ENABLE_NOTIFY_SMS:
-            errors += sms_client.send_sms(
-                phone_numbers=[student.phone for student in ExamStudent.objects.filter(exam_id=exam.id)],
-                template_id="2330581",
-                template_params=[
-                    exam.training_class.name,
-                    exam.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    "xxx网址"
-                ]
-            )
-        else:
-            logger.info(f"模拟给{[student.phone for student in ExamStudent.objects.filter(exam_id=exam.id)]}"
-                        f"发送短信，参与课程: {exam.training_class.name}, "
-                        f"考试时间: {exam.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-
-    if errors:
-        logger.info(f"发送短信出现异常: {errors}")
+    counts: Optional[Dict[str, int]] = TrainingNotificationHandler.notify_student_take_exam()
+    if counts is None:
+        logger.info("上一次考试通知尚未结束, 跳过")
+        return
+
+    logger.info(f"考试通知: 共{counts['recipients']}个考生, {counts['notifications']}场考试")
 
 
 @app.task(bind=True)
 @colorize.colorize_func
 def notify_teacher_confirm_schedule(func):
     """通知讲师确认课程安排"""
-    errors: List[str] = []
-
-    # 这里考试系统的开考时间有八小时的时间差
-    now: datetime.datetime = timezone.now() + datetime.timedelta(hours=8)
-    for instructor_event in InstructorEvent.objects.filter(
-        # 两天内
-        start_date__range=[now, now + datetime.timedelta(days=2)],
-        # 邀请讲课
-        event_type=InstructorEvent.EventType.INVITE_TO_CLASS,
-        # 未处理
-        status=InstructorEvent.Status.PENDING,
-    ):
-        if settings.ENABLE_NOTIFY_SMS:
-            errors += sms_client.send_sms(
-                phone_numbers=[instructor_event.training_class.instructor.phone],
-                template_id="2330584",
-                template_params=[instructor_event.training_class.name],
-            )
-        else:
-            logger.info(f"模拟给[{instructor_event.training_class.instructor.username}]发送短信，"
-                        f"确认课程[{instructor_event.training_class.name}]")
-
-    if errors:
-        logger.info(f"发送短信出现异常: {errors}")
+    counts: Optional[Dict[str, int]] = TrainingNotificationHandler.notify_teacher_confirm_schedule()
+    if counts is None:
+        logger.info("上一次确认课程安排通知尚未结束, 跳过")
+        return
+
+    logger.info(f"确认课程安排通知: 共{counts['recipients']}个讲师, {counts['notifications']}个讲师事项")
+
+
+@app.task(bind=True)
+@colorize.colorize_func
+def update_course_statistics(func):
+    """批量处理培训班变更, 更新课程模板统计字段"""
+    refreshed_count: int = CourseStatisticsHandler.process()
+
+    if refreshed_count:
+        logger.info(f"共更新{refreshed_count}个课程模板的统计字段")
+
+
+@app.task(bind=True)
+@colorize.colorize_func
+def sync_grade_snapshots(func):
+    """从考试系统增量同步成绩快照"""
+    counts: Optional[Dict[str, int]] = GradeSnapshotHandler.sync()
+    if counts is None:
+        logger.info("上一次成绩快照同步尚未结束, 跳过")
+        return
+
+    logger.info(f"成绩快照同步完成: {counts}")
+
+
+@app.task(bind=True)
+@colorize.colorize_func
+def sync_training_class_grade_snapshots(func, training_class_id: int):
+    """发布成绩后同步该培训班的答卷快照"""
+    count: Optional[int] = GradeSnapshotHandler.sync_training_class(training_class_id)
+    if count is None:
+        logger.info(f"培训班[{training_class_id}]: 其他成绩快照同步尚未结束, 稍后重试")
+        raise func.retry(countdown=SYNC_TRAINING_CLASS_RETRY_DELAY, max_retries=SYNC_TRAINING_CLASS_MAX_RETRIES)
+
+    logger.info(f"培训班[{training_class_id}]成绩快照同步完成: 共{count}份答卷")
@@ -0,0 +1,140 @@
+import datetime
+import json
+
+from django.db import connections
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.my_lectures.models import Advertisement
+from apps.platform_management.models import (
+    Administrator,
+    ClientCompany,
+    ClientStudent,
+    CourseTemplate,
+    Instructor,
+    ManageCompany,
+)
+from apps.teaching_space.models import TrainingClass
+from apps.teaching_space.views.training_class import TrainingClassModelViewSet
+from common.utils import global_constants
+from common.utils.query_budget import assert_query_budget
+from exam_system.models import ExamArrange, ExamGrade, ExamStudent, Subject
+
+EXAM_SYSTEM_MODELS = [Subject, ExamArrange, ExamGrade, ExamStudent]
+
+
+class TrainingClassQueryBudgetTestCase(TestCase):
+    """培训班列表、详情、成绩接口的查询次数不随数据量增长, 不超过 QUERY_BUDGET_MAP 声明的上限"""
+
+    databases = {"default", "exam-system"}
+
+    @classmethod
+    def setUpClass(cls):
+        # 考试系统的表不由本项目迁移, 测试库中手动创建
+        with connections["exam-system"].schema_editor() as schema_editor:
+            for model in EXAM_SYSTEM_MODELS:
+                schema_editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connections["exam-system"].schema_editor() as schema_editor:
+            for model in reversed(EXAM_SYSTEM_MODELS):
+                schema_editor.delete_model(model)
+
+    @classmethod
+    def setUpTestData(cls):
+        manage_company = ManageCompany.objects.create(name="管理公司", email="manage@example.com")
+        client_company = ClientCompany.objects.create(
+            name="客户公司", contact_person="联系人", contact_phone="13800000000", contact_email="client@example.com",
+            payment_method="对公转账", affiliated_manage_company_name=manage_company.name, certificate_address="地址",
+            recipient_name="收件人", recipient_phone="13800000000", invoice_company_name="开票公司",
+            tax_identification_number="税号", invoice_company_address="地址", invoice_company_phone="13800000000",
+            bank_name="银行", bank_account="账号",
+        )
+        courses = [
+            CourseTemplate.objects.create(
+                name=f"课程{i}", level="初级", abbreviation=f"C{i}", num_lessons=2, status="已上架",
+                assessment_method="考试", certification="证书", material_content="", course_overview="",
+                course_content="", remarks="",
+            )
+            for i in range(3)
+        ]
+        instructors = [
+            Instructor.objects.create(
+                username=f"讲师{i}", phone=f"1390000{i:04d}", email=f"instructor{i}@example.com", city="深圳",
+                company="公司", department="部门", position="职位", introduction="", id_photo={},
+            )
+            for i in range(3)
+        ]
+        cls.administrator = Administrator.objects.create(
+            username="admin", phone="13700000000", email="admin@example.com",
+            role=Administrator.Role.SUPER_MANAGER, affiliated_manage_company=manage_company,
+        )
+
+        start_date: datetime.date = timezone.localdate() - datetime.timedelta(days=30)
+        cls.training_classes = [
+            TrainingClass.objects.create(
+                course=courses[i % len(courses)], session_number=str(i), start_date=start_date,
+                assessment_method="考试", location="深圳", target_client_company=client_company,
+                instructor=instructors[i % len(instructors)],
+                publish_type=TrainingClass.PublishType.PUBLISH_ADVERTISEMENT,
+            )
+            for i in range(25)
+        ]
+        for training_class in cls.training_classes:
+            Advertisement.objects.create(
+                training_class=training_class, deadline_datetime=timezone.now() + datetime.timedelta(days=1)
+            )
+
+        # 第一个培训班: 每个学员每个科目一份答卷
+        training_class: TrainingClass = cls.training_classes[0]
+        now: datetime.datetime = timezone.now()
+        for subject_title in global_constants.subject_titles:
+            subject: Subject = Subject.objects.create(code_name=subject_title, display_name=subject_title)
+            exam: ExamArrange = ExamArrange.objects.create(
+                title=subject_title, subject=subject, description="", paper_id=0, info="", ip="", student="",
+                start_time=now, end_time=now, address="", notice=1, creator="", newer="", create_time=now,
+                update_time=now, status=0, pass_grade=60, training_class_id=training_class.id,
+            )
+            for i in range(15):
+                grade: ExamGrade = ExamGrade.objects.create(
+                    answer="", grade=10, is_check=1, evaluation="", exam_id=exam.id
+                )
+                ExamStudent.objects.create(
+                    exam_id=exam.id, student_name=f"1360000{i:04d}", password="",
+                    answer_ids=json.dumps({"1": grade.id}), is_commit=1, start_time=now, is_super_pass=0,
+                )
+        for i in range(15):
+            ClientStudent.objects.create(
+                username=f"学员{i}", gender="男", education="本科", phone=f"1360000{i:04d}",
+                affiliated_client_company=client_company, id_photo={},
+            )
+
+    def request(self, action: str, method: str = "get", **kwargs):
+        request = getattr(APIRequestFactory(), method)("/api/teaching_space/training_class/", kwargs.pop("data", {}))
+        force_authenticate(request, user=self.administrator)
+        response = TrainingClassModelViewSet.as_view({method: action})(request, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        for page_size in (1, 10, 25):
+            with assert_query_budget(TrainingClassModelViewSet, "list"):
+                response = self.request("list", data={"page": 1, "pagesize": page_size})
+            self.assertEqual(len(response.data["data"]), page_size)
+
+    def test_retrieve(self):
+        with assert_query_budget(TrainingClassModelViewSet, "retrieve"):
+            response = self.request("retrieve", pk=self.training_classes[0].id)
+        self.assertEqual(response.data["data"]["instructor_count"], 0)
+
+    def test_grades(self):
+        for page_size in (1, 10):
+            with assert_query_budget(TrainingClassModelViewSet, "grades"):
+                response = self.request(
+                    "grades", data={"page": 1, "pagesize": page_size}, pk=self.training_classes[0].id
+                )
+            self.assertEqual(len(response.data["data"]), page_size)
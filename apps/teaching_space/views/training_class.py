@@ -1,8 +1,7 @@
 import datetime
 import math
 import os
-from collections import defaultdict
-from typing import List
+from typing import Dict, List, Optional
 
 from django.db import IntegrityError, transaction
 from django.db.models import QuerySet
@@ -12,9 +11,11 @@ from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny
 
+from apps.my_lectures.handles.availability import InstructorAvailability
 from apps.my_lectures.handles.event import EventHandler
 from apps.my_lectures.models import Advertisement, InstructorEnrolment, InstructorEvent
 from apps.platform_management.filters.client_student import ClientStudentFilterClass
+from apps.platform_management.handles.sms_outbox import SMSOutboxHandler
 from apps.platform_management.models import (
     Administrator,
     ClientStudent,
@@ -27,10 +28,14 @@ from apps.platform_management.serialiers.client_student import (
     ClientStudentUpdateSerializer,
 )
 from apps.teaching_space.filters.training_class import TrainingClassFilterClass
-from apps.teaching_space.models import TrainingClass
+from apps.teaching_space.handles.grade_engine import GradeEngine
+from apps.teaching_space.handles.grade_snapshot import GradeSnapshotHandler
+from apps.teaching_space.handles.notifications import TrainingNotificationHandler
+from apps.teaching_space.models import ExamStudentSnapshot, TrainingClass
 from apps.teaching_space.serializers.training_class import (
     TrainingClassAdvertisementSerializer,
     TrainingClassAnalyzeScoreSerializer,
+    TrainingClassAvailableSlotsSerializer,
     TrainingClassCreateSerializer,
     TrainingClassDesignateInstructorSerializer,
     TrainingCLassGradesSerializer,
@@ -54,7 +59,6 @@ from common.utils.drf.permissions import (
 from common.utils.drf.response import Response
 from common.utils.excel_parser.mapping import TRAINING_CLASS_SCORE_EXCEL_MAPPING
 from common.utils.excel_parser.parser import excel_to_list
-from common.utils.sms import sms_client
 from exam_system.models import ExamArrange, ExamGrade, ExamStudent
 
 
@@ -75,6 +79,7 @@ class TrainingClassModelViewSet(ModelViewSet):
         # region 指定讲师
         "designate_instructor": TrainingClassDesignateInstructorSerializer,
         "instructor_event": TrainingClassInstructorEventSerializer,
+        "available_slots": TrainingClassAvailableSlotsSerializer,
         # endregion
 
         # region 发布广告
@@ -97,13 +102,28 @@ class TrainingClassModelViewSet(ModelViewSet):
         "modify_threshold": TrainingClassModifyThresholdSerializer,
         # endregion
     }
+    QUERY_BUDGET_MAP = {
+        "list": 5,
+        "retrieve": 3,
+        "grades": 7,
+    }
 
     def get_queryset(self):
         user: Administrator = self.request.user
         queryset: QuerySet["TrainingClass"] = super().get_queryset()
         if not user.is_super_administrator:
             queryset = queryset.filter(
-                target_client_company__affiliated_manage_company_name=user.affiliated_manage_company_name)
+                target_client_company__affiliated_manage_company_id=user.affiliated_manage_company_id)
+
+        # 列表的培训班名称、讲师名称
+        if self.action == "list":
+            queryset = queryset.select_related("course", "instructor")
+
+        # 详情的讲师、课程、客户公司及其管理公司、广告报名人数
+        if self.action == "retrieve":
+            queryset = queryset.select_related(
+                "instructor", "course", "target_client_company__affiliated_manage_company", "advertisement"
+            )
 
         return queryset
 
@@ -176,24 +196,43 @@ class TrainingClassModelViewSet(ModelViewSet):
             filter(event_type=InstructorEvent.EventType.INVITE_TO_CLASS). \
             last()
 
-        # 如果该单据为[邀请上课]，且已经过了[截至时间]且处于[待处理]则超时了
-        deadline_date: datetime.date = instructor_event.start_date or training_class.start_date
-        if all([
-            instructor_event.event_type == InstructorEvent.EventType.INVITE_TO_CLASS,
-            instructor_event.status != InstructorEvent.Status.TIMEOUT,
-            instructor_event.status == InstructorEvent.Status.PENDING,
-            deadline_date <= timezone.now().date()
-        ]):
-            with transaction.atomic():
-                # 单据状态修改为[已超时]
-                instructor_event.status = InstructorEvent.Status.TIMEOUT
-                instructor_event.save()
+        # 过了[截至时间]且处于[待处理]的单据展示为[已超时], 由定时任务(StateSweeper)流转状态
+        return Response(self.get_serializer(instructor_event).data)
 
-                # 培训班发布状态为[未发布]
-                training_class.publish_type = TrainingClass.PublishType.NONE
-                training_class.save()
+    @action(detail=False, methods=["GET"])
+    def available_slots(self, request, *args, **kwargs):
+        """可排课时间: 可教授该课程的讲师最早连续空闲的上课时间, 同一天按讲师评分排序"""
+        validated_data = self.validated_data
+        start_date: datetime.date = validated_data["start_date"]
+        end_date: datetime.date = validated_data["end_date"]
+
+        # 解除合作的讲师不考虑
+        instructors: QuerySet["Instructor"] = Instructor.objects.filter(
+            is_partnered=True, teachable_courses__contains=[validated_data["course"].id])
+        if validated_data.get("city"):
+            instructors = instructors.filter(city=validated_data["city"])
+        id_to_instructor: Dict[int, Instructor] = {
+            instructor.id: instructor for instructor in instructors.order_by("-satisfaction_score", "id")
+        }
 
-        return Response(self.get_serializer(instructor_event).data)
+        # 所有讲师的日程一次加载，统一计算，窗口需要覆盖最后一个开始时间的完整上课天数
+        free_windows = InstructorAvailability(
+            id_to_instructor.keys(),
+            start_date,
+            end_date + datetime.timedelta(days=global_constants.CLASS_DAYS - 1),
+        ).earliest_free_windows(validated_data["limit"])
+
+        return Response([
+            {
+                "instructor_id": instructor_id,
+                "instructor_name": id_to_instructor[instructor_id].username,
+                "city": id_to_instructor[instructor_id].city,
+                "satisfaction_score": id_to_instructor[instructor_id].satisfaction_score,
+                "start_date": window_start_date,
+                "end_date": window_start_date + datetime.timedelta(days=global_constants.CLASS_DAYS - 1),
+            }
+            for instructor_id, window_start_date in free_windows
+        ])
 
     @action(detail=True, methods=["POST"])
     def designate_instructor(self, request, *args, **kwargs):
@@ -265,13 +304,11 @@ class TrainingClassModelViewSet(ModelViewSet):
             training_class.save()
 
             # 通知讲师
-            errors: List[str] = sms_client.send_sms(
+            SMSOutboxHandler.enqueue(
                 phone_numbers=[Instructor.objects.get(id=validated_data["instructor_id"]).phone],
                 template_id="2330584",
                 template_params=[training_class.name]
             )
-            if errors:
-                return Response(result=False, err_msg=errors)
 
         except IntegrityError:
             return Response(result=False, err_msg="该讲师不存在")
@@ -300,13 +337,11 @@ class TrainingClassModelViewSet(ModelViewSet):
             # 当讲师同意时，会产生相应的日程，移除讲师时需将日程清除，并通知讲师
             if training_class.instructor and instructor_event.status == InstructorEvent.Status.AGREED:
                 # 通知讲师
-                errors: List[str] = sms_client.send_sms(
+                SMSOutboxHandler.enqueue(
                     phone_numbers=[training_class.instructor.phone],
                     template_id="2330585",
                     template_params=[training_class.name],
                 )
-                if errors:
-                    return Response(result=False, err_msg=str(errors))
 
                 # 把该培训班的该讲师的日程取消
                 Event.objects.filter(
@@ -410,27 +445,17 @@ class TrainingClassModelViewSet(ModelViewSet):
         advertisement: Advertisement = training_class.advertisement
         instructor_enrolments: QuerySet["InstructorEnrolment"] = advertisement.instructor_enrolments.all().filter(
             status__in=[InstructorEnrolment.Status.PENDING, InstructorEnrolment.Status.ACCEPTED])
-        now: datetime = timezone.now()
-        is_expired: bool = False
-
-        # 如果未选择讲师且如果报名截止时间大于等于当前时间
-        if (
-            not instructor_enrolments.exclude(status=InstructorEnrolment.Status.PENDING).exists()
-            and advertisement.deadline_datetime <= now
-        ):
-            # 培训班发布类型为[未发布]
-            training_class.publish_type = TrainingClass.PublishType.NONE
-            training_class.instructor = None
-            training_class.save()
-
-            # 讲师报名表清除
-            training_class.advertisement.instructor_enrolments.all().delete()
-
-            is_expired = True
+        # 如果未选择讲师且报名截止时间小于等于当前时间, 由定时任务(StateSweeper)恢复为[未发布]并清除讲师报名表
+        is_expired: bool = (
+            not instructor_enrolments.filter(status=InstructorEnrolment.Status.ACCEPTED).exists()
+            and advertisement.deadline_datetime <= timezone.now()
+        )
+        if is_expired:
+            instructor_enrolments = instructor_enrolments.none()
 
         return Response({
             "is_expired": is_expired,
-            "total": advertisement.enrolment_count,
+            "total": 0 if is_expired else advertisement.enrolment_count,
             "deadline": advertisement.deadline_datetime,
             "instructor_enrolments": self.paginate_response(self.get_serializer(
                 instructor_enrolments, many=True).data).data["data"]
@@ -474,13 +499,11 @@ class TrainingClassModelViewSet(ModelViewSet):
             training_class.save()
 
             # 通知讲师
-            errors: List[str] = sms_client.send_sms(
+            SMSOutboxHandler.enqueue(
                 phone_numbers=[selected_enrolment.instructor.phone],
                 template_id="2330583",
                 template_params=[training_class.name]
             )
-            if errors:
-                return Response(result=False, err_msg=errors)
 
             # 给选中的讲师安排日程
             EventHandler.create_event(training_class=training_class, event_type=Event.EventType.CLASS_SCHEDULE.value)
@@ -501,13 +524,11 @@ class TrainingClassModelViewSet(ModelViewSet):
         with transaction.atomic():
             # 通知讲师
             instructor_enrolments = InstructorEnrolment.objects.filter(advertisement__training_class=training_class)
-            errors: List[str] = sms_client.send_sms(
+            SMSOutboxHandler.enqueue(
                 phone_numbers=[enrolment.instructor.phone for enrolment in instructor_enrolments],
                 template_id="2334658",
                 template_params=[training_class.name],
             )
-            if errors:
-                return Response(result=False, err_msg=errors)
 
             # 删除讲师报名单据
             instructor_enrolments.delete()
@@ -520,7 +541,7 @@ class TrainingClassModelViewSet(ModelViewSet):
             # 广告单据修改为[已撤销]状态
             advertisement: Advertisement = training_class.advertisement
             advertisement.is_revoked = True
-            advertisement.save()
+            advertisement.save(update_fields=["is_revoked"])
 
             # 排期清除
             Event.objects.filter(event_type=Event.EventType.CLASS_SCHEDULE, training_class=training_class).delete()
@@ -569,30 +590,26 @@ class TrainingClassModelViewSet(ModelViewSet):
                 # 如果存在排期
                 if Event.objects.filter(instructor=training_class.instructor, training_class=training_class).exists():
                     # 通知讲师
-                    errors: List[str] = sms_client.send_sms(
+                    SMSOutboxHandler.enqueue(
                         phone_numbers=[training_class.instructor.phone],
                         template_id="2334657",
                         template_params=[training_class.name],
                     )
-                    if errors:
-                        return Response(result=False, err_msg=errors)
 
             # 如果发布了广告
             elif training_class.publish_type == TrainingClass.PublishType.PUBLISH_ADVERTISEMENT:
                 # 广告的状态修改为[已撤销]
                 advertisement: Advertisement = training_class.advertisement
                 advertisement.is_revoked = True
-                advertisement.save()
+                advertisement.save(update_fields=["is_revoked"])
 
                 # 通知讲师
                 instructor_enrolments = InstructorEnrolment.objects.filter(advertisement__training_class=training_class)
-                errors: List[str] = sms_client.send_sms(
+                SMSOutboxHandler.enqueue(
                     phone_numbers=[enrolment.instructor.phone for enrolment in instructor_enrolments],
                     template_id="2334657",
                     template_params=[training_class.name],
                 )
-                if errors:
-                    return Response(result=False, err_msg=errors)
 
                 # 清除讲师报名单据
                 instructor_enrolments.delete()
@@ -695,14 +712,31 @@ class TrainingClassModelViewSet(ModelViewSet):
                 ).values_list("id", flat=True),
 
                 is_commit=1,
-            )
+            ).order_by("id")
         except ExamArrange.DoesNotExist:
             return Response(result=False, err_msg="该培训班未安排考试")
 
+        # 快照新鲜且培训班答卷仍在同步时读取本地快照, 否则直接读取考试系统
+        is_snapshot_fresh: bool = GradeSnapshotHandler.is_fresh() and GradeSnapshotHandler.is_open(training_class)
+        if is_snapshot_fresh:
+            exam_students = ExamStudentSnapshot.objects.filter(
+                training_class_id=training_class.id,
+                subject_name__in=global_constants.subject_titles,
+                is_commit=True,
+            ).order_by("exam_student_id")
+
+        # 按考生分页, 只计算当前页考生的成绩
+        exam_usernames: List[str] = self.paginate_queryset(
+            exam_students.order_by("student_name").values_list("student_name", flat=True).distinct()
+        )
+        exam_students = list(exam_students.filter(student_name__in=exam_usernames))
+
         # 根据学生名聚合考试
-        union_student_grades, exam_usernames = defaultdict(list), set()
-        for grade in TrainingCLassGradesSerializer(exam_students, many=True).data:
-            exam_usernames.add(grade["student_name"])
+        union_student_grades: Dict[str, List[dict]] = {exam_username: [] for exam_username in exam_usernames}
+        grade_engine: Optional[GradeEngine] = None if is_snapshot_fresh else GradeEngine(exam_students)
+        for grade in TrainingCLassGradesSerializer(
+            exam_students, many=True, context={"grade_engine": grade_engine}
+        ).data:
             union_student_grades[grade.pop("student_name")].append(grade)
 
         # 【考试系统用户名】 -> 【SRE系统用户名】
@@ -711,25 +745,19 @@ class TrainingClassModelViewSet(ModelViewSet):
         }
 
         # 计算分数, 判断是否通过考试
-        grade_infos: List[dict] = []
-        for exam_username, grades in union_student_grades.items():
-            # 是否完成考试并全部批卷
-            is_finished: bool = len(grades) == len(global_constants.subject_titles)
-
-            # 计算总分, sum(各科分数 ✖ 百分比)
-            score = sum(
-                grade["exam_info"]["score"] * global_constants.subject_percentage[grade["exam_info"]["subject_name"]]
-                for grade in grades
-            )
-
-            grade_infos.append({
+        exam_username_to_summary: Dict[str, dict] = GradeEngine.summarize(
+            union_student_grades, dict.fromkeys(union_student_grades, training_class.passing_score)
+        )
+        grade_infos: List[dict] = [
+            {
                 "student_name": exam_username_to_sre_username[exam_username],
                 "grades": grades,
-                "score": round(score, 1) if is_finished else None,
-                "is_pass": score >= training_class.passing_score if is_finished else None,
-            })
+                **exam_username_to_summary[exam_username],
+            }
+            for exam_username, grades in union_student_grades.items()
+        ]
 
-        return self.paginate_response(grade_infos)
+        return self.get_paginated_response(grade_infos)
 
     @action(methods=["POST"], detail=True)
     def publish_grades(self, request, *args, **kwargs):
@@ -765,11 +793,15 @@ class TrainingClassModelViewSet(ModelViewSet):
         with transaction.atomic():
             # 培训班状态为已发布
             training_class.is_published = True
+            training_class.published_datetime = now
             training_class.save()
 
             # 将考生中未提交的自动提交
             ExamStudent.objects.filter(exam_id__in=exam_arranges.values_list("id", flat=True)).update(is_commit=True)
 
+            # 学员成绩页面读取快照, 发布后立即同步该培训班的答卷
+            GradeSnapshotHandler.trigger_training_class_sync(training_class.id)
+
         return Response()
 
     @action(methods=["POST"], detail=True)
@@ -794,47 +826,11 @@ class TrainingClassModelViewSet(ModelViewSet):
     @action(methods=["GET"], detail=False, permission_classes=[AllowAny])
     def detect(self, request, *args, **kwargs):
         """通知讲师确认课程安排"""
-        errors: List[str] = []
-
-        # 这里考试系统的开考时间有八小时的时间差
-        now: datetime.datetime = timezone.now() + datetime.timedelta(hours=8)
-        for instructor_event in InstructorEvent.objects.filter(
-                # 两天内
-                start_date__range=[now, now + datetime.timedelta(days=2)],
-                # 邀请讲课
-                event_type=InstructorEvent.EventType.INVITE_TO_CLASS,
-                # 未处理
-                status=InstructorEvent.Status.PENDING,
-        ):
-            errors += sms_client.send_sms(
-                phone_numbers=[instructor_event.training_class.instructor.phone],
-                template_id="2330584",
-                template_params=[instructor_event.training_class.name],
-            )
-
-        if errors:
-            Response(result=False, err_msg=str(errors))
+        TrainingNotificationHandler.notify_teacher_confirm_schedule()
         return Response()
 
     @action(methods=["GET"], detail=False, permission_classes=[AllowAny])
     def detect2(self, request, *args, **kwargs):
         """提前两天通知考生参加考试"""
-        errors: List[str] = []
-
-        # 这里考试系统的开考时间有八小时的时间差
-        now: datetime.datetime = timezone.now() + datetime.timedelta(hours=8)
-        for exam in ExamArrange.objects.filter(start_time__range=[now, now + datetime.timedelta(days=2)]):
-            errors += sms_client.send_sms(
-                phone_numbers=[student.phone for student in ExamStudent.objects.filter(exam_id=exam.id)],
-                template_id="2330581",
-                template_params=[
-                    exam.training_class.name,
-                    exam.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    "xxx网址"
-                ]
-            )
-
-        if errors:
-            return Response(result=False, err_msg=str(errors))
-
+        TrainingNotificationHandler.notify_student_take_exam()
         return Response()
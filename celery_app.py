@@ -22,10 +22,10 @@ setattr(app, "timezone", pytz.timezone("Asia/Shanghai"))
 
 # 定义定时任务
 app.conf.beat_schedule = {
-    # 每天检查一次开课时间
-    'start-training-class': {
-        'task': 'apps.teaching_space.tasks.start_training_class',
-        'schedule': crontab(minute="00", hour="00"),
+    # 每1分钟处理一次状态流转(邀请上课超时、广告报名截止、结课)
+    'sweep_states': {
+        'task': 'apps.teaching_space.tasks.sweep_states',
+        'schedule': schedule(run_every=timedelta(minutes=1)),
         'args': ()
     },
 
@@ -43,12 +43,47 @@ app.conf.beat_schedule = {
         'args': ()
     },
 
-    # 每1分钟检查一次考试
-    'detect_exam_end_time': {
-        'task': 'apps.teaching_space.tasks.detect_exam_end_time',
+    # 每天延伸一次讲师每日状态的物化范围
+    'extend_instructor_day_status': {
+        'task': 'apps.my_lectures.tasks.extend_instructor_day_status',
+        'schedule': crontab(minute="30", hour="00"),
+        'args': ()
+    },
+
+    # 每天校正一次冗余计数字段(学员数量、报名人数)
+    'reconcile_counters': {
+        'task': 'apps.platform_management.tasks.reconcile_counters',
+        'schedule': crontab(minute="00", hour="03"),
+        'args': ()
+    },
+
+    # 每1分钟批量更新一次课程模板统计字段
+    'update_course_statistics': {
+        'task': 'apps.teaching_space.tasks.update_course_statistics',
+        'schedule': schedule(run_every=timedelta(minutes=1)),
+        'args': ()
+    },
+
+    # 每1分钟同步一次成绩快照
+    'sync_grade_snapshots': {
+        'task': 'apps.teaching_space.tasks.sync_grade_snapshots',
         'schedule': schedule(run_every=timedelta(minutes=1)),
         'args': ()
     },
+
+    # 每1分钟发送一次短信发件箱(重试失败的短信)
+    'deliver_sms_outbox': {
+        'task': 'apps.platform_management.tasks.deliver_sms_outbox',
+        'schedule': schedule(run_every=timedelta(minutes=1)),
+        'args': ()
+    },
+
+    # 考试结束自动提交和开课由 ETA 任务触发, 每30分钟对账一次, 投递即将到期的任务并补处理错过的
+    'reconcile_transitions': {
+        'task': 'apps.teaching_space.tasks.reconcile_transitions',
+        'schedule': schedule(run_every=timedelta(minutes=30)),
+        'args': ()
+    },
 }
 
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
@@ -1,5 +1,5 @@
 import datetime
-from typing import Dict, Generator, List
+from typing import Generator, List
 
 from django.db.models import QuerySet
 
@@ -17,21 +17,17 @@ def between(start_date: datetime.date, end_date: datetime.date) -> Generator[dat
         current_date += datetime.timedelta(days=1)
 
 
-def generate_blank_calendar(
-    start_date: datetime.date, end_date: datetime.date
-) -> Dict[str, dict]:
-    calendar: Dict[str, dict] = {}
-    for current_date in between(start_date, end_date):
-        date_str = format_date(current_date)
-        calendar[date_str] = {
-            "date": current_date,
-            "is_available": True,
-            "data": [],
-            "rules": [],
-            "count": 0,
-            "is_canceled": False,
-        }
-    return calendar
+def month_starts(start_date: datetime.date, end_date: datetime.date) -> Generator[datetime.date, None, None]:
+    """时间范围内每个月的第一天"""
+    current_date = start_date.replace(day=1)
+    while current_date <= end_date:
+        yield current_date
+        current_date = (current_date + datetime.timedelta(days=32)).replace(day=1)
+
+
+def month_end(current_date: datetime.date) -> datetime.date:
+    """当月最后一天"""
+    return (current_date.replace(day=1) + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
 
 
 def inject_training_class_to_calendar(blank_calendar, training_classes: QuerySet["TrainingClass"]):
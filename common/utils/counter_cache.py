@@ -0,0 +1,258 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple, Type
+
+from django.db.models import Count, F, IntegerField, Model, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+
+# (计数所在模型, 计数字段, 关联名称)
+Counter = Tuple[Type[Model], str, str]
+
+
+class CounterCache:
+    """
+    冗余计数字段
+
+    关联记录增删时通过信号用 F() 原子地更新计数, 列表页直接读取计数字段, 不再逐行 COUNT;
+    绕过信号的批量操作(bulk_create / bulk_update / QuerySet.update)之后调用 recount 重新统计,
+    定时任务 reconcile 修复其余原因造成的偏差
+
+    CounterCache.register(ClientCompany, "student_count", "clientstudent")
+    CounterCache.register(TrainingClass, "student_count", "client_students")
+    """
+
+    registry: List[Counter] = []
+
+    @classmethod
+    def register(cls, model: Type[Model], field: str, relation: str):
+        cls.registry.append((model, field, relation))
+
+    @classmethod
+    def get_fields(cls, model: Type[Model]) -> Set[str]:
+        return {field for counter_model, field, _ in cls.registry if counter_model is model}
+
+    @classmethod
+    def connect_signals(cls, app_label: str):
+        """连接 app 下计数字段的信号, 反向关联在所有模型加载后才能解析, 在 AppConfig.ready 中调用"""
+        for counter in cls.registry:
+            model, field, relation = counter
+            if model._meta.app_label != app_label:
+                continue
+
+            relation_field = model._meta.get_field(relation)
+            child: Type[Model] = relation_field.related_model
+            uid: str = f"counter_cache_{model._meta.label}_{field}"
+            if relation_field.many_to_many:
+                through: Type[Model] = relation_field.remote_field.through
+                m2m_changed.connect(cls.on_m2m_changed(counter), sender=through, weak=False, dispatch_uid=uid)
+                pre_delete.connect(cls.on_m2m_child_pre_delete(counter), sender=child, weak=False, dispatch_uid=uid)
+                post_delete.connect(cls.on_m2m_child_post_delete(counter), sender=child, weak=False, dispatch_uid=uid)
+            else:
+                pre_save.connect(cls.on_child_pre_save(counter), sender=child, weak=False, dispatch_uid=uid)
+                post_save.connect(cls.on_child_post_save(counter), sender=child, weak=False, dispatch_uid=uid)
+                post_delete.connect(cls.on_child_post_delete(counter), sender=child, weak=False, dispatch_uid=uid)
+
+    # region 信号
+    @classmethod
+    def foreign_key_attname(cls, counter: Counter) -> str:
+        """子记录上指向计数模型的外键列名"""
+        model, _, relation = counter
+        return model._meta.get_field(relation).field.attname
+
+    @classmethod
+    def is_foreign_key_updated(cls, counter: Counter, update_fields) -> bool:
+        """只保存了其他字段(如 last_login)时外键不会变化"""
+        if update_fields is None:
+            return True
+        model, _, relation = counter
+        foreign_key = model._meta.get_field(relation).field
+        return bool({foreign_key.name, foreign_key.attname} & set(update_fields))
+
+    @classmethod
+    def stash_name(cls, counter: Counter) -> str:
+        """暂存在实例上的属性名"""
+        model, field, _ = counter
+        return f"_counter_cache_{model._meta.model_name}_{field}"
+
+    @classmethod
+    def increase(cls, counter: Counter, ids: Iterable[int], delta: int):
+        model, field, _ = counter
+        ids = [pk for pk in ids if pk is not None]
+        if ids and delta:
+            model.objects.filter(pk__in=ids).update(**{field: F(field) + delta})
+
+    @classmethod
+    def on_child_pre_save(cls, counter: Counter):
+        def receiver(sender, instance: Model, update_fields=None, **kwargs):
+            """记录修改前的外键, 子记录移动到其他记录下时两边的计数都要更新"""
+            if not instance.pk or not cls.is_foreign_key_updated(counter, update_fields):
+                return
+            attname: str = cls.foreign_key_attname(counter)
+            previous_id = sender.objects.filter(pk=instance.pk).values_list(attname, flat=True).first()
+            setattr(instance, cls.stash_name(counter), previous_id)
+
+        return receiver
+
+    @classmethod
+    def on_child_post_save(cls, counter: Counter):
+        def receiver(sender, instance: Model, created: bool, **kwargs):
+            attname: str = cls.foreign_key_attname(counter)
+            current_id = getattr(instance, attname)
+            if created:
+                cls.increase(counter, [current_id], 1)
+                return
+
+            previous_id = instance.__dict__.pop(cls.stash_name(counter), current_id)
+            if previous_id != current_id:
+                cls.increase(counter, [previous_id], -1)
+                cls.increase(counter, [current_id], 1)
+
+        return receiver
+
+    @classmethod
+    def on_child_post_delete(cls, counter: Counter):
+        def receiver(sender, instance: Model, **kwargs):
+            cls.increase(counter, [getattr(instance, cls.foreign_key_attname(counter))], -1)
+
+        return receiver
+
+    @classmethod
+    def on_m2m_changed(cls, counter: Counter):
+        def receiver(sender, instance: Model, action: str, reverse: bool, pk_set: Set[int], **kwargs):
+            """
+            添加: 新增的关联数量(pk_set 只包含实际新增的记录)直接累加;
+            移除/清空: pk_set 可能包含不存在的关联, 操作前记录涉及的记录, 操作后重新统计
+            """
+            model, _, relation = counter
+            if action == "post_add":
+                if reverse:
+                    cls.increase(counter, pk_set, 1)
+                else:
+                    cls.increase(counter, [instance.pk], len(pk_set))
+
+            elif action in ("pre_remove", "pre_clear"):
+                affected_ids: Set[int] = {instance.pk}
+                if reverse:
+                    affected_ids = set(model.objects.filter(**{relation: instance}).values_list("pk", flat=True))
+                setattr(instance, cls.stash_name(counter), affected_ids)
+
+            elif action in ("post_remove", "post_clear"):
+                cls.recount(counter, instance.__dict__.pop(cls.stash_name(counter), {instance.pk}))
+
+        return receiver
+
+    @classmethod
+    def on_m2m_child_pre_delete(cls, counter: Counter):
+        def receiver(sender, instance: Model, **kwargs):
+            """删除子记录时中间表随之删除, 不会触发 m2m_changed"""
+            model, _, relation = counter
+            setattr(instance, cls.stash_name(counter), set(
+                model.objects.filter(**{relation: instance}).values_list("pk", flat=True)
+            ))
+
+        return receiver
+
+    @classmethod
+    def on_m2m_child_post_delete(cls, counter: Counter):
+        def receiver(sender, instance: Model, **kwargs):
+            cls.recount(counter, instance.__dict__.pop(cls.stash_name(counter), ()))
+
+        return receiver
+    # endregion
+
+    # region 重新统计
+    @classmethod
+    def count_subquery(cls, counter: Counter) -> Coalesce:
+        """关联记录数量的子查询, 直接统计子表(多对多为中间表), MySQL 不允许 UPDATE 的子查询引用被更新的表"""
+        model, _, relation = counter
+        relation_field = model._meta.get_field(relation)
+        if relation_field.many_to_many:
+            related_model: Type[Model] = relation_field.remote_field.through
+            lookup: str = relation_field.m2m_field_name()
+        else:
+            related_model, lookup = relation_field.related_model, relation_field.field.name
+
+        return Coalesce(
+            Subquery(
+                related_model.objects.filter(**{lookup: OuterRef("pk")}).order_by().values(lookup).annotate(
+                    counter_cache_count=Count("pk")
+                ).values("counter_cache_count"),
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        )
+
+    @classmethod
+    def recount(cls, counter: Counter, ids: Iterable[int]) -> int:
+        model, field, _ = counter
+        ids = [pk for pk in ids if pk is not None]
+        if not ids:
+            return 0
+        return model.objects.filter(pk__in=ids).update(**{field: cls.count_subquery(counter)})
+
+    @classmethod
+    def collect(cls, instances: Iterable[Model]) -> Dict[Counter, Set[int]]:
+        """子记录外键指向的记录, 用于批量操作前后收集需要重新统计的记录"""
+        counter_to_ids: Dict[Counter, Set[int]] = defaultdict(set)
+        for instance in instances:
+            for counter in cls.registry:
+                model, _, relation = counter
+                relation_field = model._meta.get_field(relation)
+                if not relation_field.many_to_many and isinstance(instance, relation_field.related_model):
+                    counter_to_ids[counter].add(getattr(instance, cls.foreign_key_attname(counter)))
+        return counter_to_ids
+
+    @classmethod
+    def refresh(cls, *counter_to_ids_list: Dict[Counter, Set[int]]):
+        """批量操作后重新统计收集到的记录"""
+        merged: Dict[Counter, Set[int]] = defaultdict(set)
+        for counter_to_ids in counter_to_ids_list:
+            for counter, ids in counter_to_ids.items():
+                merged[counter] |= ids
+
+        for counter, ids in merged.items():
+            cls.recount(counter, ids)
+
+    @classmethod
+    def reconcile(cls) -> Dict[str, int]:
+        """修复所有计数字段的偏差, 返回 计数字段 -> 修复的记录数"""
+        field_to_repaired_count: Dict[str, int] = {}
+        for counter in cls.registry:
+            model, field, _ = counter
+            drifted_ids: List[int] = list(
+                model.objects.alias(counter_cache_count=cls.count_subquery(counter)).exclude(
+                    **{field: F("counter_cache_count")}
+                ).values_list("pk", flat=True)
+            )
+            field_to_repaired_count[f"{model._meta.label}.{field}"] = cls.recount(counter, drifted_ids)
+        return field_to_repaired_count
+    # endregion
+
+
+class CounterCacheModelMixin:
+    """
+    计数字段所在模型的 save: 更新已有记录且未指定 update_fields 时不写入计数字段,
+    计数只由 CounterCache 用 F() 更新, 避免用实例上读取时的计数覆盖其他请求同时更新的结果
+
+    class ClientCompany(CounterCacheModelMixin, models.Model): ...
+    """
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        if update_fields is None and not force_insert and not self._state.adding:
+            counter_fields: Set[str] = CounterCache.get_fields(type(self))
+            if counter_fields:
+                # 与 Model.save 一致, 延迟加载的字段不写入
+                deferred_fields: Set[str] = self.get_deferred_fields()
+                update_fields = [
+                    field.attname
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in counter_fields
+                    and field.attname not in deferred_fields
+                ]
+        super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
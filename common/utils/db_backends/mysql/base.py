@@ -0,0 +1,7 @@
+from django.db.backends.mysql import base
+
+from common.utils.db_backends.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """连接池化的 MySQL 连接, 配置见 PooledDatabaseWrapperMixin"""
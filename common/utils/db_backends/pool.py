@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Tuple
+
+from django.db import OperationalError
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    进程内按数据库别名复用的连接池
+
+    连接关闭时放回池中而不是断开, 下次取出时 ping 一次做健康检查, 失效或超过 POOL_RECYCLE 的连接丢弃重连;
+    同时借出的连接数不超过 POOL_SIZE, eventlet / gevent 的 Celery worker 每个协程都有自己的连接,
+    超过上限时等待其他协程归还, 等待超过 POOL_TIMEOUT 抛出 OperationalError
+    """
+
+    pools: Dict[str, "ConnectionPool"] = {}
+    _lock = threading.Lock()
+
+    DEFAULT_SIZE = 10
+    DEFAULT_TIMEOUT = 30
+    DEFAULT_RECYCLE = 60 * 30
+    # 等待时间超过该值时记录告警
+    SLOW_WAIT = 1
+
+    def __init__(self, alias: str, size: int, timeout: float, recycle: float):
+        self.alias, self.size, self.timeout, self.recycle = alias, size, timeout, recycle
+        self.semaphore = threading.BoundedSemaphore(size)
+        # 空闲连接, 后进先出, 最近使用的连接最可能仍然可用
+        self.idle: Deque[Tuple[Any, float]] = deque()
+        # 连接 -> 创建时间
+        self.created_at: Dict[int, float] = {}
+
+        self.checkout_count = 0
+        self.reused_count = 0
+        self.created_count = 0
+        self.health_check_failures = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeout_count = 0
+
+    @classmethod
+    def get(cls, alias: str, settings_dict: dict) -> "ConnectionPool":
+        pool = cls.pools.get(alias)
+        if pool is None:
+            with cls._lock:
+                pool = cls.pools.get(alias)
+                if pool is None:
+                    pool = cls.pools[alias] = cls(
+                        alias,
+                        size=settings_dict.get("POOL_SIZE") or cls.DEFAULT_SIZE,
+                        timeout=settings_dict.get("POOL_TIMEOUT") or cls.DEFAULT_TIMEOUT,
+                        recycle=settings_dict.get("POOL_RECYCLE") or cls.DEFAULT_RECYCLE,
+                    )
+        return pool
+
+    def checkout(self, connect: Callable[[], Any]) -> Any:
+        """借出一个连接, 优先复用空闲连接"""
+        self.acquire()
+        try:
+            while self.idle:
+                connection, created_at = self.idle.pop()
+                if time.monotonic() - created_at > self.recycle:
+                    self.close(connection)
+                    continue
+
+                try:
+                    connection.ping()
+                except Exception:  # noqa
+                    self.health_check_failures += 1
+                    self.close(connection)
+                    continue
+
+                self.reused_count += 1
+                return connection
+
+            connection = connect()
+            self.created_count += 1
+            self.created_at[id(connection)] = time.monotonic()
+            return connection
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+    def acquire(self):
+        self.checkout_count += 1
+        if self.semaphore.acquire(blocking=False):
+            return
+
+        start_time: float = time.perf_counter()
+        acquired: bool = self.semaphore.acquire(timeout=self.timeout)
+        waited: float = time.perf_counter() - start_time
+        self.wait_count += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        if not acquired:
+            self.timeout_count += 1
+            raise OperationalError(f"数据库[{self.alias}]连接数已达上限{self.size}, 等待{self.timeout}s超时")
+
+        if waited > self.SLOW_WAIT:
+            logger.warning(f"数据库[{self.alias}]等待连接 {waited:.2f}s, 连接数上限{self.size}")
+
+    def checkin(self, connection: Any, reusable: bool = True):
+        """归还连接, 不可复用(事务中关闭、超过回收时间)的连接直接断开"""
+        try:
+            created_at: float = self.created_at.get(id(connection), 0)
+            if reusable and time.monotonic() - created_at <= self.recycle:
+                self.idle.append((connection, created_at))
+            else:
+                self.close(connection)
+        finally:
+            self.semaphore.release()
+
+    def discard(self, connection: Any):
+        """持有连接的对象被回收而未归还(如协程结束), 断开连接并释放名额"""
+        self.checkin(connection, reusable=False)
+
+    def close(self, connection: Any):
+        self.created_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:  # noqa
+            pass
+
+    def clear(self):
+        """断开所有空闲连接"""
+        while self.idle:
+            self.close(self.idle.pop()[0])
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "alias": self.alias,
+            "size": self.size,
+            "idle": len(self.idle),
+            "in_use": self.size - self.semaphore._value,
+            "checkouts": self.checkout_count,
+            "reused": self.reused_count,
+            "created": self.created_count,
+            "health_check_failures": self.health_check_failures,
+            "waits": self.wait_count,
+            "avg_wait_ms": round(self.wait_total * 1000 / self.wait_count, 2) if self.wait_count else 0,
+            "max_wait_ms": round(self.wait_max * 1000, 2),
+            "timeouts": self.timeout_count,
+        }
+
+    @classmethod
+    def all_stats(cls):
+        return [pool.stats for _, pool in sorted(cls.pools.items())]
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    连接池化的 DatabaseWrapper, 通过 DATABASES 配置:
+    POOL_SIZE 同时借出的连接数上限, POOL_TIMEOUT 等待连接的超时秒数, POOL_RECYCLE 连接最长使用秒数
+
+    Django 在请求结束(CONN_MAX_AGE 到期)时关闭连接, 关闭即归还到池中, 物理连接在进程内持续复用
+    """
+
+    _pool_finalizer = None
+
+    @property
+    def pool(self) -> ConnectionPool:
+        return ConnectionPool.get(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        # 上一个连接未经 close 被丢弃(如事务中断开)
+        if self._pool_finalizer is not None:
+            self._pool_finalizer()
+
+        connection = self.pool.checkout(
+            lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params)
+        )
+        # 未关闭就被回收时(协程结束)释放名额
+        self._pool_finalizer = weakref.finalize(self, self.pool.discard, connection)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+
+        if self._pool_finalizer is not None:
+            self._pool_finalizer.detach()
+            self._pool_finalizer = None
+
+        # 事务中关闭或自动提交被关闭时连接状态不确定, 不放回池中
+        with self.wrap_database_errors:
+            self.pool.checkin(
+                self.connection, reusable=not self.in_atomic_block and not self.errors_occurred and self.autocommit
+            )
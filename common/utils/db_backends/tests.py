@@ -0,0 +1,157 @@
+import gc
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import List
+
+from django.db import OperationalError, connections
+from django.db.backends.sqlite3 import base as sqlite3_base
+from django.test import SimpleTestCase
+
+from common.utils.db_backends.pool import ConnectionPool, PooledDatabaseWrapperMixin
+
+
+class PingableConnection(sqlite3.Connection):
+    """sqlite3 连接没有 ping, 模拟 MySQL 连接的健康检查, is_alive 为 False 时视为已断开"""
+
+    is_alive = True
+
+    def ping(self):
+        if not self.is_alive:
+            raise sqlite3.OperationalError("connection lost")
+
+
+class PooledSQLiteDatabaseWrapper(PooledDatabaseWrapperMixin, sqlite3_base.DatabaseWrapper):
+    """以 SQLite 代替 MySQL 验证连接池逻辑"""
+
+    def get_connection_params(self):
+        return {**super().get_connection_params(), "factory": PingableConnection}
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    ALIAS = "pool-test"
+
+    def setUp(self):
+        fd, self.database_name = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        self.settings_dict = {
+            **connections["default"].settings_dict,
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": self.database_name,
+            "POOL_SIZE": 2,
+            "POOL_TIMEOUT": 0.2,
+            "POOL_RECYCLE": 60,
+        }
+        self.wrappers: List[PooledSQLiteDatabaseWrapper] = []
+
+    def tearDown(self):
+        for wrapper in self.wrappers:
+            wrapper.close()
+        pool = ConnectionPool.pools.pop(self.ALIAS, None)
+        if pool is not None:
+            pool.clear()
+        os.remove(self.database_name)
+
+    def new_wrapper(self) -> PooledSQLiteDatabaseWrapper:
+        wrapper = PooledSQLiteDatabaseWrapper(self.settings_dict, self.ALIAS)
+        self.wrappers.append(wrapper)
+        return wrapper
+
+    @property
+    def pool(self) -> ConnectionPool:
+        return ConnectionPool.pools[self.ALIAS]
+
+    def test_checkin_reuses_connection(self):
+        wrapper = self.new_wrapper()
+        wrapper.ensure_connection()
+        connection = wrapper.connection
+        wrapper.close()
+        self.assertEqual(self.pool.stats["idle"], 1)
+        self.assertEqual(self.pool.stats["in_use"], 0)
+
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, connection)
+        self.assertEqual(self.pool.stats["reused"], 1)
+        self.assertEqual(self.pool.stats["created"], 1)
+
+    def test_health_check_failure_reconnects(self):
+        wrapper = self.new_wrapper()
+        wrapper.ensure_connection()
+        connection = wrapper.connection
+        wrapper.close()
+
+        connection.is_alive = False
+        wrapper.ensure_connection()
+        self.assertIsNot(wrapper.connection, connection)
+        self.assertEqual(self.pool.stats["health_check_failures"], 1)
+        self.assertEqual(self.pool.stats["created"], 2)
+
+    def test_recycle(self):
+        self.settings_dict["POOL_RECYCLE"] = 0.05
+        wrapper = self.new_wrapper()
+        wrapper.ensure_connection()
+        connection = wrapper.connection
+        wrapper.close()
+
+        time.sleep(0.1)
+        wrapper.ensure_connection()
+        self.assertIsNot(wrapper.connection, connection)
+        self.assertEqual(self.pool.stats["reused"], 0)
+
+    def test_close_in_atomic_block_is_not_reused(self):
+        wrapper = self.new_wrapper()
+        wrapper.ensure_connection()
+        connection = wrapper.connection
+        wrapper.in_atomic_block = True
+        wrapper.close()
+        wrapper.in_atomic_block = False
+
+        self.assertEqual(self.pool.stats["idle"], 0)
+        self.assertEqual(self.pool.stats["in_use"], 0)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+
+    def test_timeout_when_pool_is_exhausted(self):
+        for _ in range(2):
+            self.new_wrapper().ensure_connection()
+
+        with self.assertRaises(OperationalError):
+            self.new_wrapper().ensure_connection()
+        self.assertEqual(self.pool.stats["timeouts"], 1)
+        self.assertEqual(self.pool.stats["in_use"], 2)
+
+    def test_waiter_gets_released_connection(self):
+        holders: List[PooledSQLiteDatabaseWrapper] = [self.new_wrapper() for _ in range(2)]
+        for holder in holders:
+            holder.ensure_connection()
+
+        waiter = self.new_wrapper()
+        errors: List[Exception] = []
+
+        def wait_for_connection():
+            try:
+                waiter.ensure_connection()
+            except Exception as e:  # noqa
+                errors.append(e)
+
+        thread = threading.Thread(target=wait_for_connection)
+        thread.start()
+        time.sleep(0.05)
+        holders[0].close()
+        thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.pool.stats["waits"], 1)
+        self.assertEqual(self.pool.stats["timeouts"], 0)
+
+    def test_finalizer_releases_abandoned_connection(self):
+        wrapper = PooledSQLiteDatabaseWrapper(self.settings_dict, self.ALIAS)
+        wrapper.ensure_connection()
+        self.assertEqual(self.pool.stats["in_use"], 1)
+
+        del wrapper
+        gc.collect()
+        self.assertEqual(self.pool.stats["in_use"], 0)
+        self.assertEqual(self.pool.stats["idle"], 0)
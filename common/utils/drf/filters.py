@@ -1,6 +1,11 @@
 import django_filters
-from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Q
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework.filters import OrderingFilter
+
+from common.utils.drf.property_expressions import PropertyExpressions
+from common.utils.drf.search import SearchIndex
 
 
 class PropertyFilter(django_filters.CharFilter):
@@ -10,12 +15,18 @@ class PropertyFilter(django_filters.CharFilter):
     @property
     def value(self):
         return 1
+
+    property 在 PropertyExpressions 中注册了 ORM 表达式时在数据库中筛选, 否则逐条计算
     """
 
     def filter(self, qs, value):
         if not value:
             return qs
 
+        queryset, alias_name = PropertyExpressions.alias(qs, self.field_name)
+        if alias_name:
+            return self.filter_by_expression(queryset, alias_name, value)
+
         if self.lookup_expr == "icontains":
             return qs.filter(
                 id__in=[
@@ -36,7 +47,30 @@ class PropertyFilter(django_filters.CharFilter):
 
         return qs
 
+    def filter_by_expression(self, queryset, alias_name, value):
+        if self.lookup_expr not in ["icontains", "exact"]:
+            return queryset
+
+        try:
+            return queryset.filter(**{f"{alias_name}__{self.lookup_expr}": value})
+        except (ValueError, TypeError, ValidationError):
+            # 值与表达式类型不匹配(如数字类型传入了字符串), 不可能命中
+            return queryset.none()
+
     def get_q_object(self, qs, value):
+        expression = PropertyExpressions.get(qs.model, self.field_name)
+        if isinstance(expression, F):
+            # 关联字段路径先在关联表中取出匹配的 id, 按外键筛选
+            if self.lookup_expr != "icontains":
+                return Q()
+            return SearchIndex.related_query(qs.model, expression.name, value)
+
+        queryset, alias_name = PropertyExpressions.alias(qs, self.field_name)
+        if alias_name:
+            if self.lookup_expr != "icontains":
+                return Q()
+            return Q(id__in=queryset.filter(**{f"{alias_name}__icontains": value}).values("id"))
+
         if self.lookup_expr == "icontains":
             matched_ids = [
                 instance.id
@@ -68,21 +102,28 @@ class BaseFilterSet(django_filters.FilterSet):
         # 获取模型的所有字段名称
         model_fields = {field.name for field in queryset.model._meta.get_fields()}
 
-        # 构建 Q 对象进行 OR 查询
+        # 构建 Q 对象进行 OR 查询, 字符串字段交给搜索索引
         query = Q()
+        text_fields = []
 
         for field_name, filter_instance in search_fields.items():
             if isinstance(filter_instance, PropertyFilter):
                 query |= filter_instance.get_q_object(queryset, value)
                 continue
 
+            # 关联字段(如 affiliated_client_company__name)按字段路径部分匹配
+            if isinstance(filter_instance, django_filters.CharFilter) and not filter_instance.method and \
+                    LOOKUP_SEP in filter_instance.field_name:
+                text_fields.append(filter_instance.field_name)
+                continue
+
             # 检查字段是否是模型字段
             if field_name not in model_fields:
                 continue
 
             if isinstance(filter_instance, django_filters.CharFilter):
                 # 对字符串字段进行部分匹配
-                query |= Q(**{f"{field_name}__icontains": value})
+                text_fields.append(field_name)
             elif isinstance(filter_instance, django_filters.NumberFilter):
                 try:
                     # 尝试将 value 转换为数字
@@ -92,7 +133,7 @@ class BaseFilterSet(django_filters.FilterSet):
                     # 如果转换失败，跳过这个字段
                     continue
 
-        return queryset.filter(query)
+        return SearchIndex.search(queryset, value, text_fields, query)
 
     @classmethod
     def _filter_by_related_model(cls, queryset, pk, model, field_name, related_field):
@@ -108,6 +149,32 @@ class BaseFilterSet(django_filters.FilterSet):
             return queryset.none()
 
 
+class PropertyOrderingFilter(OrderingFilter):
+    """
+    排序, 排序字段为已注册 ORM 表达式的 property 时按表达式在数据库中排序
+    """
+
+    def get_valid_fields(self, queryset, view, context={}):
+        valid_fields = super().get_valid_fields(queryset, view, context)
+        if getattr(view, "ordering_fields", self.ordering_fields) == "__all__":
+            valid_fields += [
+                (property_name, property_name) for property_name in PropertyExpressions.registry.get(queryset.model, {})
+            ]
+        return valid_fields
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+
+        order_by = []
+        for field in ordering:
+            queryset, alias_name = PropertyExpressions.alias(queryset, field.lstrip("-"))
+            order_by.append(f"-{alias_name}" if alias_name and field.startswith("-") else alias_name or field)
+
+        return queryset.order_by(*order_by)
+
+
 class DynamicRangeFilter(django_filters.Filter):
     """
     数字筛选器
@@ -1,11 +1,12 @@
 import os
-from collections import defaultdict
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Set
 
+import pytz
 from django.db import transaction
 from django.db.models import QuerySet
 from django.http import FileResponse, Http404, QueryDict
+from django.utils import timezone
 from rest_framework import serializers, status
 from rest_framework.decorators import action
 from rest_framework.viewsets import ModelViewSet as DRFModelViewSet
@@ -14,14 +15,18 @@ from apps.my_learning.serializers.historical_grades import (
     HistoricalGradesListSerializer,
 )
 from apps.platform_management.models import ClientStudent
-from apps.teaching_space.models import TrainingClass
+from apps.teaching_space.handles.grade_engine import GradeEngine
+from apps.teaching_space.handles.grade_snapshot import GradeSnapshotHandler
+from apps.teaching_space.models import ExamStudentSnapshot, TrainingClass
 from common.utils import global_constants
 from common.utils.cos import cos_client
+from common.utils.counter_cache import CounterCache
 from common.utils.drf.filters import BaseFilterSet
 from common.utils.drf.pagination import PageNumberPagination
+from common.utils.drf.property_expressions import PropertyExpressions
 from common.utils.drf.response import Response
 from common.utils.excel_parser.parser import excel_to_list
-from exam_system.models import ExamStudent
+from exam_system.models import ExamArrange, ExamStudent
 
 
 class BatchImportSerializer(serializers.Serializer):
@@ -45,6 +50,9 @@ class ModelViewSet(DRFModelViewSet):
     # 视图 -> 权限
     PERMISSION_MAP = {}
 
+    # 视图 -> 查询次数上限, 与分页大小无关, 见 common.utils.query_budget
+    QUERY_BUDGET_MAP = {}
+
     # 筛选类
     filter_class = BaseFilterSet
 
@@ -93,6 +101,8 @@ class ModelViewSet(DRFModelViewSet):
         existing_objs: QuerySet[model] = model.objects.filter(phone__in=phones)
         # 手机号 -> 已存在的模型实例
         phone_to_obj: Dict[str, model] = {obj.phone: obj for obj in existing_objs}
+        # 更新前外键指向的记录, 批量操作不触发信号, 之后需要重新统计计数字段
+        previous_counter_ids = CounterCache.collect(phone_to_obj.values())
         # 需要更新的字段
         update_fields = [field.name for field in model._meta.fields if field.name != "id"]
         for obj_info in initial_data:
@@ -115,6 +125,7 @@ class ModelViewSet(DRFModelViewSet):
         with transaction.atomic():
             model.objects.bulk_update(objs_to_update, update_fields, batch_size=500)
             model.objects.bulk_create(objs_to_create, batch_size=500)
+            CounterCache.refresh(previous_counter_ids, CounterCache.collect(objs_to_create + objs_to_update))
 
         objs_to_create = list(model.objects.filter(phone__in=[obj.phone for obj in objs_to_create]))
 
@@ -184,52 +195,100 @@ class ModelViewSet(DRFModelViewSet):
         return [{"id": value, "name": label} for value, label in choices]
 
     def build_student_grades_response(self, student: ClientStudent, query_params: QueryDict):
-        # 当前考生所有已考过的历史成绩
-        exam_students = ExamStudent.objects.filter(student_name=student.exam_username, is_commit=1)
-
-        # 只需要已发布的考试成绩
-        exam_students = [
-            student for student in exam_students
-            if student.is_published and student.exam_arrange.subject.display_name in global_constants.subject_titles
-        ]
+        """
+        学员历史成绩, 按培训班聚合
+        筛选在数据库中完成, 按培训班分页后只序列化当前页的答卷, 查询次数与历史成绩数量无关
+        """
+        is_snapshot_fresh: bool = GradeSnapshotHandler.is_fresh()
+
+        # 当前考生已发布培训班的所有历史答卷, 以及 考试 -> 培训班
+        if is_snapshot_fresh:
+            # 快照新鲜时读取本地快照
+            exam_students: QuerySet = ExamStudentSnapshot.objects.filter(
+                student_name=student.exam_username,
+                is_commit=True,
+                subject_name__in=global_constants.subject_titles,
+                training_class_id__in=TrainingClass.objects.filter(is_published=True).values("id"),
+            ).order_by("exam_student_id")
+            exam_id_to_training_class_id: Dict[int, int] = dict(
+                exam_students.order_by().values_list("exam_id", "training_class_id").distinct()
+            )
+        else:
+            exam_students = ExamStudent.objects.filter(student_name=student.exam_username, is_commit=1).order_by("id")
+            exam_id_to_training_class_id = dict(
+                ExamArrange.objects.filter(
+                    id__in=exam_students.values("exam_id"),
+                    subject__display_name__in=global_constants.subject_titles,
+                ).values_list("id", "training_class_id")
+            )
 
-        # 培训班id相同的聚合在一起
-        training_class_id_to_grades, training_class_ids = defaultdict(list), set()
-        for grade in HistoricalGradesListSerializer(exam_students, many=True).data:
-            training_class_id_to_grades[grade["exam_info"]["training_class_id"]].append(grade)
-            training_class_ids.add(grade["exam_info"].pop("training_class_id"))
+            # 只需要已发布的考试成绩
+            published_training_class_ids: Set[int] = set(TrainingClass.objects.filter(
+                id__in=set(exam_id_to_training_class_id.values()), is_published=True
+            ).values_list("id", flat=True))
+            exam_id_to_training_class_id = {
+                exam_id: training_class_id for exam_id, training_class_id in exam_id_to_training_class_id.items()
+                if training_class_id in published_training_class_ids
+            }
+            exam_students = exam_students.filter(exam_id__in=list(exam_id_to_training_class_id))
+
+        # 培训班按最早的答卷排序
+        training_class_ids: List[int] = list(dict.fromkeys(
+            exam_id_to_training_class_id[exam_id] for exam_id in exam_students.values_list("exam_id", flat=True)
+        ))
+
+        # 筛选, 分页
+        training_class_ids = self._filter_grades(
+            training_class_ids, exam_students, exam_id_to_training_class_id, query_params, is_snapshot_fresh
+        )
+        page_training_class_ids: List[int] = self.paginate_queryset(training_class_ids)
 
         # id -> TrainingClass obj
         training_class_id_to_obj: Dict[int, TrainingClass] = {
-            tc.id: tc for tc in TrainingClass.objects.filter(id__in=training_class_ids)
+            tc.id: tc for tc in TrainingClass.objects.filter(id__in=page_training_class_ids).select_related("course")
         }
 
-        # 添加额外数据并组装
-        grade_infos: List[dict] = []
-        for training_class_id, grades in training_class_id_to_grades.items():
-            if training_class_id not in training_class_id_to_obj:
-                continue
-
-            # 计算总分, sum(各科分数 ✖ 百分比)
-            score = sum(
-                grade["exam_info"]["score"] * global_constants.subject_percentage[grade["exam_info"]["subject_name"]]
-                for grade in grades
-            )
+        # 只序列化当前页的答卷, 培训班id相同的聚合在一起
+        page_exam_students: list = list(exam_students.filter(exam_id__in=[
+            exam_id for exam_id, training_class_id in exam_id_to_training_class_id.items()
+            if training_class_id in training_class_id_to_obj
+        ]))
+        grade_engine: Optional[GradeEngine] = None if is_snapshot_fresh else GradeEngine(page_exam_students)
+        training_class_id_to_grades: Dict[int, List[dict]] = {
+            training_class_id: [] for training_class_id in page_training_class_ids
+            if training_class_id in training_class_id_to_obj
+        }
+        for grade in HistoricalGradesListSerializer(
+            page_exam_students, many=True, context={"grade_engine": grade_engine}
+        ).data:
+            training_class_id_to_grades[grade["exam_info"].pop("training_class_id")].append(grade)
+
+        # 计算总分, sum(各科分数 ✖ 百分比)
+        training_class_id_to_summary: Dict[int, dict] = GradeEngine.summarize(
+            training_class_id_to_grades,
+            {training_class_id: tc.passing_score for training_class_id, tc in training_class_id_to_obj.items()},
+        )
 
-            grade_infos.append({
+        # 添加额外数据并组装
+        grade_infos: List[dict] = [
+            {
                 "training_class_name": training_class_id_to_obj[training_class_id].name,
                 "grades": grades,
-                "is_pass": score >= training_class_id_to_obj[training_class_id].passing_score
-                if len(grades) == len(global_constants.subject_titles) else None,
-            })
-
-        # 筛选
-        grade_infos = self._filter_grades(grade_infos, query_params)
-        return self.get_paginated_response(self.paginate_queryset(grade_infos))
+                "is_pass": training_class_id_to_summary[training_class_id]["is_pass"],
+            }
+            for training_class_id, grades in training_class_id_to_grades.items()
+        ]
+        return self.get_paginated_response(grade_infos)
 
     @staticmethod
-    def _filter_grades(grade_infos: List[dict], query_params: QueryDict) -> List[dict]:
-        """筛选学员成绩"""
+    def _filter_grades(
+        training_class_ids: List[int],
+        exam_students: QuerySet,
+        exam_id_to_training_class_id: Dict[int, int],
+        query_params: QueryDict,
+        is_snapshot_fresh: bool,
+    ) -> List[int]:
+        """筛选学员成绩, 培训班名称、任意一场考试名称或开考时间符合, 则整个培训班展示"""
 
         training_class_name = query_params.get("training_class_name")
         exam_title = query_params.get("exam_title")
@@ -237,30 +296,46 @@ class ModelViewSet(DRFModelViewSet):
         start_datetime_after = query_params.get("start_datetime_after")
 
         if not any([training_class_name, exam_title, start_datetime_before, start_datetime_after]):
-            return grade_infos
-
-        filtered_grades = []
-        for grade_info in grade_infos:
-            # 筛选培训班名称
-            if training_class_name and training_class_name in grade_info["training_class_name"]:
-                filtered_grades.append(grade_info)
-                continue
-
-            # 只要有一个符合则整个展示
-            for grade_detail in grade_info["grades"]:
-                # 筛选考试名称
-                if exam_title and exam_title in grade_detail["exam_info"]["title"]:
-                    filtered_grades.append(grade_info)
-                    break
-
-                # 筛选开考时间
-                start_time: str = grade_detail["start_time"]
-                if start_time and start_datetime_after and start_datetime_before:
-                    if datetime.fromisoformat(start_datetime_after) <= datetime.fromisoformat(start_time) \
-                            <= datetime.fromisoformat(start_datetime_before):
-                        filtered_grades.append(grade_info)
-                        break
-
-        return filtered_grades
+            return training_class_ids
+
+        matched_training_class_ids: Set[int] = set()
+
+        # 筛选培训班名称
+        if training_class_name:
+            training_classes, name_alias = PropertyExpressions.alias(
+                TrainingClass.objects.filter(id__in=training_class_ids), "name"
+            )
+            matched_training_class_ids |= set(
+                training_classes.filter(**{f"{name_alias}__contains": training_class_name}).values_list(
+                    "id", flat=True
+                )
+            )
+
+        # 筛选考试名称
+        matched_exam_ids: Set[int] = set()
+        if exam_title:
+            if is_snapshot_fresh:
+                exam_ids: QuerySet = exam_students.filter(title__contains=exam_title).values_list("exam_id", flat=True)
+            else:
+                exam_ids = ExamArrange.objects.filter(
+                    id__in=list(exam_id_to_training_class_id), title__contains=exam_title
+                ).values_list("id", flat=True)
+            matched_exam_ids |= set(exam_ids)
+
+        # 筛选开考时间, 与展示的开考时间一致按 UTC 比较
+        if start_datetime_after and start_datetime_before:
+            start_datetime_range: List[datetime] = [
+                timezone.make_aware(value, pytz.utc) if timezone.is_naive(value) else value
+                for value in map(datetime.fromisoformat, [start_datetime_after, start_datetime_before])
+            ]
+            matched_exam_ids |= set(
+                exam_students.filter(start_time__range=start_datetime_range).values_list("exam_id", flat=True)
+            )
+
+        matched_training_class_ids |= {exam_id_to_training_class_id[exam_id] for exam_id in matched_exam_ids}
+        return [
+            training_class_id for training_class_id in training_class_ids
+            if training_class_id in matched_training_class_ids
+        ]
 
     # endregion
@@ -0,0 +1,44 @@
+from collections import defaultdict
+from typing import Dict, Optional, Tuple, Type
+
+from django.db.models import Model, QuerySet
+from django.db.models.expressions import BaseExpression, Combinable
+
+
+class PropertyExpressions:
+    """
+    Model property -> ORM 表达式 注册表
+
+    注册后按 property 筛选、搜索、排序都在数据库中完成, 未注册的 property 仍在 Python 中逐条计算
+
+    PropertyExpressions.register(TrainingClass, name=Concat("course__name", Value("-"), "session_number"))
+    """
+
+    registry: Dict[Type[Model], Dict[str, Combinable]] = defaultdict(dict)
+
+    # 别名前缀, 避免与 property 同名导致实例赋值失败
+    ALIAS_PREFIX = "property_"
+
+    @classmethod
+    def register(cls, model: Type[Model], **expressions: Combinable):
+        cls.registry[model].update(expressions)
+
+    @classmethod
+    def get(cls, model: Type[Model], property_name: str) -> Optional[BaseExpression]:
+        return cls.registry.get(model, {}).get(property_name)
+
+    @classmethod
+    def alias(cls, queryset: QuerySet, property_name: str) -> Tuple[QuerySet, Optional[str]]:
+        """
+        为 queryset 添加 property 对应的表达式别名(不查询出来), 返回 (queryset, 别名)
+        property 未注册时别名为 None
+        """
+        expression: Optional[BaseExpression] = cls.get(queryset.model, property_name)
+        if expression is None:
+            return queryset, None
+
+        alias_name: str = f"{cls.ALIAS_PREFIX}{property_name}"
+        if alias_name not in queryset.query.annotations:
+            queryset = queryset.alias(**{alias_name: expression})
+
+        return queryset, alias_name
@@ -0,0 +1,291 @@
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, FloatField, Model, Q, QuerySet, Value, When
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import Combinable, RawSQL
+
+
+class NgramTokenBackend:
+    """
+    n-gram 词元表
+
+    保存时把索引字段切分为二元词元写入 SearchToken, 搜索时按词元取候选记录, 再由 icontains 确认
+    """
+
+    NGRAM_SIZE = 2
+    BATCH_SIZE = 1000
+    # 词频统计上限, 以及取交集的词元数
+    FREQUENCY_LIMIT = 10000
+    INTERSECT_TOKENS = 2
+
+    @classmethod
+    def tokenize(cls, text: str) -> Counter:
+        """按空白分段后切分为二元词元, 统一小写"""
+        tokens: Counter = Counter()
+        for segment in str(text or "").lower().split():
+            tokens.update(segment[index:index + cls.NGRAM_SIZE] for index in range(len(segment) - cls.NGRAM_SIZE + 1))
+        return tokens
+
+    @classmethod
+    def build_tokens(cls, instance: Model, fields: Iterable[str]) -> list:
+        from apps.platform_management.models import SearchToken
+
+        tokens: Counter = Counter()
+        for field in fields:
+            tokens.update(cls.tokenize(getattr(instance, field)))
+
+        return [
+            SearchToken(model=instance._meta.label_lower, object_id=instance.pk, token=token, count=count)
+            for token, count in tokens.items()
+        ]
+
+    @classmethod
+    def index(cls, instances: Iterable[Model], fields: Iterable[str]):
+        """重建实例的词元"""
+        from apps.platform_management.models import SearchToken
+
+        instances = list(instances)
+        if not instances:
+            return
+
+        with transaction.atomic():
+            cls.remove(instances[0]._meta.model, [instance.pk for instance in instances])
+            SearchToken.objects.bulk_create(
+                [token for instance in instances for token in cls.build_tokens(instance, fields)],
+                batch_size=cls.BATCH_SIZE,
+            )
+
+    @classmethod
+    def remove(cls, model: Type[Model], object_ids: Iterable[int]):
+        from apps.platform_management.models import SearchToken
+
+        SearchToken.objects.filter(model=model._meta.label_lower, object_id__in=list(object_ids)).delete()
+
+    @classmethod
+    def clear(cls, model: Type[Model]):
+        from apps.platform_management.models import SearchToken
+
+        SearchToken.objects.filter(model=model._meta.label_lower).delete()
+
+    @classmethod
+    def search(cls, model: Type[Model], value: str, fields: Iterable[str]) -> Optional[Tuple[Q, Optional[Combinable]]]:
+        """
+        候选记录取最稀有的两个词元的倒排列表交集, 词频只统计到 FREQUENCY_LIMIT 为止,
+        常见词元(如公司名中的“公司”)不会扫描整个倒排列表; 所有词元都很常见时索引没有区分度, 退回逐行 LIKE
+        """
+        from apps.platform_management.models import SearchToken
+
+        tokens: List[str] = list(cls.tokenize(value))
+        if not tokens:
+            return None
+
+        postings: QuerySet = SearchToken.objects.filter(model=model._meta.label_lower)
+        token_to_frequency: Dict[str, int] = {
+            token: postings.filter(token=token)[:cls.FREQUENCY_LIMIT].count() for token in tokens
+        }
+
+        tokens.sort(key=token_to_frequency.get)
+        if token_to_frequency[tokens[0]] >= cls.FREQUENCY_LIMIT:
+            return None
+
+        candidate_query = Q()
+        for token in tokens[:cls.INTERSECT_TOKENS]:
+            candidate_query &= Q(pk__in=postings.filter(token=token).values("object_id"))
+
+        return candidate_query, None
+
+
+class FullTextBackend:
+    """
+    MySQL FULLTEXT 索引(ngram 分词), 索引由迁移创建, 按短语匹配相关度排序
+    """
+
+    # 与 MySQL ngram_token_size 默认值一致, 更短的查询无法命中索引
+    NGRAM_SIZE = 2
+
+    @classmethod
+    def index_name(cls, model: Type[Model]) -> str:
+        return f"ft_{model._meta.model_name}_search"
+
+    @classmethod
+    def create_index_sql(cls, model: Type[Model], fields: Iterable[str]) -> str:
+        return f"ALTER TABLE `{model._meta.db_table}` ADD FULLTEXT INDEX `{cls.index_name(model)}` " \
+               f"({cls.columns(model, fields)}) WITH PARSER ngram"
+
+    @classmethod
+    def drop_index_sql(cls, model: Type[Model]) -> str:
+        return f"ALTER TABLE `{model._meta.db_table}` DROP INDEX `{cls.index_name(model)}`"
+
+    @classmethod
+    def columns(cls, model: Type[Model], fields: Iterable[str], with_table: bool = False) -> str:
+        table: str = f"`{model._meta.db_table}`." if with_table else ""
+        return ", ".join(f"{table}`{model._meta.get_field(field).column}`" for field in fields)
+
+    @classmethod
+    def index(cls, instances: Iterable[Model], fields: Iterable[str]):
+        """由 MySQL 维护索引"""
+
+    @classmethod
+    def remove(cls, model: Type[Model], object_ids: Iterable[int]):
+        """由 MySQL 维护索引"""
+
+    @classmethod
+    def search(cls, model: Type[Model], value: str, fields: Iterable[str]) -> Optional[Tuple[Q, Optional[Combinable]]]:
+        if all(len(segment) < cls.NGRAM_SIZE for segment in value.split()):
+            return None
+
+        # 双引号内为短语匹配, 布尔运算符不生效
+        phrase: str = '"{}"'.format(" ".join(value.replace('"', " ").split()))
+        rank = RawSQL(
+            f"MATCH ({cls.columns(model, fields, with_table=True)}) AGAINST (%s IN BOOLEAN MODE)",
+            [phrase],
+            output_field=FloatField(),
+        )
+        return Q(search_rank__gt=0), rank
+
+
+class SearchIndex:
+    """
+    默认搜索框的索引
+
+    注册后 BaseFilterSet.filter_default 先通过索引取候选记录, 再按原有的 icontains 条件确认, 结果按相关度排序
+    MySQL(非 MariaDB) 使用 FULLTEXT ngram 索引, 其他数据库使用保存时维护的 n-gram 词元表;
+    也可以通过 settings.SEARCH_BACKEND = "fulltext" / "ngram" 指定
+
+    SearchIndex.register(Instructor, "username", "introduction")
+    """
+
+    registry: Dict[Type[Model], Tuple[str, ...]] = defaultdict(tuple)
+
+    BACKENDS = {
+        "fulltext": FullTextBackend,
+        "ngram": NgramTokenBackend,
+    }
+
+    @classmethod
+    def register(cls, model: Type[Model], *fields: str):
+        cls.registry[model] = tuple(dict.fromkeys(cls.registry[model] + fields))
+
+    @classmethod
+    def get_fields(cls, model: Type[Model]) -> Tuple[str, ...]:
+        return cls.registry.get(model, ())
+
+    @classmethod
+    def get_backend(cls, using: str = "default"):
+        backend_name: Optional[str] = getattr(settings, "SEARCH_BACKEND", None)
+        if not backend_name:
+            connection = connections[using]
+            is_mysql: bool = connection.vendor == "mysql" and not connection.mysql_is_mariadb
+            backend_name = "fulltext" if is_mysql else "ngram"
+        return cls.BACKENDS[backend_name]
+
+    @classmethod
+    def update(cls, instances: Iterable[Model], model: Type[Model]):
+        """实例保存后更新索引"""
+        if cls.get_fields(model):
+            cls.get_backend().index(instances, cls.get_fields(model))
+
+    @classmethod
+    def remove(cls, model: Type[Model], object_ids: Iterable[int]):
+        if cls.get_fields(model):
+            cls.get_backend().remove(model, object_ids)
+
+    @classmethod
+    def rebuild(cls, model: Type[Model], batch_size: int = 1000) -> int:
+        """全量重建 n-gram 词元, 用于首次上线或绕过 save 的批量修改之后; FULLTEXT 索引由 MySQL 维护"""
+        if cls.get_backend() is not NgramTokenBackend:
+            return 0
+
+        NgramTokenBackend.clear(model)
+        count: int = 0
+        instances: List[Model] = []
+        for instance in model.objects.order_by("pk").only("pk", *cls.get_fields(model)).iterator():
+            instances.append(instance)
+            if len(instances) >= batch_size:
+                NgramTokenBackend.index(instances, cls.get_fields(model))
+                count += len(instances)
+                instances = []
+
+        NgramTokenBackend.index(instances, cls.get_fields(model))
+        return count + len(instances)
+
+    @classmethod
+    def search(cls, queryset: QuerySet, value: str, fields: Iterable[str], query: Q = Q()) -> QuerySet:
+        """
+        在 fields 中 icontains 搜索 value, 与 query 条件取并集
+        已注册索引的字段通过索引取候选记录并按相关度排序, 关联字段先在关联表中取出匹配的 id 再按外键筛选,
+        query 中只应包含可以走索引的条件(外键、主键等), 否则与索引取并集时仍会全表扫描
+        """
+        indexed_fields: Tuple[str, ...] = cls.get_fields(queryset.model)
+        searched_fields: List[str] = []
+        text_query = Q()
+        for field in fields:
+            if field in indexed_fields:
+                searched_fields.append(field)
+                text_query |= Q(**{f"{field}__icontains": value})
+            else:
+                query |= cls.related_query(queryset.model, field, value)
+
+        if not searched_fields:
+            return queryset.filter(query)
+
+        # 候选记录查询和相关度, 索引无法使用时(查询过短或词元都很常见)逐行 LIKE, 按命中字段排序
+        backend = cls.get_backend(queryset.db)
+        candidate_query, rank = backend.search(queryset.model, value, indexed_fields) or (Q(), None)
+        if rank is None:
+            rank = cls.field_rank(value, searched_fields)
+
+        # 关联表中没有匹配时外键条件为空集, 不出现在 SQL 中, 只剩索引条件
+        return queryset.annotate(search_rank=rank).filter((candidate_query & text_query) | query).order_by(
+            "-search_rank", "-pk"
+        )
+
+    @classmethod
+    def related_query(cls, model: Type[Model], field_path: str, value: str) -> Q:
+        """
+        关联字段(如 affiliated_client_company__name)的部分匹配
+
+        从路径末端的关联表(公司等小表)开始取出匹配的 id, 逐级换算为上一级的 id, 最后按本表外键筛选,
+        外键有索引, 不在本表上联表逐行 LIKE; 路径中有反向或多对多关联时按原样 icontains
+        """
+        relations: List[str] = field_path.split(LOOKUP_SEP)
+        field_name: str = relations.pop()
+
+        related_models: List[Type[Model]] = []
+        for relation in relations:
+            field = model._meta.get_field(relation)
+            if not (field.concrete and (field.many_to_one or field.one_to_one)):
+                return Q(**{f"{field_path}__icontains": value})
+            model = field.related_model
+            related_models.append(model)
+
+        if not relations:
+            return Q(**{f"{field_path}__icontains": value})
+
+        ids: List[int] = list(
+            model._default_manager.filter(**{f"{field_name}__icontains": value}).values_list("pk", flat=True)
+        )
+        for index in range(len(relations) - 1, 0, -1):
+            if not ids:
+                break
+            ids = list(
+                related_models[index - 1]._default_manager.filter(
+                    **{f"{relations[index]}__in": ids}
+                ).values_list("pk", flat=True)
+            )
+        return Q(**{f"{relations[0]}__in": ids})
+
+    @classmethod
+    def field_rank(cls, value: str, fields: Iterable[str]) -> Combinable:
+        """相关度: 命中的字段按顺序加权求和, 名称等靠前的字段权重更高"""
+        fields = list(fields)
+        return sum(
+            (
+                Case(When(**{f"{field}__icontains": value}, then=Value(len(fields) - index)), default=Value(0))
+                for index, field in enumerate(fields)
+            ),
+            Value(0),
+        )
@@ -10,6 +10,7 @@ from rest_framework import serializers
 
 from common.utils.cipher import cipher
 from common.utils.file_defense import convert_resource_url
+from common.utils.identity_map import IdentityMap
 from common.utils.tools import reverse_dict
 
 T = TypeVar(name="T", bound=Model)
@@ -138,7 +139,7 @@ class ListSerializer(serializers.ListSerializer):
 
 def get_model_instance_or_raise(model: Type[T], field: str, value: Any) -> T:
     try:
-        return model.objects.get(**{field: value})
+        return IdentityMap.get(model, **{field: value})
     except ObjectDoesNotExist:
         raise serializers.ValidationError(f"该 {model.__name__} 模型实例查不到")
     except MultipleObjectsReturned:
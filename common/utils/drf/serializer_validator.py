@@ -11,6 +11,7 @@ from apps.platform_management.models import (
     Instructor,
     ManageCompany,
 )
+from common.utils import global_constants
 
 
 class BasicSerializerValidator:
@@ -76,3 +77,15 @@ class PhoneCreateSerializerValidator:
             raise serializers.ValidationError(f"该客户学员手机号码{value}已存在。")
 
         return value
+
+
+class CalendarRangeSerializerValidator:
+    def validate(self, attrs):
+        """日程查询范围校验"""
+        if attrs["start_date"] > attrs["end_date"]:
+            raise serializers.ValidationError("结束时间必须大于或等于开始时间")
+
+        if (attrs["end_date"] - attrs["start_date"]).days >= global_constants.CALENDAR_MAX_DAYS:
+            raise serializers.ValidationError(f"日程查询范围不能超过{global_constants.CALENDAR_MAX_DAYS}天")
+
+        return attrs
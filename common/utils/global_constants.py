@@ -23,6 +23,21 @@ ROLE_TOOLTIPS = """平台管理员：有系统全局的权限
 # 上课天数
 CLASS_DAYS = 2
 
+# 讲师每日状态物化的时间范围(从今天起往后的天数)
+DAY_STATUS_HORIZON_DAYS = 365
+
+# 讲师每日状态保留的过去天数, 覆盖当月日程, 更早的日期按日程计算
+DAY_STATUS_RETENTION_DAYS = 31
+
+# 日程查询的最大天数
+CALENDAR_MAX_DAYS = 731
+
+# 日程查询超过该天数时分段构建并流式返回
+CALENDAR_STREAM_DAYS = 93
+
+# 可排课时间默认查询天数
+AVAILABLE_SLOTS_DAYS = 183
+
 # 下载文件URL
 DOWNLOAD_URL = "/api/platform_management/attachment/"
 
@@ -0,0 +1,138 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Generator, List, Optional, Tuple, Type
+
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+
+_current_identity_map: ContextVar[Optional["IdentityMap"]] = ContextVar("identity_map", default=None)
+
+
+class IdentityMap:
+    """
+    请求内的参考表身份映射
+
+    管理公司、客户公司、课程模板等参考表在同一请求内按 id / 名称 查找只查询一次数据库,
+    需要全部名称时整表加载一次, 之后的查找都从内存中取; 不在请求内(如 Celery 任务)时直接查询数据库
+    注册的模型保存或删除后, 当前请求内该表的缓存失效
+
+    IdentityMap.register(ClientCompany, "name")
+    IdentityMap.get(ClientCompany, name="客户公司")
+    """
+
+    # 模型 -> 可查找的唯一字段
+    registry: Dict[Type[Model], Tuple[str, ...]] = {}
+
+    def __init__(self):
+        # (模型, 字段) -> {字段值: 实例}
+        self.indexes: Dict[Tuple[Type[Model], str], Dict[Any, Model]] = defaultdict(dict)
+        # 已整表加载的模型 -> 全部实例
+        self.model_to_instances: Dict[Type[Model], List[Model]] = {}
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    @classmethod
+    def register(cls, model: Type[Model], *fields: str):
+        cls.registry[model] = tuple(dict.fromkeys(("pk", model._meta.pk.name, *cls.registry.get(model, ()), *fields)))
+        for signal in (post_save, post_delete):
+            signal.connect(cls.on_change, sender=model, weak=False, dispatch_uid=f"identity_map_{model._meta.label}")
+
+    @classmethod
+    def on_change(cls, sender: Type[Model], **kwargs):
+        identity_map: Optional[IdentityMap] = cls.current()
+        if identity_map is not None:
+            identity_map.invalidate(sender)
+
+    @classmethod
+    def current(cls) -> Optional["IdentityMap"]:
+        return _current_identity_map.get()
+
+    @classmethod
+    @contextmanager
+    def activate(cls) -> Generator["IdentityMap", None, None]:
+        """在上下文内启用新的身份映射"""
+        token = _current_identity_map.set(cls())
+        try:
+            yield _current_identity_map.get()
+        finally:
+            _current_identity_map.reset(token)
+
+    @classmethod
+    def get(cls, model: Type[Model], **lookup: Any) -> Model:
+        """按唯一字段查找一个实例, 不存在时与 objects.get 一样抛出 DoesNotExist"""
+        identity_map: Optional[IdentityMap] = cls.current()
+        (field, value), = lookup.items()
+        if identity_map is None or field not in cls.registry.get(model, ()):
+            return model.objects.get(**lookup)
+
+        return identity_map.lookup(model, field, value)
+
+    @classmethod
+    def values(cls, model: Type[Model], field: str) -> List[Any]:
+        """参考表某一字段的全部值, 如全部名称"""
+        identity_map: Optional[IdentityMap] = cls.current()
+        if identity_map is None or model not in cls.registry:
+            return list(model.objects.values_list(field, flat=True))
+
+        return [getattr(instance, field) for instance in identity_map.load(model)]
+
+    @classmethod
+    def related(cls, instance: Model, field_name: str) -> Optional[Model]:
+        """外键关联的参考表实例, 已 select_related 时直接使用, 否则从身份映射中取并缓存到实例上"""
+        field = instance._meta.get_field(field_name)
+        related_id: Any = getattr(instance, field.attname)
+        if related_id is None or field.is_cached(instance) or cls.current() is None \
+                or field.related_model not in cls.registry:
+            return getattr(instance, field_name)
+
+        related_instance: Model = cls.get(field.related_model, pk=related_id)
+        field.set_cached_value(instance, related_instance)
+        return related_instance
+
+    def lookup(self, model: Type[Model], field: str, value: Any) -> Model:
+        index: Dict[Any, Model] = self.indexes[(model, field)]
+        if value in index:
+            self.hits[model._meta.label] += 1
+            return index[value]
+
+        # 已整表加载时不存在即不存在, 不再查询数据库
+        if model in self.model_to_instances:
+            self.hits[model._meta.label] += 1
+            raise model.DoesNotExist(f"{model._meta.object_name} matching {field}={value!r} does not exist.")
+
+        self.misses[model._meta.label] += 1
+        instance: Model = model.objects.get(**{field: value})
+        self.add(instance)
+        return instance
+
+    def load(self, model: Type[Model]) -> List[Model]:
+        """整表加载, 每个请求最多一次"""
+        instances: Optional[List[Model]] = self.model_to_instances.get(model)
+        if instances is not None:
+            self.hits[model._meta.label] += 1
+            return instances
+
+        self.misses[model._meta.label] += 1
+        instances = self.model_to_instances[model] = list(model.objects.all())
+        for instance in instances:
+            self.add(instance)
+        return instances
+
+    def add(self, instance: Model):
+        model: Type[Model] = type(instance)
+        for field in self.registry.get(model, ()):
+            self.indexes[(model, field)][getattr(instance, field)] = instance
+
+    def invalidate(self, model: Type[Model]):
+        self.model_to_instances.pop(model, None)
+        for field in self.registry.get(model, ()):
+            self.indexes.pop((model, field), None)
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各模型的命中/未命中次数"""
+        return {
+            label: {"hits": self.hits[label], "misses": self.misses[label]}
+            for label in sorted(set(self.hits) | set(self.misses))
+        }
@@ -1,8 +1,15 @@
 import json
+import logging
 import traceback
+from typing import Optional
 
 from django.http import JsonResponse
 
+from common.utils.identity_map import IdentityMap
+from common.utils.query_budget import QueryStats, get_query_budget
+
+logger = logging.getLogger(__name__)
+
 
 class Capture500Middleware:
     def __init__(self, get_response):
@@ -27,3 +34,57 @@ class Capture500Middleware:
             json.dump(error_details, f, indent=4)
 
         return JsonResponse({'result': False, 'err_msg': "服务器异常，详情查看日志", 'code': 400}, status=500)
+
+
+class IdentityMapMiddleware:
+    """每个请求启用一个参考表身份映射, 请求结束后记录命中/未命中次数"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with IdentityMap.activate() as identity_map:
+            response = self.get_response(request)
+
+        if identity_map.hits or identity_map.misses:
+            logger.debug(f"[{request.method}] {request.path} identity map: {identity_map.stats}")
+        return response
+
+
+class QueryBudgetMiddleware:
+    """
+    记录每个视图(视图类.action)的查询次数、SQL 总耗时和重复查询, 聚合结果由 query_stats 接口查看;
+    超过视图声明的查询次数上限(QUERY_BUDGET_MAP)时记录告警
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryStats.capture() as stats:
+            response = self.get_response(request)
+
+        view_class, action = getattr(request, "query_budget_view", (None, None))
+        if view_class is None:
+            return response
+
+        label: str = f"{view_class.__name__}.{action}"
+        budget: Optional[int] = get_query_budget(view_class, action)
+        if budget is not None and stats.query_count > budget:
+            logger.warning(
+                f"[{request.method}] {request.path} {label} 执行了 {stats.query_count} 次查询, 上限为 {budget}, "
+                f"重复的查询次数: {list(stats.duplicates.values())}"
+            )
+
+        try:
+            stats.record(label, budget)
+        except Exception as e:  # noqa
+            logger.warning(f"记录 {label} 查询统计失败: {e}")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """DRF 视图的 as_view 上保留了视图类和 请求方法 -> action 的映射"""
+        view_class = getattr(view_func, "cls", None)
+        if view_class is not None:
+            actions: dict = getattr(view_func, "actions", None) or {}
+            request.query_budget_view = (view_class, actions.get(request.method.lower(), request.method.lower()))
@@ -0,0 +1,151 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Generator, List, Optional
+
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    一次请求(或一段代码)内的 SQL 统计: 查询次数、总耗时、重复查询指纹
+
+    通过 connection.execute_wrapper 记录, 不依赖 DEBUG; 指纹为参数化后的 SQL, IN 列表折叠为一个占位符,
+    同一指纹出现多次通常是 N+1 查询
+    """
+
+    KEY_PREFIX = "query_stats"
+    TIMEOUT = 60 * 60 * 24 * 7
+    # 每个视图保留的重复指纹数量
+    DUPLICATE_LIMIT = 10
+
+    IN_LIST_PATTERN = re.compile(r"\bIN \((?:%s, )*%s\)", re.IGNORECASE)
+
+    def __init__(self):
+        self.query_count: int = 0
+        self.total_time: float = 0
+        self.fingerprint_to_count: Counter = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start_time: float = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.total_time += time.perf_counter() - start_time
+            self.query_count += 1
+            self.fingerprint_to_count[self.fingerprint(sql)] += 1
+
+    @classmethod
+    def fingerprint(cls, sql: str) -> str:
+        return cls.IN_LIST_PATTERN.sub("IN (...)", sql)
+
+    @property
+    def duplicates(self) -> Dict[str, int]:
+        """重复执行的指纹 -> 次数"""
+        return {fingerprint: count for fingerprint, count in self.fingerprint_to_count.most_common() if count > 1}
+
+    @classmethod
+    @contextmanager
+    def capture(cls) -> Generator["QueryStats", None, None]:
+        """在上下文内记录所有数据库连接上的查询"""
+        stats = cls()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            yield stats
+
+    # region 聚合
+    @classmethod
+    def labels_key(cls) -> str:
+        return f"{cls.KEY_PREFIX}:labels"
+
+    @classmethod
+    def label_key(cls, label: str) -> str:
+        return f"{cls.KEY_PREFIX}:{label}"
+
+    def record(self, label: str, budget: Optional[int] = None):
+        """
+        累加到视图的统计中, 聚合保存在缓存中以便多进程共享;
+        并发请求可能丢失少量样本, 只用于发现查询过多的视图
+        """
+        labels: List[str] = cache.get(self.labels_key(), [])
+        if label not in labels:
+            cache.set(self.labels_key(), sorted([*labels, label]), timeout=self.TIMEOUT)
+
+        aggregate: dict = cache.get(self.label_key(label)) or {
+            "requests": 0, "queries": 0, "time": 0, "max_queries": 0, "over_budget": 0, "duplicates": {},
+        }
+        aggregate["requests"] += 1
+        aggregate["queries"] += self.query_count
+        aggregate["time"] += self.total_time
+        aggregate["max_queries"] = max(aggregate["max_queries"], self.query_count)
+        aggregate["budget"] = budget
+        if budget is not None and self.query_count > budget:
+            aggregate["over_budget"] += 1
+
+        duplicates: Counter = Counter(aggregate["duplicates"])
+        duplicates.update(self.duplicates)
+        aggregate["duplicates"] = dict(duplicates.most_common(self.DUPLICATE_LIMIT))
+        cache.set(self.label_key(label), aggregate, timeout=self.TIMEOUT)
+
+    @classmethod
+    def summary(cls) -> List[dict]:
+        """各视图的统计, 按平均查询次数倒序"""
+        labels: List[str] = cache.get(cls.labels_key(), [])
+        label_to_aggregate: Dict[str, dict] = cache.get_many([cls.label_key(label) for label in labels])
+
+        rows: List[dict] = []
+        for label in labels:
+            aggregate: Optional[dict] = label_to_aggregate.get(cls.label_key(label))
+            if not aggregate:
+                continue
+            rows.append({
+                "view": label,
+                "requests": aggregate["requests"],
+                "avg_queries": round(aggregate["queries"] / aggregate["requests"], 2),
+                "max_queries": aggregate["max_queries"],
+                "avg_time_ms": round(aggregate["time"] * 1000 / aggregate["requests"], 2),
+                "budget": aggregate["budget"],
+                "over_budget": aggregate["over_budget"],
+                "duplicates": [
+                    {"fingerprint": fingerprint, "count": count}
+                    for fingerprint, count in aggregate["duplicates"].items()
+                ],
+            })
+        return sorted(rows, key=lambda row: row["avg_queries"], reverse=True)
+
+    @classmethod
+    def reset(cls):
+        labels: List[str] = cache.get(cls.labels_key(), [])
+        cache.delete_many([cls.labels_key(), *[cls.label_key(label) for label in labels]])
+    # endregion
+
+
+def get_query_budget(view_class, action: str) -> Optional[int]:
+    """视图类上声明的查询次数上限, 见 ModelViewSet.QUERY_BUDGET_MAP"""
+    return getattr(view_class, "QUERY_BUDGET_MAP", {}).get(action)
+
+
+@contextmanager
+def assert_query_budget(view_class, action: str) -> Generator[QueryStats, None, None]:
+    """
+    断言上下文内的查询次数不超过视图声明的上限, 超过时列出重复的查询, 用于本地检查 N+1 回归
+
+    with assert_query_budget(TrainingClassModelViewSet, "list"):
+        client.get("/api/teaching_space/training_class/", {"page": 1, "page_size": 100})
+    """
+    budget: Optional[int] = get_query_budget(view_class, action)
+    assert budget is not None, f"{view_class.__name__}.{action} 未声明查询次数上限"
+
+    with QueryStats.capture() as stats:
+        yield stats
+
+    assert stats.query_count <= budget, (
+        f"{view_class.__name__}.{action} 执行了 {stats.query_count} 次查询, 上限为 {budget}, 重复的查询: "
+        + "; ".join(f"[{count}次] {fingerprint}" for fingerprint, count in stats.duplicates.items())
+    )
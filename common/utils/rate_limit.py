@@ -0,0 +1,198 @@
+import threading
+import time
+from typing import Dict, List, NamedTuple, Tuple
+
+from django.core.cache import cache
+
+try:
+    from django_redis import get_redis_connection
+except ImportError:  # pragma: no cover
+    get_redis_connection = None
+
+
+class Bucket(NamedTuple):
+    """令牌桶, 每 period 秒补充 capacity 个令牌, 最多积攒 capacity 个"""
+
+    # 统计维度, 如 phone / template / global
+    scope: str
+    key: str
+    capacity: int
+    period: float
+
+
+# 检查所有令牌桶, 都有足够令牌时才一起扣减, 否则返回需要等待的秒数和限流的令牌桶序号
+# KEYS: 令牌桶 key; ARGV: now, cost, 每个令牌桶的 capacity, period
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local tokens = {}
+local wait, limited = 0, 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[1 + i * 2])
+    local rate = capacity / tonumber(ARGV[2 + i * 2])
+    local bucket = redis.call("HMGET", key, "tokens", "ts")
+    local available = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    available = math.min(capacity, available + math.max(0, now - ts) * rate)
+    tokens[i] = available
+    if available < cost and (cost - available) / rate > wait then
+        wait, limited = (cost - available) / rate, i
+    end
+end
+if wait > 0 then
+    return {tostring(wait), limited}
+end
+for i, key in ipairs(KEYS) do
+    redis.call("HMSET", key, "tokens", tostring(tokens[i] - cost), "ts", tostring(now))
+    redis.call("EXPIRE", key, math.ceil(tonumber(ARGV[2 + i * 2])))
+end
+return {"0", 0}
+"""
+
+# 归还令牌(不超过 capacity), 令牌桶已过期(视为满)时不处理
+# KEYS: 令牌桶 key; ARGV: cost, 每个令牌桶的 capacity
+TOKEN_BUCKET_RELEASE_SCRIPT = """
+local cost = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local tokens = tonumber(redis.call("HGET", key, "tokens"))
+    if tokens then
+        redis.call("HSET", key, "tokens", tostring(math.min(tonumber(ARGV[1 + i]), tokens + cost)))
+    end
+end
+return 0
+"""
+
+
+class TokenBucketLimiter:
+    """
+    令牌桶限流
+
+    缓存为 Redis(django-redis) 时由 Lua 脚本原子地检查和扣减多个令牌桶, 多进程共享限额;
+    其他缓存(开发环境)退化为进程内加锁读写缓存, 只保证单进程内准确
+    各维度通过、限流的次数记录在缓存中, 用于监控
+    """
+
+    PREFIX = "rate_limit"
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._script = None
+        self._release_script = None
+
+    @property
+    def stats_key(self) -> str:
+        return f"{self.PREFIX}:{self.name}:stats"
+
+    def acquire(self, buckets: List[Bucket], cost: int = 1) -> float:
+        """扣减令牌, 通过时返回 0, 否则返回需要等待的秒数"""
+        if not buckets:
+            return 0
+
+        buckets = [bucket._replace(key=f"{self.PREFIX}:{self.name}:{bucket.key}") for bucket in buckets]
+        redis_client = self.redis_client()
+        if redis_client is None:
+            wait, limited = self._acquire_local(buckets, cost)
+        else:
+            wait, limited = self._acquire_redis(redis_client, buckets, cost)
+
+        self.incr_stats(redis_client, f"{buckets[limited - 1].scope}:limited" if wait else "allowed")
+        return wait
+
+    def release(self, buckets: List[Bucket], cost: int = 1):
+        """归还 acquire 扣减的令牌, 用于扣减后实际没有发生的调用(如请求失败)"""
+        if not buckets:
+            return
+
+        buckets = [bucket._replace(key=f"{self.PREFIX}:{self.name}:{bucket.key}") for bucket in buckets]
+        redis_client = self.redis_client()
+        if redis_client is None:
+            self._release_local(buckets, cost)
+            return
+
+        if self._release_script is None:
+            self._release_script = redis_client.register_script(TOKEN_BUCKET_RELEASE_SCRIPT)
+        self._release_script(
+            keys=[bucket.key for bucket in buckets], args=[cost, *[bucket.capacity for bucket in buckets]],
+            client=redis_client,
+        )
+
+    @staticmethod
+    def redis_client():
+        if get_redis_connection is None:
+            return None
+        try:
+            return get_redis_connection("default")
+        except NotImplementedError:
+            return None
+
+    def _acquire_redis(self, redis_client, buckets: List[Bucket], cost: int) -> Tuple[float, int]:
+        if self._script is None:
+            self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+        args: list = [time.time(), cost]
+        for bucket in buckets:
+            args += [bucket.capacity, bucket.period]
+        wait, limited = self._script(keys=[bucket.key for bucket in buckets], args=args, client=redis_client)
+        return float(wait), int(limited)
+
+    def _acquire_local(self, buckets: List[Bucket], cost: int) -> Tuple[float, int]:
+        """与 TOKEN_BUCKET_SCRIPT 相同的算法"""
+        with self._lock:
+            now: float = time.time()
+            key_to_state: Dict[str, Tuple[float, float]] = cache.get_many([bucket.key for bucket in buckets])
+
+            tokens: List[float] = []
+            wait, limited = 0.0, 0
+            for index, bucket in enumerate(buckets, start=1):
+                rate: float = bucket.capacity / bucket.period
+                available, ts = key_to_state.get(bucket.key, (bucket.capacity, now))
+                available = min(bucket.capacity, available + max(0.0, now - ts) * rate)
+                tokens.append(available)
+                if available < cost and (cost - available) / rate > wait:
+                    wait, limited = (cost - available) / rate, index
+
+            if wait > 0:
+                return wait, limited
+
+            for bucket, available in zip(buckets, tokens):
+                cache.set(bucket.key, (available - cost, now), timeout=int(bucket.period) + 1)
+            return 0, 0
+
+    def _release_local(self, buckets: List[Bucket], cost: int):
+        with self._lock:
+            key_to_state: Dict[str, Tuple[float, float]] = cache.get_many([bucket.key for bucket in buckets])
+            for bucket in buckets:
+                if bucket.key in key_to_state:
+                    available, ts = key_to_state[bucket.key]
+                    cache.set(
+                        bucket.key, (min(bucket.capacity, available + cost), ts), timeout=int(bucket.period) + 1
+                    )
+
+    def incr_stats(self, redis_client, field: str):
+        if redis_client is not None:
+            redis_client.hincrby(self.stats_key, field, 1)
+            return
+
+        with self._lock:
+            stats: Dict[str, int] = cache.get(self.stats_key) or {}
+            stats[field] = stats.get(field, 0) + 1
+            cache.set(self.stats_key, stats, timeout=None)
+
+    def stats(self) -> Dict[str, int]:
+        """通过次数(allowed)和各维度的限流次数(<scope>:limited)"""
+        redis_client = self.redis_client()
+        if redis_client is None:
+            return cache.get(self.stats_key) or {}
+
+        return {
+            (field.decode() if isinstance(field, bytes) else field): int(count)
+            for field, count in redis_client.hgetall(self.stats_key).items()
+        }
+
+    def reset_stats(self):
+        redis_client = self.redis_client()
+        if redis_client is None:
+            cache.delete(self.stats_key)
+        else:
+            redis_client.delete(self.stats_key)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Union
 
 from django.conf import settings
 from tencentcloud.common import credential
@@ -9,6 +9,11 @@ from tencentcloud.sms.v20210111 import models
 from tencentcloud.sms.v20210111 import sms_client as tencent_sms_client
 from tencentcloud.sms.v20210111.models import SendStatus
 
+from common.utils.rate_limit import Bucket, TokenBucketLimiter
+
+# 本地限流未发送时的状态码
+RATE_LIMITED_CODE = "LimitExceeded.LocalRateLimit"
+
 
 def send_sms(phone, msg):
     """发送短信"""
@@ -23,6 +28,9 @@ class SMSClient:
     短信SDK
     """
 
+    # 单次请求的手机号数量上限
+    MAX_PHONE_NUMBERS = 200
+
     TEMPLATE_ID_TO_TEMPLATE = {
         "2330588": "尊敬的讲师，您好！由于培训班取消，您参与的[{1}]已被取消。如有疑问，请随时联系。",
         "2330587": "尊敬的讲师，您好！您负责的培训班[{1}]开始时间已修改，时间由{2}调整为{3}。如有疑问，请随时联系。",
@@ -76,12 +84,15 @@ class SMSClient:
             self.client = None
             self.error_msg = e
 
-    def send_sms(self, phone_numbers: List[str], template_id: str, template_params: List[str]) -> List[str]:
+    def send_sms(
+        self, phone_numbers: List[str], template_id: str, template_params: List[str], rate_limited: bool = True
+    ) -> List[str]:
         """
         发送短信
         :param phone_numbers: 手机列表
         :param template_id: 模板id, 参考类属性TEMPLATE_ID_TO_TEMPLATE
         :param template_params: 参数列表, 填充对应模板中的{1}, {2}, {3} ..., 列表长度和模板占位符一致
+        :param rate_limited: 是否检查发送频率, 调用方已经检查过时为 False
 
         python SDK参考 [https://cloud.tencent.com/document/product/382/43196]
         错误码参考 [https://cloud.tencent.com/document/product/382/38780]
@@ -101,19 +112,7 @@ class SMSClient:
         if template_id not in self.TEMPLATE_ID_TO_TEMPLATE:
             return ["模板id无效"]
 
-        req = models.SendSmsRequest()
-        req.SmsSdkAppId = self.sms_app_id
-        req.SignName = self.sms_sign_name
-        req.TemplateId = template_id
-        req.TemplateParamSet = template_params
-        req.PhoneNumberSet = ["+86" + str(number) for number in phone_numbers]
-        req.SessionContext = ""
-        req.ExtendCode = ""
-        req.SenderId = ""
-
-        resp = self.client.SendSms(req)
-
-        send_status: List[SendStatus] = resp.SendStatusSet
+        send_status: List[SendStatus] = self.send_request(phone_numbers, template_id, template_params, rate_limited)
         errors: List[str] = []
         for status in send_status:
             # ---- 发送失败响应体示例 ----
@@ -146,6 +145,138 @@ class SMSClient:
 
         return errors
 
+    def send_request(
+        self, phone_numbers: List[str], template_id: str, template_params: List[str], rate_limited: bool = True
+    ) -> List[SendStatus]:
+        """
+        发送一次 SendSmsRequest, 返回每个手机号的发送状态, 手机号数量不超过 MAX_PHONE_NUMBERS
+        先检查发送频率, 超过限制的手机号不请求腾讯云, 返回 ThrottledSendStatus;
+        接口调用失败或未计费(没有发送出去)的手机号归还扣减的发送次数
+        接口调用失败时抛出 TencentCloudSDKException
+        """
+        throttled_status: List[SendStatus] = []
+        if rate_limited:
+            allowed_phone_numbers: List[str] = []
+            for phone in phone_numbers:
+                retry_after: float = SMSRateLimiter.acquire(phone, template_id)
+                if retry_after:
+                    throttled_status.append(ThrottledSendStatus(phone, retry_after))
+                else:
+                    allowed_phone_numbers.append(phone)
+            phone_numbers = allowed_phone_numbers
+
+        if not phone_numbers:
+            return throttled_status
+
+        try:
+            send_status: List[SendStatus] = self.request(phone_numbers, template_id, template_params)
+        except Exception:
+            if rate_limited:
+                for phone in phone_numbers:
+                    SMSRateLimiter.release(phone, template_id)
+            raise
+
+        if rate_limited:
+            for status in send_status:
+                if not status.Fee:
+                    SMSRateLimiter.release((status.PhoneNumber or "").replace("+86", "", 1), template_id)
+        return send_status + throttled_status
+
+    def request(self, phone_numbers: List[str], template_id: str, template_params: List[str]) -> List[SendStatus]:
+        if not self.client:
+            raise TencentCloudSDKException(message=f"无可用sms_client, client初始化错误信息: {self.error_msg}")
+
+        req = models.SendSmsRequest()
+        req.SmsSdkAppId = self.sms_app_id
+        req.SignName = self.sms_sign_name
+        req.TemplateId = template_id
+        req.TemplateParamSet = template_params
+        req.PhoneNumberSet = ["+86" + str(number) for number in phone_numbers]
+        req.SessionContext = ""
+        req.ExtendCode = ""
+        req.SenderId = ""
+
+        return self.client.SendSms(req).SendStatusSet
+
+
+class ThrottledSendStatus(SendStatus):
+    """本地限流未发送的手机号, retry_after 为需要等待的秒数"""
+
+    def __init__(self, phone: str, retry_after: float):
+        super().__init__()
+        self.PhoneNumber = f"+86{phone}"
+        self.Code = RATE_LIMITED_CODE
+        self.Fee = 0
+        self.SerialNo = ""
+        self.Message = f"发送过于频繁, 需等待{retry_after:.0f}s"
+        self.retry_after = retry_after
+
+
+class SMSRateLimiter:
+    """
+    短信发送频率限制, 按手机号、手机号+模板、模板、整个应用分别限流, 配置见 SMS_RATE_LIMITS
+    在请求腾讯云之前拒绝或延后超过限制的短信, 不再等腾讯云返回 LimitExceeded
+    """
+
+    limiter = TokenBucketLimiter("sms")
+
+    @classmethod
+    def buckets(cls, phone: str, template_id: str) -> List[Bucket]:
+        scope_to_key: Dict[str, str] = {
+            "phone": f"phone:{phone}",
+            "phone_template": f"phone:{phone}:template:{template_id}",
+            "template": f"template:{template_id}",
+            "global": "global",
+        }
+        return [
+            Bucket(scope, f"{key}:{period}", capacity, period)
+            for scope, key in scope_to_key.items()
+            for capacity, period in settings.SMS_RATE_LIMITS.get(scope, [])
+        ]
+
+    @classmethod
+    def acquire(cls, phone: str, template_id: str) -> float:
+        """发送一条短信, 通过时返回 0, 否则返回需要等待的秒数"""
+        return cls.limiter.acquire(cls.buckets(phone, template_id))
+
+    @classmethod
+    def release(cls, phone: str, template_id: str):
+        """归还一条没有发送出去的短信占用的发送次数"""
+        cls.limiter.release(cls.buckets(phone, template_id))
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        return cls.limiter.stats()
+
+
+class FakeSMSClient(SMSClient):
+    """
+    本地短信通道, 不调用腾讯云, 与 SMSClient.send_request 返回相同的发送状态(同样经过频率限制), 用于开发和测试
+    phone_to_code 指定手机号的失败状态码, requests 记录每次请求
+    """
+
+    def __init__(self):
+        self.client = None
+        self.error_msg = ""
+        self.requests: List[dict] = []
+        self.phone_to_code: Dict[str, str] = {}
+
+    def request(self, phone_numbers: List[str], template_id: str, template_params: List[str]) -> List[SendStatus]:
+        self.requests.append({
+            "phone_numbers": list(phone_numbers), "template_id": template_id, "template_params": list(template_params)
+        })
+
+        send_status: List[SendStatus] = []
+        for phone in phone_numbers:
+            status = SendStatus()
+            status.PhoneNumber = f"+86{phone}"
+            status.Code = self.phone_to_code.get(phone, "Ok")
+            status.Fee = 1 if status.Code == "Ok" else 0
+            status.Message = "send success" if status.Code == "Ok" else "fake failure"
+            status.SerialNo = f"fake:{len(self.requests)}:{phone}" if status.Code == "Ok" else ""
+            send_status.append(status)
+        return send_status
+
 
 sms_client = SMSClient(
     secret_id=settings.SMS_SECRET_ID,
@@ -153,3 +284,10 @@ sms_client = SMSClient(
     sms_app_id=settings.SMS_APP_ID,
     sms_sign_name=settings.SMS_SIGN_NAME,
 )
+
+fake_sms_client = FakeSMSClient()
+
+
+def get_sms_transport() -> Union[SMSClient, FakeSMSClient]:
+    """短信发件箱使用的发送通道, 由 SMS_TRANSPORT 配置"""
+    return fake_sms_client if settings.SMS_TRANSPORT == "fake" else sms_client
@@ -0,0 +1,77 @@
+from typing import Any, Dict, Iterable, List, Optional, Type, Union
+
+from django.db.models import Model, QuerySet
+
+# 缓存在实例上的属性名前缀
+CACHE_PREFIX = "_soft_fk_"
+
+# 已预取但目标不存在
+_MISSING = object()
+
+
+def _cache_name(attr: str) -> str:
+    return f"{CACHE_PREFIX}{attr}"
+
+
+def _related_ids(instance: Model, attr: str, many: bool) -> List[Any]:
+    """软外键的值, many 时为 id 列表或 {键: id} 字典(如 answer_ids)"""
+    value: Any = getattr(instance, attr)
+    if not many:
+        return [] if value is None else [value]
+    return list(value.values()) if isinstance(value, dict) else list(value or [])
+
+
+def prefetch_soft_fk(
+    instances: Union[QuerySet, Iterable[Model]],
+    attr: str,
+    model: Type[Model],
+    using: Optional[str] = None,
+    many: bool = False,
+) -> List[Model]:
+    """
+    批量加载整数软外键(跨库, 不能 select_related / prefetch_related)指向的记录, 缓存在实例上, 返回加载到的记录
+
+    一次 id__in 查询加载一层, 多层时对返回的记录继续预取:
+    exams = prefetch_soft_fk(exam_students, "exam_id", ExamArrange)
+    prefetch_soft_fk(exams, "training_class_id", TrainingClass)
+    prefetch_soft_fk(exam_students, "answer_ids_dict", ExamGrade, many=True)
+    """
+    instances = list(instances)
+    related_ids = {related_id for instance in instances for related_id in _related_ids(instance, attr, many)}
+
+    manager = model._default_manager if using is None else model._default_manager.db_manager(using)
+    id_to_related: Dict[Any, Model] = manager.in_bulk(list(related_ids)) if related_ids else {}
+
+    for instance in instances:
+        if many:
+            instance.__dict__[_cache_name(attr)] = [
+                id_to_related[related_id] for related_id in dict.fromkeys(_related_ids(instance, attr, many))
+                if related_id in id_to_related
+            ]
+        else:
+            related_id = getattr(instance, attr)
+            instance.__dict__[_cache_name(attr)] = (related_id, id_to_related.get(related_id, _MISSING))
+
+    return list(id_to_related.values())
+
+
+def get_soft_fk(instance: Model, attr: str, model: Type[Model], using: Optional[str] = None) -> Model:
+    """
+    软外键指向的记录, 已预取时使用缓存, 否则查询一次并缓存(软外键的值修改后重新查询);
+    不存在时与 objects.get 一样抛出 DoesNotExist
+    """
+    related_id: Any = getattr(instance, attr)
+    cached_id, related = instance.__dict__.get(_cache_name(attr), (None, None))
+    if related is None or cached_id != related_id:
+        manager = model._default_manager if using is None else model._default_manager.db_manager(using)
+        related = manager.filter(pk=related_id).first() or _MISSING
+        instance.__dict__[_cache_name(attr)] = (related_id, related)
+
+    if related is _MISSING:
+        raise model.DoesNotExist(f"{model._meta.object_name} matching id={related_id!r} does not exist.")
+    return related
+
+
+def get_prefetched_soft_fks(instance: Model, attr: str) -> Optional[List[Model]]:
+    """many 预取的记录, 未预取时为 None"""
+    return instance.__dict__.get(_cache_name(attr))
@@ -94,7 +94,12 @@ TEMPLATES = [
 ]
 
 # 自定义中间件
-MIDDLEWARE += ()  # noqa
+MIDDLEWARE += (
+    # 视图查询次数统计
+    "common.utils.middleware.QueryBudgetMiddleware",
+    # 请求内的参考表身份映射
+    "common.utils.middleware.IdentityMapMiddleware",
+)  # noqa
 
 # 默认数据库AUTO字段类型
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
@@ -239,6 +244,19 @@ FILTERS_DEFAULT_LOOKUP_EXPR = "icontains"
 # SMS相关配置
 ENABLE_SMS = bool(os.environ.get("ENABLE_SMS", False))
 ENABLE_NOTIFY_SMS = bool(os.environ.get("ENABLE_NOTIFY_SMS", False))
+# 短信发件箱的发送通道, tencent: 腾讯云, fake: 本地记录不发送
+SMS_TRANSPORT = os.environ.get("SMS_TRANSPORT", "tencent")
+# 短信发送频率限制, [(条数, 秒数)], 超过时本地拒绝或延后发送
+SMS_RATE_LIMITS = {
+    # 同一手机号: 30秒1条, 1小时5条, 1天10条(腾讯云默认频率限制)
+    "phone": [(1, 30), (5, 60 * 60), (10, 60 * 60 * 24)],
+    # 同一手机号同一模板: 60秒1条
+    "phone_template": [(1, 60)],
+    # 同一模板
+    "template": [(300, 60)],
+    # 整个应用
+    "global": [(600, 60)],
+}
 NOTIFY_WHITELIST = os.environ["NOTIFY_WHITELIST"].split(",") if "NOTIFY_WHITELIST" in os.environ else []
 SMS_USERNAME = os.environ.get("SMS_USERNAME", "")
 SMS_PASSWORD = os.environ.get("SMS_PASSWORD", "")
@@ -249,6 +267,9 @@ ADMIN_PHONE = os.environ.get("ADMIN_PHONE", "13111111111")
 # 考试系统host
 EXAM_SYSTEM_HOST = os.environ.get("EXAM_SYSTEM_HOST", "")
 
+# 默认搜索后端: fulltext(MySQL FULLTEXT ngram 索引) / ngram(n-gram 词元表), 为空时按数据库自动选择
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "")
+
 # DRF配置
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
@@ -258,7 +279,7 @@ REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.SearchFilter",
-        "rest_framework.filters.OrderingFilter",
+        "common.utils.drf.filters.PropertyOrderingFilter",
     ],
     "PAGE_SIZE": 10,
     "EXCEPTION_HANDLER": "common.utils.drf.exceptions.exception_handler",
@@ -31,28 +31,42 @@ ALLOWED_HOSTS = ["*"]
 
 # 正式环境数据库可以在这里配置
 
+# 连接池: 请求/任务结束时连接归还到池中(CONN_MAX_AGE=0), 物理连接由连接池持续复用
+DATABASE_POOL_SETTINGS = {
+    'CONN_MAX_AGE': 0,
+    # 每个进程同时借出的连接数上限, eventlet / gevent worker 的协程超过上限时等待
+    'POOL_SIZE': int(os.getenv('DATABASE_POOL_SIZE', 10)),
+    # 等待连接的超时秒数
+    'POOL_TIMEOUT': int(os.getenv('DATABASE_POOL_TIMEOUT', 30)),
+    # 连接最长使用秒数, 小于 MySQL wait_timeout
+    'POOL_RECYCLE': int(os.getenv('DATABASE_POOL_RECYCLE', 60 * 30)),
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        # 连接池化的 MySQL, 连接关闭时归还到进程内的连接池, 取出时做健康检查
+        'ENGINE': 'common.utils.db_backends.mysql',
         # 'ENGINE': 'mysql.connector.django',
         'NAME': os.getenv('DATABASE_NAME'),
         'USER': os.getenv('DATABASE_USER'),
         'PASSWORD': os.getenv('DATABASE_PASSWORD'),
         'HOST': os.getenv('DATABASE_HOST'),
         'PORT': '3306',
+        **DATABASE_POOL_SETTINGS,
         'OPTIONS': {
             'auth_plugin': 'mysql_native_password',
             'charset': 'utf8mb4',
         }
     },
     'exam-system': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'common.utils.db_backends.mysql',
         # 'ENGINE': 'mysql.connector.django',
         'NAME': os.getenv('EXAM_SYSTEM_DATABASE_NAME'),
         'USER': os.getenv('DATABASE_USER'),
         'PASSWORD': os.getenv('DATABASE_PASSWORD'),
         'HOST': os.getenv('DATABASE_HOST'),
         'PORT': '3306',
+        **DATABASE_POOL_SETTINGS,
         'OPTIONS': {
             'auth_plugin': 'mysql_native_password',
             'charset': 'utf8mb4',
@@ -1,9 +1,11 @@
 import json
+from typing import List, Optional
 
 from django.db import models, transaction
 from django.db.models import Sum
 
 from apps.teaching_space.models import TrainingClass
+from common.utils.soft_fk import get_prefetched_soft_fks, get_soft_fk
 
 
 class ExamSystemManager(models.Manager):
@@ -95,11 +97,11 @@ class ExamArrange(BaseModel):
 
     @property
     def training_class(self) -> TrainingClass:
-        return TrainingClass.objects.get(id=self.training_class_id)
+        return get_soft_fk(self, "training_class_id", TrainingClass)
 
     @property
     def paper(self) -> "PaperArrange":
-        return PaperArrange.objects.get(id=self.paper_id)
+        return get_soft_fk(self, "paper_id", PaperArrange)
 
     class Meta:
         managed = False
@@ -152,6 +154,11 @@ class ExamStudent(BaseModel):
 
     @property
     def grade(self):
+        # 已预取答案记录时直接求和
+        answer_grades: Optional[List[ExamGrade]] = get_prefetched_soft_fks(self, "answer_ids_dict")
+        if answer_grades is not None:
+            return round(sum(answer.grade for answer in answer_grades), 1)
+
         # 遍历所有的习题对应答案
         answer_list = [answer_id for answer_id in list(self.answer_ids_dict.values())]
         score = ExamGrade.objects.filter(id__in=answer_list).aggregate(Sum('grade'))
@@ -161,7 +168,7 @@ class ExamStudent(BaseModel):
     @property
     def exam_info(self):
         try:
-            exam: ExamArrange = ExamArrange.objects.get(id=self.exam_id)
+            exam: ExamArrange = self.exam_arrange
             return {
                 "title": exam.title,
                 "subject_name": exam.subject.display_name,
@@ -177,7 +184,7 @@ class ExamStudent(BaseModel):
 
     @property
     def exam_arrange(self) -> ExamArrange:
-        return ExamArrange.objects.get(id=self.exam_id)
+        return get_soft_fk(self, "exam_id", ExamArrange)
 
     @property
     def exam_title(self):
@@ -185,7 +192,7 @@ class ExamStudent(BaseModel):
 
     @property
     def training_class(self) -> TrainingClass:
-        return TrainingClass.objects.get(id=self.exam_arrange.training_class_id)
+        return self.exam_arrange.training_class
 
     @property
     def training_class_name(self) -> str: